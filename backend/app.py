@@ -1,42 +1,80 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Depends, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from backend.config import settings
 from backend.services.model_service import run_model_test
 from backend.services import db_service
+from backend.database import get_db
+from sqlalchemy.orm import Session
 from typing import Optional
+import asyncio
+import json
 import os
 
 app = FastAPI(title="SAP Enterprise AI Assistant", version="0.1.0")
 
 @app.on_event("startup")
 async def startup_event():
-    """Seed the database with test data if empty"""
+    """Migrate the schema, then seed the database with test data if empty"""
+    db_service.init_db()
     # Check if we have any users
     db = db_service.SessionLocal()
     try:
         user_count = db.query(db_service.User).count()
         if user_count == 0:
             # Create users
-            alice = db_service.create_user("Alice Smith", "Sales Manager", "Sales", "alice@sap.com", "password123")
-            bob = db_service.create_user("Bob Jones", "Regional Director", "Sales", "bob@sap.com", "password123")
-            charlie = db_service.create_user("Charlie Day", "Data Analyst", "IT", "charlie@sap.com", "password123")
-            abby = db_service.create_user("Abby Nayaraj", "Data Analyst", "IT", "abbynayaraj@gmail.com", "password123")
+            alice = db_service.create_user("Alice Smith", "Sales Manager", "Sales", "alice@sap.com", "password123", db=db)
+            bob = db_service.create_user("Bob Jones", "Regional Director", "Sales", "bob@sap.com", "password123", db=db)
+            charlie = db_service.create_user("Charlie Day", "Data Analyst", "IT", "charlie@sap.com", "password123", db=db)
+            abby = db_service.create_user("Abby Nayaraj", "Data Analyst", "IT", "abbynayaraj@gmail.com", "password123", db=db)
             
             # Create a public conversation
-            conv = db_service.create_conversation(alice["user_id"], "Q4 Sales Analysis", "public")
+            conv = db_service.create_conversation(alice["user_id"], "Q4 Sales Analysis", "public", db=db)
             
             # Add queries
-            q1 = db_service.create_query(conv["conversation_id"], alice["user_id"], "What are the Q4 sales trends?")
-            db_service.create_insight(q1["query_id"], "📊 **Q4 Sales Analysis**\n\nSales increased by 15% compared to Q3. The North region led with 25% growth.")
+            q1 = db_service.create_query(conv["conversation_id"], alice["user_id"], "What are the Q4 sales trends?", db=db)
+            db_service.create_insight(q1["query_id"], "📊 **Q4 Sales Analysis**\n\nSales increased by 15% compared to Q3. The North region led with 25% growth.", db=db)
             
             # Add comment
-            db_service.create_comment(conv["conversation_id"], bob["user_id"], "Great insights! Let's focus on the North region strategy for next year.")
+            db_service.create_comment(conv["conversation_id"], bob["user_id"], "Great insights! Let's focus on the North region strategy for next year.", db=db)
             
+            db.commit()
             print(f"Seeded database. Alice ID: {alice['user_id']}")
     finally:
         db.close()
+    
+    # Load the classifier (and start the compute workers) now rather than on
+    # this worker's first request; examples added by other workers are
+    # picked up in the background
+    from backend.services.ml_service import get_ml_service, start_example_sync
+    from backend.services.compute_service import get_compute_pool
+    get_ml_service()
+    start_example_sync()
+    get_compute_pool().warm_up()
+    
+    from backend.services.model_service import start_local_llm
+    start_local_llm()
+    
+    from backend.services.job_service import get_job_queue
+    job_queue = get_job_queue()
+    if job_queue:
+        job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop insight workers, release pooled provider connections, compute workers and event fan-out,
+    and write out the response cache"""
+    from backend.services import cache_service, compute_service, events_service, provider_service
+    from backend.services.job_service import get_job_queue
+    job_queue = get_job_queue()
+    if job_queue:
+        await job_queue.stop()
+    await provider_service.aclose_clients()
+    provider_service.close_clients()
+    compute_service.shutdown_pool()
+    events_service.close_event_hub()
+    cache_service.close_response_cache()
 
 # Configure CORS
 app.add_middleware(
@@ -64,7 +102,28 @@ def serve_frontend():
 
 @app.get("/health")
 def health_check() -> dict:
-    return {"status": "ok", "environment": settings.app_env}
+    from backend.services.model_service import local_llm_status
+    return {"status": "ok", "environment": settings.app_env, "local_llm": local_llm_status()}
+
+
+@app.get("/api/metrics")
+def metrics() -> dict:
+    """Runtime counters (response cache hit/miss, coalesced requests, compute
+    queue depth and latency, insight job queue, model-call waits per priority)"""
+    from backend.services.cache_service import get_response_cache, get_single_flight
+    from backend.services.compute_service import get_compute_pool
+    from backend.services.job_service import get_job_queue
+    from backend.services.scheduler_service import get_scheduler
+    cache = get_response_cache()
+    single_flight = get_single_flight()
+    job_queue = get_job_queue()
+    return {
+        "response_cache": cache.stats() if cache else None,
+        "single_flight": single_flight.stats() if single_flight else None,
+        "compute": get_compute_pool().stats(),
+        "insight_jobs": job_queue.stats() if job_queue else None,
+        "model_scheduler": get_scheduler().stats()
+    }
 
 
 @app.get("/api/model-test")
@@ -73,8 +132,8 @@ def model_test() -> dict:
 
 
 @app.post("/api/analyze")
-def analyze(request: dict) -> dict:
-    """Analyze a business query using AI"""
+async def analyze(request: dict, accept: Optional[str] = Header(None)):
+    """Analyze a business query using AI (send Accept: text/event-stream to stream it)"""
     query = request.get("query", "").strip()
     
     if not query:
@@ -84,8 +143,119 @@ def analyze(request: dict) -> dict:
             "query": ""
         }
     
-    from backend.services.model_service import analyze_business_query
-    return analyze_business_query(query)
+    if accept and "text/event-stream" in accept:
+        return _analysis_event_stream(query)
+    
+    from backend.services.model_service import analyze_business_query_async
+    return await analyze_business_query_async(query)
+
+
+MAX_BATCH_QUERIES = 1000
+
+
+@app.post("/api/analyze/batch")
+def analyze_batch(request: dict) -> dict:
+    """Categorize many business queries at once (ML insights only, no LLM call)"""
+    queries = request.get("queries")
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        raise HTTPException(status_code=400, detail="queries must be a list of strings")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    
+    from backend.services.compute_service import ml_insights_batch
+    queries = [q.strip() for q in queries]
+    insights = ml_insights_batch(queries)
+    return {
+        "status": "success",
+        "results": [{"query": q, "ml_insights": i} for q, i in zip(queries, insights)]
+    }
+
+
+@app.post("/api/ml/examples")
+def add_training_examples(request: dict, db: Session = Depends(get_db)) -> dict:
+    """Add labelled example queries to the classifier (takes effect without a restart)"""
+    category = (request.get("category") or "").strip()
+    examples = request.get("examples")
+    if isinstance(examples, str):
+        examples = [examples]
+    if not category or not isinstance(examples, list) or not all(isinstance(e, str) and e.strip() for e in examples):
+        raise HTTPException(status_code=400, detail="category and a non-empty list of example strings are required")
+    
+    created = db_service.create_training_examples(category, [e.strip() for e in examples], request.get("user_id"), db=db)
+    db.commit()
+    
+    # Apply to this worker now; other workers pick the rows up on their next
+    # sync. The new corpus version keys the response cache, so answers filed
+    # under the old categorization stop matching in every worker
+    from backend.services.ml_service import get_ml_service
+    ml_service = get_ml_service()
+    ml_service.sync_examples_from_db()
+    return {
+        "status": "success",
+        "added": len(created),
+        "category": category,
+        "category_examples": len(ml_service.categories[category]["examples"])
+    }
+
+
+@app.get("/api/analyze/stream")
+async def analyze_stream(
+    query: str = Query(..., description="Business question"),
+    conversation_id: Optional[str] = Query(None, description="Store the question and final insight in this conversation"),
+    user_id: Optional[str] = Query(None, description="Author of the stored question")
+):
+    """Stream an analysis as Server-Sent Events (meta, token..., done)"""
+    query = query.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Please provide a query to analyze.")
+    
+    query_record = None
+    if conversation_id and user_id:
+        query_record = await db_service.run_in_session(
+            lambda db: db_service.create_query(conversation_id, user_id, query, db=db)
+        )
+    return _analysis_event_stream(query, query_record)
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _analysis_event_stream(question: str, query_record: Optional[dict] = None) -> StreamingResponse:
+    from backend.services.model_service import INTERRUPTED_NOTE, stream_business_query
+    
+    def store_insight(analysis: str, status: str = "ready"):
+        return db_service.run_in_session(
+            lambda db: db_service.create_insight(query_record["query_id"], analysis, db=db, status=status)
+        )
+    
+    async def events():
+        parts = []
+        stored = query_record is None
+        try:
+            async for event, data in stream_business_query(question):
+                if event == "meta" and query_record:
+                    data["query_id"] = query_record["query_id"]
+                elif event == "token":
+                    parts.append(data["text"])
+                elif event == "done" and query_record:
+                    # Persist the full text once the stream has completed
+                    insight = await store_insight("".join(parts))
+                    stored = True
+                    data["insight_id"] = insight["insight_id"]
+                yield _sse_event(event, data)
+        finally:
+            if not stored:
+                # The client went away or the analysis failed: keep what was
+                # produced so the question is not left "Thinking..." forever.
+                # Shielded because a disconnect cancels this generator
+                await asyncio.shield(store_insight("".join(parts) + INTERRUPTED_NOTE, status="failed"))
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # ============================================
@@ -93,40 +263,42 @@ def analyze(request: dict) -> dict:
 # ============================================
 
 @app.post("/api/users")
-def create_user(request: dict) -> dict:
+def create_user(request: dict, db: Session = Depends(get_db)) -> dict:
     """Create a new user"""
     try:
         user = db_service.create_user(
             name=request["name"],
             role=request["role"],
             department=request.get("department", "General"),
-            email=request["email"]
+            email=request["email"],
+            db=db
         )
+        db.commit()
         return {"status": "success", "user": user}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/api/login")
-def login(request: dict) -> dict:
+def login(request: dict, db: Session = Depends(get_db)) -> dict:
     """Login a user"""
     email = request.get("email")
     password = request.get("password")
     
     if not email or not password:
         raise HTTPException(status_code=400, detail="Email and password required")
-        
-    user = db_service.validate_user(email, password)
+
+    user = db_service.validate_user(email, password, db=db)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-        
+
     return {"status": "success", "user": user}
 
 
 @app.get("/api/users/{user_id}")
-def get_user(user_id: str) -> dict:
+def get_user(user_id: str, db: Session = Depends(get_db)) -> dict:
     """Get user by ID"""
-    user = db_service.get_user(user_id)
+    user = db_service.get_user(user_id, db=db)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return {"status": "success", "user": user}
@@ -137,80 +309,112 @@ def get_user(user_id: str) -> dict:
 # ============================================
 
 @app.post("/api/conversations/quick-analyze")
-def quick_analyze(request: dict) -> dict:
+async def quick_analyze(request: dict) -> dict:
     """Consolidated endpoint for faster analysis (Atomic: Create Conv -> Create Query -> Get Insight)"""
     try:
         user_id = request["user_id"]
         question = request["question"]
         title = request.get("title", question[:30] + "...")
         visibility = request.get("visibility", "department")
-        
-        # 1. Create Conversation
-        conversation = db_service.create_conversation(user_id, title, visibility)
-        conv_id = conversation["conversation_id"]
-        
-        # 2. Create Query
-        query = db_service.create_query(conv_id, user_id, question)
-        
-        # 3. Get AI Insight
-        from backend.services.model_service import analyze_business_query
-        ai_response = analyze_business_query(question)
-        
-        # 4. Store Insight
-        db_service.create_insight(query["query_id"], ai_response.get("analysis", ""))
-        
-        # 5. Return full detail (simulating GET /api/conversations/{id} but faster)
-        # We fetch fresh to ensure all relationships/counts are correct
-        full_data = get_conversation(conv_id)
-        return full_data
-        
+
+        job_queue = _insight_job_queue(request)
+        if job_queue:
+            # Commit everything with a pending insight now; a worker fills it in
+            def persist_pending(db: Session) -> dict:
+                conversation = db_service.create_conversation(user_id, title, visibility, db=db)
+                conv_id = conversation["conversation_id"]
+                query = db_service.create_query(conv_id, user_id, question, db=db)
+                db_service.create_insight(query["query_id"], "", db=db, status="pending")
+                db.flush()
+                return db_service.get_conversation_detail(conv_id, db=db)
+            
+            detail = await db_service.run_in_session(persist_pending)
+            await asyncio.to_thread(job_queue.enqueue, detail["queries"][0]["insight"]["insight_id"], question)
+            return _conversation_response(detail)
+
+        # 1. Get AI Insight first so no write transaction is held open during the model call
+        from backend.services.model_service import analyze_business_query_async
+        ai_response = await analyze_business_query_async(question)
+
+        # 2. Create Conversation, Query and Insight as one unit of work,
+        # 3. then return full detail (same shape as GET /api/conversations/{id})
+        def persist(db: Session) -> dict:
+            conversation = db_service.create_conversation(user_id, title, visibility, db=db)
+            conv_id = conversation["conversation_id"]
+            query = db_service.create_query(conv_id, user_id, question, db=db)
+            db_service.create_insight(query["query_id"], ai_response.get("analysis", ""), db=db)
+            db.flush()
+            return db_service.get_conversation_detail(conv_id, db=db)
+
+        detail = await db_service.run_in_session(persist)
+        return _conversation_response(detail)
+
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/api/conversations")
-def create_conversation(request: dict) -> dict:
+def create_conversation(request: dict, db: Session = Depends(get_db)) -> dict:
     """Create a new conversation"""
     try:
         conversation = db_service.create_conversation(
             user_id=request["user_id"],
             title=request.get("title", "Untitled Conversation"),
-            visibility=request.get("visibility", "department")
+            visibility=request.get("visibility", "department"),
+            db=db
         )
+        db.commit()
         return {"status": "success", "conversation": conversation}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/conversations/{conversation_id}")
-def get_conversation(conversation_id: str) -> dict:
+def get_conversation(conversation_id: str, db: Session = Depends(get_db)) -> dict:
     """Get conversation details with queries and insights"""
-    conversation = db_service.get_conversation(conversation_id)
-    if not conversation:
+    detail = db_service.get_conversation_detail(conversation_id, db=db)
+    if not detail:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    # Get related data
-    queries = db_service.get_conversation_queries(conversation_id)
-    
-    # Enrich queries with insights
-    for query in queries:
-        insight = db_service.get_query_insight(query["query_id"])
-        query["insight"] = insight
-    
-    comments = db_service.get_conversation_comments(conversation_id)
-    reactions = db_service.get_conversation_reactions(conversation_id)
-    
-    # Enrich comments with user info
-    for comment in comments:
-        user = db_service.get_user(comment["user_id"])
-        comment["user"] = user
-    
+    return _conversation_response(detail)
+
+
+@app.websocket("/ws/conversations/{conversation_id}")
+async def conversation_events(websocket: WebSocket, conversation_id: str):
+    """Push new comments, reactions and insights for a conversation as JSON
+    deltas ({"type", "conversation_id", "data"}); "resync" asks the client to refetch.
+    Unknown conversations are closed with code 4404"""
+    from backend.services.events_service import get_event_hub
+    await websocket.accept()
+    conversation = await db_service.run_in_session(
+        lambda db: db_service.get_conversation(conversation_id, db=db)
+    )
+    if conversation is None:
+        await websocket.close(code=4404, reason="Conversation not found")
+        return
+    async with get_event_hub().subscribe(conversation_id) as events:
+        async def forward():
+            while True:
+                await websocket.send_json(await events.get())
+
+        sender = asyncio.ensure_future(forward())
+        try:
+            # Clients don't send anything; this just waits for the disconnect
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+
+
+def _conversation_response(detail: dict) -> dict:
     return {
         "status": "success",
-        "conversation": conversation,
-        "queries": queries,
-        "comments": comments,
-        "reactions": reactions
+        "conversation": detail["conversation"],
+        "queries": detail["queries"],
+        "comments": detail["comments"],
+        "reactions": detail["reactions"]
     }
 
 
@@ -218,31 +422,90 @@ def get_conversation(conversation_id: str) -> dict:
 def get_conversations(
     user_id: str = Query(..., description="Current user ID"),
     department: Optional[str] = Query(None, description="User's department"),
-    view: str = Query("all", description="'my' or 'all' conversations")
+    view: str = Query("all", description="'my' or 'all' conversations"),
+    limit: int = Query(50, ge=1, le=200, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
+    db: Session = Depends(get_db)
+) -> dict:
+    """Get conversations visible to the user, newest first, one page at a time"""
+    field_list = None
+    if fields:
+        field_list = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in field_list if f not in db_service.CONVERSATION_LIST_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    
+    # Fetch one extra row to know whether another page exists
+    try:
+        if view == "my":
+            conversations = db_service.get_user_conversations(user_id, limit=limit + 1, cursor=cursor, fields=field_list, db=db)
+        else:
+            conversations = db_service.get_shared_conversations(user_id, department, limit=limit + 1, cursor=cursor, fields=field_list, db=db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    next_cursor = None
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        last = conversations[-1]
+        next_cursor = db_service.encode_conversation_cursor(last["created_at"], last["conversation_id"])
+    
+    if field_list is not None and "created_at" not in field_list:
+        for conv in conversations:
+            conv.pop("created_at", None)
+    
+    return {"status": "success", "conversations": conversations, "next_cursor": next_cursor}
+
+
+SEARCH_KINDS = ("query", "insight", "comment")
+
+
+@app.get("/api/search")
+def search(
+    q: str = Query(..., min_length=1, description="Search text"),
+    user_id: str = Query(..., description="Current user ID"),
+    department: Optional[str] = Query(None, description="User's department"),
+    kind: Optional[str] = Query(None, description="Comma-separated: query, insight, comment"),
+    limit: int = Query(20, ge=1, le=100, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+    db: Session = Depends(get_db)
 ) -> dict:
-    """Get conversations visible to the user"""
-    if view == "my":
-        conversations = db_service.get_user_conversations(user_id)
-    else:
-        conversations = db_service.get_shared_conversations(user_id, department)
+    """Full-text search over questions, insights and comments the user can see, best match first"""
+    if not db_service.search_available(db=db):
+        raise HTTPException(status_code=501, detail="Search requires the SQLite database with FTS5")
+    kinds = None
+    if kind:
+        kinds = [k.strip() for k in kind.split(",") if k.strip()]
+        unknown = [k for k in kinds if k not in SEARCH_KINDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown kinds: {', '.join(unknown)}")
     
-    # Enrich with counts
-    for conv in conversations:
-        conv["comment_count"] = len(db_service.get_conversation_comments(conv["conversation_id"]))
-        conv["query_count"] = len(db_service.get_conversation_queries(conv["conversation_id"]))
+    # Fetch one extra row to know whether another page exists
+    try:
+        results = db_service.search_content(user_id, q, department, kinds, limit=limit + 1, cursor=cursor, db=db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"status": "success", "conversations": conversations}
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = db_service.encode_search_cursor(results[-1]["score"], results[-1]["doc_id"])
+    for result in results:
+        result.pop("doc_id")
+    return {"status": "success", "results": results, "next_cursor": next_cursor}
 
 
 @app.patch("/api/conversations/{conversation_id}")
-def update_conversation(conversation_id: str, request: dict) -> dict:
+def update_conversation(conversation_id: str, request: dict, db: Session = Depends(get_db)) -> dict:
     """Update conversation status"""
     try:
         status = request.get("status")
         if status:
-            conversation = db_service.update_conversation_status(conversation_id, status)
+            conversation = db_service.update_conversation_status(conversation_id, status, db=db)
             if not conversation:
                 raise HTTPException(status_code=404, detail="Conversation not found")
+            db.commit()
             return {"status": "success", "conversation": conversation}
         return {"status": "error", "message": "No updates provided"}
     except Exception as e:
@@ -254,61 +517,99 @@ def update_conversation(conversation_id: str, request: dict) -> dict:
 # ============================================
 
 @app.post("/api/conversations/{conversation_id}/queries")
-def create_query(conversation_id: str, request: dict) -> dict:
+async def create_query(conversation_id: str, request: dict) -> dict:
     """Create a query and get AI insight"""
     try:
-        # Create the query
-        query = db_service.create_query(
-            conversation_id=conversation_id,
-            user_id=request["user_id"],
-            question=request["question"]
-        )
-        
-        # Get AI analysis
-        from backend.services.model_service import analyze_business_query
-        ai_response = analyze_business_query(request["question"])
-        
-        # Store the insight
-        insight = db_service.create_insight(
-            query_id=query["query_id"],
-            response=ai_response.get("analysis", "")
-        )
-        
-        query["insight"] = insight
+        user_id = request["user_id"]
+        question = request["question"]
+
+        job_queue = _insight_job_queue(request)
+        if job_queue:
+            # Commit the query with a pending insight now; a worker fills it in
+            def persist_pending(db: Session) -> dict:
+                query = db_service.create_query(conversation_id, user_id, question, db=db)
+                query["insight"] = db_service.create_insight(query["query_id"], "", db=db, status="pending")
+                return query
+            
+            query = await db_service.run_in_session(persist_pending)
+            await asyncio.to_thread(job_queue.enqueue, query["insight"]["insight_id"], question)
+            return {"status": "success", "query": query}
+
+        # Get AI analysis before writing so no transaction is held open during the model call
+        from backend.services.model_service import analyze_business_query_async
+        ai_response = await analyze_business_query_async(question)
+
+        # Create the query and store the insight in one commit
+        def persist(db: Session) -> dict:
+            query = db_service.create_query(
+                conversation_id=conversation_id,
+                user_id=user_id,
+                question=question,
+                db=db
+            )
+            query["insight"] = db_service.create_insight(
+                query_id=query["query_id"],
+                response=ai_response.get("analysis", ""),
+                db=db
+            )
+            return query
+
+        query = await db_service.run_in_session(persist)
         return {"status": "success", "query": query}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _insight_job_queue(request: dict):
+    """The job queue when this request's insight should be generated in the
+    background (INSIGHT_MODE=background, unless the body sets "background": false)"""
+    from backend.services.job_service import get_job_queue
+    if request.get("background") is False:
+        return None
+    return get_job_queue()
+
+
+@app.get("/api/insights/{insight_id}")
+def get_insight(insight_id: str, db: Session = Depends(get_db)) -> dict:
+    """Poll an insight; status is pending until its background job has finished (ready or failed)"""
+    insight = db_service.get_insight(insight_id, db=db)
+    if not insight:
+        raise HTTPException(status_code=404, detail="Insight not found")
+    return {"status": "success", "insight": insight}
+
+
 # ============================================
 # COMMENT ENDPOINTS
 # ============================================
 
 @app.post("/api/conversations/{conversation_id}/comments")
-def add_comment(conversation_id: str, request: dict) -> dict:
+def add_comment(conversation_id: str, request: dict, db: Session = Depends(get_db)) -> dict:
     """Add a comment to a conversation"""
     try:
         comment = db_service.create_comment(
             conversation_id=conversation_id,
             user_id=request["user_id"],
-            content=request["content"]
+            content=request["content"],
+            db=db
         )
-        
+
         # Enrich with user info
-        user = db_service.get_user(comment["user_id"])
+        user = db_service.get_user(comment["user_id"], db=db)
         comment["user"] = user
-        
+        db.commit()
+
         return {"status": "success", "comment": comment}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.delete("/api/comments/{comment_id}")
-def delete_comment(comment_id: str, user_id: str = Query(...)) -> dict:
+def delete_comment(comment_id: str, user_id: str = Query(...), db: Session = Depends(get_db)) -> dict:
     """Delete a comment"""
-    success = db_service.delete_comment(comment_id, user_id)
+    success = db_service.delete_comment(comment_id, user_id, db=db)
     if not success:
         raise HTTPException(status_code=403, detail="Cannot delete comment")
+    db.commit()
     return {"status": "success", "message": "Comment deleted"}
 
 
@@ -317,32 +618,35 @@ def delete_comment(comment_id: str, user_id: str = Query(...)) -> dict:
 # ============================================
 
 @app.post("/api/conversations/{conversation_id}/reactions")
-def add_reaction(conversation_id: str, request: dict) -> dict:
+def add_reaction(conversation_id: str, request: dict, db: Session = Depends(get_db)) -> dict:
     """Add or update a reaction to a conversation"""
     try:
         reaction = db_service.add_reaction(
             conversation_id=conversation_id,
             user_id=request["user_id"],
-            reaction_type=request["reaction_type"]
+            reaction_type=request["reaction_type"],
+            db=db
         )
+        db.commit()
         return {"status": "success", "reaction": reaction}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.delete("/api/conversations/{conversation_id}/reactions")
-def remove_reaction(conversation_id: str, user_id: str = Query(...)) -> dict:
+def remove_reaction(conversation_id: str, user_id: str = Query(...), db: Session = Depends(get_db)) -> dict:
     """Remove a reaction from a conversation"""
-    success = db_service.remove_reaction(conversation_id, user_id)
+    success = db_service.remove_reaction(conversation_id, user_id, db=db)
     if not success:
         raise HTTPException(status_code=404, detail="Reaction not found")
+    db.commit()
     return {"status": "success", "message": "Reaction removed"}
 
 
 @app.get("/api/conversations/{conversation_id}/reactions")
-def get_reactions(conversation_id: str) -> dict:
+def get_reactions(conversation_id: str, db: Session = Depends(get_db)) -> dict:
     """Get all reactions for a conversation"""
-    reactions = db_service.get_conversation_reactions(conversation_id)
+    reactions = db_service.get_conversation_reactions(conversation_id, db=db)
     
     # Count by type
     reaction_counts = {}
@@ -10,12 +10,83 @@ class Settings:
     app_env: str = os.getenv("APP_ENV", "dev")
     app_port: int = int(os.getenv("APP_PORT", "8000"))
     model_api_key: str = os.getenv("MODEL_API_KEY", "")
+    # auto picks Anthropic for sk-ant- keys, otherwise OpenAI
+    model_provider: str = os.getenv("MODEL_PROVIDER", "auto")
+    model_base_url: str = os.getenv("MODEL_BASE_URL", "")
+    model_connect_timeout: float = float(os.getenv("MODEL_CONNECT_TIMEOUT", "5"))
+    model_read_timeout: float = float(os.getenv("MODEL_READ_TIMEOUT", "60"))
+    model_max_connections: int = int(os.getenv("MODEL_MAX_CONNECTIONS", "100"))
+    model_max_keepalive: int = int(os.getenv("MODEL_MAX_KEEPALIVE", "20"))
+    model_max_retries: int = int(os.getenv("MODEL_MAX_RETRIES", "2"))
+    # Full SQLAlchemy URL; when set it replaces the DB_* settings below
+    # (the test suite points it at a temporary SQLite file)
+    database_url: str = os.getenv("DATABASE_URL", "")
     db_engine: str = os.getenv("DB_ENGINE", "postgres")
     db_host: str = os.getenv("DB_HOST", "localhost")
     db_port: int = int(os.getenv("DB_PORT", "5432"))
     db_name: str = os.getenv("DB_NAME", "sap_ai_assistant")
     db_user: str = os.getenv("DB_USER", "")
     db_password: str = os.getenv("DB_PASSWORD", "")
+    # Connection pool (per process). With DB_MAX_CONNECTIONS set, each of the
+    # APP_WORKERS processes is capped to its share of the server's connections.
+    app_workers: int = int(os.getenv("APP_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+    db_max_connections: int = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_timeout: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # SQLite engine profile, applied to every new connection
+    sqlite_journal_mode: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    sqlite_synchronous: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    sqlite_cache_size_kb: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    sqlite_mmap_size: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    # Query classifier: "centroid" (one score per category) or "nearest" (best training example)
+    ml_classifier: str = os.getenv("ML_CLASSIFIER", "centroid")
+    # Seed corpus (JSON; empty = backend/data/training_corpus.json), extended by
+    # labelled examples stored in the database, which workers re-check periodically
+    ml_corpus_path: str = os.getenv("ML_CORPUS_PATH", "")
+    ml_hash_features: int = int(os.getenv("ML_HASH_FEATURES", str(2 ** 18)))
+    ml_sync_interval_seconds: float = float(os.getenv("ML_SYNC_INTERVAL_SECONDS", "30"))
+    # Prebuilt classifier (build_classifier.py); empty = backend/data/classifier
+    ml_artifact_path: str = os.getenv("ML_ARTIFACT_PATH", "")
+    # Local DistilGPT-2 for mock-mode analyses, loaded and warmed up in the
+    # background at startup; templates are used until it is ready
+    local_llm_enabled: bool = os.getenv("LOCAL_LLM_ENABLED", "false").lower() == "true"
+    # Model calls (provider or local LLM) in flight per process; beyond that
+    # callers queue by business-impact priority, dequeued by these weights
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    llm_priority_weights: str = os.getenv("LLM_PRIORITY_WEIGHTS", "High=6,Medium=3,Low=1")
+    # Local LLM inference: torch (fp32), int8 (dynamic quantization) or onnx (ONNX Runtime)
+    llm_backend: str = os.getenv("LLM_BACKEND", "torch")
+    # Concurrent local generations are batched: up to this many prompts,
+    # gathered for at most this long after the first one arrives
+    llm_batch_max_size: int = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))
+    llm_batch_wait_ms: float = float(os.getenv("LLM_BATCH_WAIT_MS", "10"))
+    # A streamed local generation is abandoned after this long without new text
+    llm_stream_timeout_seconds: float = float(os.getenv("LLM_STREAM_TIMEOUT_SECONDS", "60"))
+    # sync: create_query/quick_analyze wait for the insight; background: they
+    # return a pending insight that a job queue (local SQLite file) fills in
+    insight_mode: str = os.getenv("INSIGHT_MODE", "sync")
+    insight_queue_path: str = os.getenv("INSIGHT_QUEUE_PATH", "insight_jobs.db")
+    insight_workers: int = int(os.getenv("INSIGHT_WORKERS", "4"))
+    insight_max_attempts: int = int(os.getenv("INSIGHT_MAX_ATTEMPTS", "3"))
+    insight_retry_base_seconds: float = float(os.getenv("INSIGHT_RETRY_BASE_SECONDS", "2"))
+    # Conversation events pushed over /ws/conversations/{id}: local (one
+    # process) or sqlite (shared file, for several workers on one host)
+    events_fanout: str = os.getenv("EVENTS_FANOUT", "local")
+    events_fanout_path: str = os.getenv("EVENTS_FANOUT_PATH", "conversation_events.db")
+    # Worker processes for password hashing and ML scoring; 0 runs them inline
+    compute_workers: int = int(os.getenv("COMPUTE_WORKERS", "0"))
+    # Analysis response cache; similarity 0 disables near-duplicate matching,
+    # an empty path keeps the cache in memory only
+    response_cache_enabled: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    response_cache_max_entries: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    response_cache_max_mb: int = int(os.getenv("RESPONSE_CACHE_MAX_MB", "32"))
+    response_cache_ttl_seconds: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    response_cache_similarity: float = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9"))
+    response_cache_path: str = os.getenv("RESPONSE_CACHE_PATH", "")
+    # Concurrent identical questions share one analysis (and one provider call)
+    single_flight_enabled: bool = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
 
 
 settings = Settings()
@@ -1,16 +1,101 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import importlib.util
 import os
+from .config import settings, Settings
 
 # Create directory for database if it doesn't exist
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, "sap_assistant.db")
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
+SQLITE_DATABASE_URL = f"sqlite:///{DB_PATH}"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def build_database_url(config: Settings = settings, driver: str = "psycopg2") -> str:
+    """DATABASE_URL if set; otherwise a Postgres URL from Settings when DB_ENGINE=postgres
+    and credentials are set, else the local SQLite file"""
+    if config.database_url:
+        return config.database_url
+    if config.db_engine.lower() not in ("postgres", "postgresql"):
+        return SQLITE_DATABASE_URL
+    if not config.db_user:
+        print("DB_ENGINE=postgres but DB_USER is empty; using local SQLite database")
+        return SQLITE_DATABASE_URL
+    if importlib.util.find_spec(driver) is None:
+        print(f"DB_ENGINE=postgres but the {driver} driver is not installed; using local SQLite database")
+        return SQLITE_DATABASE_URL
+    return URL.create(
+        f"postgresql+{driver}",
+        username=config.db_user,
+        password=config.db_password or None,
+        host=config.db_host,
+        port=config.db_port,
+        database=config.db_name,
+    ).render_as_string(hide_password=False)
+
+
+SQLALCHEMY_DATABASE_URL = build_database_url()
+
+
+def sqlite_pragmas(config: Settings = settings) -> list:
+    """PRAGMA statements that make up the SQLite engine profile"""
+    return [
+        f"PRAGMA journal_mode={config.sqlite_journal_mode}",
+        f"PRAGMA synchronous={config.sqlite_synchronous}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{config.sqlite_cache_size_kb}",
+        f"PRAGMA mmap_size={config.sqlite_mmap_size}",
+        f"PRAGMA busy_timeout={config.sqlite_busy_timeout_ms}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def pool_options(config: Settings = settings) -> dict:
+    """QueuePool sizing; with DB_MAX_CONNECTIONS each worker process gets its share"""
+    pool_size = config.db_pool_size
+    max_overflow = config.db_max_overflow
+    if config.db_max_connections > 0:
+        per_worker = max(1, config.db_max_connections // max(1, config.app_workers))
+        pool_size = min(pool_size, per_worker)
+        max_overflow = max(0, min(max_overflow, per_worker - pool_size))
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": config.db_pool_timeout,
+    }
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, config: Settings = settings):
+    """Build an engine with pool sizing from Settings and, for SQLite, the pragma profile"""
+    if make_url(url).get_backend_name() != "sqlite":
+        # Server databases: drop dead connections after failover/idle timeouts
+        return create_engine(url, pool_pre_ping=True, pool_recycle=1800, **pool_options(config))
+
+    # In-memory databases get SingletonThreadPool, which takes no QueuePool sizing
+    database = make_url(url).database
+    in_memory = not database or database == ":memory:" or "mode=memory" in url
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": config.sqlite_busy_timeout_ms / 1000},
+        **({} if in_memory else pool_options(config))
+    )
+    _apply_sqlite_profile(engine, config)
+    return engine
+
+
+def _apply_sqlite_profile(engine, config: Settings = settings):
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, "connect")
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -21,3 +106,36 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# --- Optional async path (asyncpg for Postgres, aiosqlite for SQLite) ---
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+def async_database_url(url: str = SQLALCHEMY_DATABASE_URL) -> str:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return parsed.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+def get_async_sessionmaker():
+    """Lazily create the AsyncSession factory; raises RuntimeError if the async driver is missing"""
+    global _async_engine, _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        url = async_database_url()
+        driver = make_url(url).get_driver_name()
+        if importlib.util.find_spec(driver) is None:
+            raise RuntimeError(f"Async database access needs the {driver} package: pip install {driver}")
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        if make_url(url).get_backend_name() == "sqlite":
+            _async_engine = create_async_engine(url)
+            _apply_sqlite_profile(_async_engine.sync_engine)
+        else:
+            _async_engine = create_async_engine(url, pool_pre_ping=True, pool_recycle=1800, **pool_options())
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _AsyncSessionLocal
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
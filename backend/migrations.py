@@ -0,0 +1,192 @@
+"""
+Versioned schema migrations for SAP AI Assistant
+Brings existing databases (e.g. an old sap_assistant.db) up to the current models
+"""
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from .models import Base
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+
+def _create_model_indexes(conn: Connection, table_names):
+    """Create any index declared on the models that the database is missing"""
+    for table_name in table_names:
+        for index in Base.metadata.tables[table_name].indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def _migration_1_hot_path_indexes(conn: Connection):
+    # Older databases may hold several reactions per (conversation, user);
+    # keep the newest one so the unique index can be built.
+    duplicates = conn.execute(text("""
+        SELECT conversation_id, user_id FROM reactions
+        GROUP BY conversation_id, user_id HAVING COUNT(*) > 1
+    """)).fetchall()
+    for conversation_id, user_id in duplicates:
+        reaction_ids = conn.execute(text("""
+            SELECT reaction_id FROM reactions
+            WHERE conversation_id = :conversation_id AND user_id = :user_id
+            ORDER BY created_at DESC, reaction_id DESC
+        """), {"conversation_id": conversation_id, "user_id": user_id}).scalars().all()
+        for reaction_id in reaction_ids[1:]:
+            conn.execute(text("DELETE FROM reactions WHERE reaction_id = :reaction_id"), {"reaction_id": reaction_id})
+    _create_model_indexes(conn, ["conversations", "queries", "insights", "comments", "reactions"])
+
+
+def _migration_2_insight_status(conn: Connection):
+    # Fresh databases already have the column from create_all
+    columns = {column["name"] for column in inspect(conn).get_columns("insights")}
+    if "status" not in columns:
+        conn.execute(text("ALTER TABLE insights ADD COLUMN status VARCHAR DEFAULT 'ready'"))
+        conn.execute(text("UPDATE insights SET status = 'ready' WHERE status IS NULL"))
+
+
+# Full-text search (SQLite FTS5). search_docs gives every question, insight
+# and comment a stable integer id, used as the FTS rowid, so triggers can
+# update or delete index rows by key instead of scanning the index.
+SEARCH_SOURCES = [
+    # (kind, table, id column, text column, conversation_id expression)
+    ("query", "queries", "query_id", "question", "{row}.conversation_id"),
+    ("insight", "insights", "insight_id", "response",
+     "(SELECT conversation_id FROM queries WHERE query_id = {row}.query_id)"),
+    ("comment", "comments", "comment_id", "content", "{row}.conversation_id"),
+]
+
+
+def fts5_available(conn: Connection) -> bool:
+    options = conn.execute(text("PRAGMA compile_options")).scalars().all()
+    return "ENABLE_FTS5" in options
+
+
+def _migration_3_search_index(conn: Connection):
+    if conn.dialect.name != "sqlite":
+        return
+    if not fts5_available(conn):
+        print("SQLite was built without FTS5; /api/search is unavailable until it is")
+        return False
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS search_docs (
+            doc_id INTEGER PRIMARY KEY,
+            source_id TEXT NOT NULL UNIQUE,
+            kind TEXT NOT NULL,
+            conversation_id TEXT
+        )
+    """))
+    conn.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(body, tokenize='porter unicode61')"))
+    
+    for kind, table, id_column, text_column, conversation in SEARCH_SOURCES:
+        doc_id = f"(SELECT doc_id FROM search_docs WHERE source_id = {{row}}.{id_column})"
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO search_docs (source_id, kind, conversation_id)
+                VALUES (new.{id_column}, '{kind}', {conversation.format(row="new")});
+                INSERT INTO search_index (rowid, body) VALUES ({doc_id.format(row="new")}, new.{text_column});
+            END
+        """))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {text_column} ON {table} BEGIN
+                UPDATE search_index SET body = new.{text_column} WHERE rowid = {doc_id.format(row="new")};
+            END
+        """))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM search_index WHERE rowid = {doc_id.format(row="old")};
+                DELETE FROM search_docs WHERE source_id = old.{id_column};
+            END
+        """))
+        # Index the rows that already exist; skips rows indexed by an earlier
+        # (interrupted or concurrent) run, so the backfill can be repeated
+        conn.execute(text(f"""
+            INSERT OR IGNORE INTO search_docs (source_id, kind, conversation_id)
+            SELECT {id_column}, '{kind}', {conversation.format(row=table)} FROM {table}
+        """))
+        conn.execute(text(f"""
+            INSERT INTO search_index (rowid, body)
+            SELECT search_docs.doc_id, {table}.{text_column} FROM {table}
+            JOIN search_docs ON search_docs.source_id = {table}.{id_column}
+            WHERE search_docs.doc_id NOT IN (SELECT rowid FROM search_index)
+        """))
+
+
+# (version, description, step) - append only, never renumber
+MIGRATIONS = [
+    (1, "Composite indexes for conversation, query, comment, insight and reaction lookups", _migration_1_hot_path_indexes),
+    (2, "Insight status for background insight generation", _migration_2_insight_status),
+    (3, "FTS5 search index over questions, insights and comments", _migration_3_search_index),
+]
+
+
+def _ensure_version_table(conn: Connection):
+    if not inspect(conn).has_table(SCHEMA_VERSION_TABLE):
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (version INTEGER PRIMARY KEY)"))
+        return
+    # Tables from before version was unique may hold duplicates from racing workers
+    versions = conn.execute(text(f"SELECT version FROM {SCHEMA_VERSION_TABLE}")).scalars().all()
+    if len(versions) != len(set(versions)):
+        conn.execute(text(f"DELETE FROM {SCHEMA_VERSION_TABLE}"))
+        for version in sorted(set(versions)):
+            conn.execute(text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (version) VALUES (:version)"), {"version": version})
+    conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{SCHEMA_VERSION_TABLE}_version ON {SCHEMA_VERSION_TABLE} (version)"))
+
+
+def get_applied_versions(conn: Connection) -> set:
+    _ensure_version_table(conn)
+    return set(conn.execute(text(f"SELECT version FROM {SCHEMA_VERSION_TABLE}")).scalars().all())
+
+
+def get_schema_version(conn: Connection) -> int:
+    return max(get_applied_versions(conn), default=0)
+
+
+class _Deferred(Exception):
+    """A step that can't run on this database yet"""
+
+
+def _apply(engine: Engine, version: int, description: str, step) -> bool:
+    """Run one step in a transaction that records its version first; False if
+    another worker already applied it (or the step was deferred)"""
+    while True:
+        try:
+            with engine.begin() as conn:
+                # The insert takes the write lock (SQLite) or the key (Postgres)
+                # before any DDL, so a worker starting at the same time waits
+                # here and then finds the version already recorded
+                try:
+                    conn.execute(text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (version) VALUES (:version)"),
+                                 {"version": version})
+                except IntegrityError:
+                    return False
+                print(f"Applying schema migration {version}: {description}")
+                if step(conn) is False:
+                    raise _Deferred()
+            return True
+        except _Deferred:
+            return False
+        except OperationalError as e:
+            # SQLite busy timeout ran out while another worker migrates
+            if "locked" not in str(e):
+                raise
+            time.sleep(0.5)
+
+
+def run_migrations(engine: Engine) -> int:
+    """Apply every pending migration, each in its own transaction. Safe to run
+    from several workers at once: each step runs only where its version row
+    could be inserted. A step that returns False can't run on this database
+    yet (e.g. SQLite without FTS5); it is not recorded and is tried again on
+    the next start. Returns the highest applied version."""
+    with engine.begin() as conn:
+        applied = get_applied_versions(conn)
+
+    for version, description, step in MIGRATIONS:
+        if version in applied:
+            continue
+        _apply(engine, version, description, step)
+        with engine.begin() as conn:
+            applied = get_applied_versions(conn)
+
+    return max(applied, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Boolean, Index, Integer
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -23,6 +23,11 @@ class User(Base):
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # "My conversations" and the keyset-paginated shared list
+        Index("ix_conversations_user_created", "user_id", "created_at", "conversation_id"),
+        Index("ix_conversations_visibility_created", "visibility", "created_at", "conversation_id"),
+    )
     
     conversation_id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, ForeignKey("users.user_id"))
@@ -32,11 +37,15 @@ class Conversation(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     creator = relationship("User", back_populates="conversations")
-    queries = relationship("Query", back_populates="conversation")
-    comments = relationship("Comment", back_populates="conversation")
+    queries = relationship("Query", back_populates="conversation", order_by="Query.created_at")
+    comments = relationship("Comment", back_populates="conversation", order_by="Comment.created_at")
+    reactions = relationship("Reaction", back_populates="conversation")
 
 class Query(Base):
     __tablename__ = "queries"
+    __table_args__ = (
+        Index("ix_queries_conversation_created", "conversation_id", "created_at"),
+    )
     
     query_id = Column(String, primary_key=True, default=generate_uuid)
     conversation_id = Column(String, ForeignKey("conversations.conversation_id"))
@@ -49,16 +58,24 @@ class Query(Base):
 
 class Insight(Base):
     __tablename__ = "insights"
+    __table_args__ = (
+        Index("ix_insights_query_id", "query_id"),
+    )
     
     insight_id = Column(String, primary_key=True, default=generate_uuid)
     query_id = Column(String, ForeignKey("queries.query_id"))
     response = Column(Text)
+    # ready, or pending/failed while a background job fills in the response
+    status = Column(String, default="ready", server_default="ready")
     created_at = Column(DateTime, default=datetime.utcnow)
     
     query = relationship("Query", back_populates="insight")
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_conversation_created", "conversation_id", "created_at"),
+    )
     
     comment_id = Column(String, primary_key=True, default=generate_uuid)
     conversation_id = Column(String, ForeignKey("conversations.conversation_id"))
@@ -71,9 +88,26 @@ class Comment(Base):
 
 class Reaction(Base):
     __tablename__ = "reactions"
+    __table_args__ = (
+        # One reaction per user per conversation; also serves the upsert lookup
+        Index("uq_reactions_conversation_user", "conversation_id", "user_id", unique=True),
+        Index("ix_reactions_user_id", "user_id"),
+    )
     
     reaction_id = Column(String, primary_key=True, default=generate_uuid)
     conversation_id = Column(String, ForeignKey("conversations.conversation_id"))
     user_id = Column(String, ForeignKey("users.user_id"))
     reaction_type = Column(String) # like, helpful, disagree
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    conversation = relationship("Conversation", back_populates="reactions")
+
+class TrainingExample(Base):
+    __tablename__ = "training_examples"
+    
+    # Sequential id so workers can fetch just the examples added since their last sync
+    example_id = Column(Integer, primary_key=True, autoincrement=True)
+    category = Column(String, index=True)
+    text = Column(Text)
+    user_id = Column(String, ForeignKey("users.user_id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
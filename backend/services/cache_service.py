@@ -0,0 +1,321 @@
+"""
+Response cache for SAP AI Assistant
+Remembers analyses by normalized question and classifier corpus version,
+grouped by ML category and priority, so repeat (or near-identical) questions skip the ML pipeline and the
+paid LLM call. In-memory LRU with TTL and a size cap, optionally backed by a
+SQLite file that survives restarts. Identical questions already being
+analyzed are coalesced into one computation
+"""
+import asyncio
+import copy
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from backend.config import settings, Settings
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", query.lower())).strip()
+
+
+class _Entry:
+    __slots__ = ("response", "vector", "bucket", "expires_at", "size")
+
+    def __init__(self, response: dict, vector, bucket: str, expires_at: float, size: int):
+        self.response = response
+        self.vector = vector
+        self.bucket = bucket
+        self.expires_at = expires_at
+        self.size = size
+
+
+class ResponseCache:
+    """LRU + TTL cache of analysis responses with near-duplicate lookup"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024,
+                 ttl_seconds: float = 3600, similarity_threshold: float = 0.0,
+                 persist_path: str = ""):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # 0 disables near-duplicate matching; only identical normalized questions hit
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "near_hits": 0, "persistent_hits": 0, "misses": 0, "evictions": 0}
+        self._db = None
+        if persist_path:
+            # The file has its own lock so memory hits never wait on disk I/O
+            self._db_lock = threading.Lock()
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    bucket TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_expires ON response_cache (expires_at)")
+            self._db.commit()
+            # put() is called from the event loop, so rows are written behind it
+            self._writes: "queue.Queue[Optional[tuple]]" = queue.Queue()
+            self._writer = threading.Thread(target=self._write_behind, name="response-cache-writer", daemon=True)
+            self._writer.start()
+
+    @staticmethod
+    def make_bucket(category: str, priority: str) -> str:
+        return f"{category}|{priority}"
+
+    @staticmethod
+    def make_key(query: str, version: str = "") -> str:
+        """Normalized question, prefixed by the classifier's corpus version"""
+        return f"{version}|{normalize_query(query)}" if version else normalize_query(query)
+
+    def get(self, query: str, version: str = "") -> Optional[dict]:
+        """Cached response for exactly this (normalized) question, or None.
+
+        The ML category and priority are functions of the normalized text and
+        the classifier's training corpus, so keyed on both (version is
+        MLAnalysisService.corpus_version) this tier needs no ML work, and
+        answers filed before a corpus change are never served. Misses are
+        counted by get_similar, which callers run next. A memory miss reads
+        the SQLite file, so call this from a worker thread.
+        """
+        key = self.make_key(query, version)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at <= now:
+                self._remove(key)
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return copy.deepcopy(entry.response)
+        if self._db is None:
+            return None
+
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT response, bucket, expires_at FROM response_cache WHERE cache_key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        if row is None:
+            return None
+        response = json.loads(row[0])
+        with self._lock:
+            self._store(key, _Entry(response, None, row[1], row[2], len(row[0])))
+            self._counters["persistent_hits"] += 1
+        return copy.deepcopy(response)
+
+    def get_similar(self, bucket: str, vector) -> Optional[dict]:
+        """Response for the most similar cached question in the same bucket
+        (category + priority) above the similarity threshold, or None"""
+        now = time.time()
+        with self._lock:
+            near_key = self._nearest(bucket, vector, now) if self.similarity_threshold > 0 else None
+            if near_key is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(near_key)
+            self._counters["near_hits"] += 1
+            return copy.deepcopy(self._entries[near_key].response)
+
+    def put(self, query: str, bucket: str, response: dict, vector=None, version: str = ""):
+        """Store a response for the question under the corpus version it was
+        categorized with. Never blocks on disk: the persistent copy is queued
+        for the writer thread, see flush()"""
+        key = self.make_key(query, version)
+        payload = json.dumps(response, default=str)
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, _Entry(copy.deepcopy(response), vector, bucket, expires_at, len(payload)))
+        if self._db is not None:
+            self._writes.put((key, bucket, payload, expires_at))
+
+    def flush(self):
+        """Wait until queued writes have reached the SQLite file"""
+        if self._db is not None:
+            self._writes.join()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._db is not None:
+            self.flush()
+            with self._db_lock:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+
+    def close(self):
+        """Write out queued responses and stop the writer thread"""
+        if self._db is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            lookups = sum(self._counters[k] for k in ("hits", "near_hits", "persistent_hits", "misses"))
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+            }
+
+    def _nearest(self, bucket: str, vector, now: float) -> Optional[str]:
+        # TF-IDF rows are L2-normalized, so the dot product is the cosine similarity
+        best_key, best_score = None, self.similarity_threshold
+        for key, entry in self._entries.items():
+            if entry.bucket != bucket or entry.vector is None or entry.expires_at <= now:
+                continue
+            score = float(vector.multiply(entry.vector).sum())
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _store(self, key: str, entry: _Entry):
+        if key in self._entries:
+            self._remove(key)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._counters["evictions"] += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _write_behind(self):
+        # Commits whatever has queued up in one transaction and prunes expired
+        # rows with it, so the file only holds answers that can still be served
+        while True:
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._db_lock:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO response_cache (cache_key, bucket, response, expires_at) VALUES (?, ?, ?, ?)",
+                        [row for row in batch if row is not None]
+                    )
+                    self._db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+                    self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Response cache write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+            if None in batch:
+                return
+
+
+class SingleFlight:
+    """Coalesces concurrent identical analyses (same normalized question)
+
+    The first caller runs the computation as a task; callers arriving while
+    it is in flight await the same task and get their own copy of its result.
+    Caller cancellation never cancels the shared task. A streamed analysis
+    registers itself with lead() and resolves the returned future instead.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._counters = {"leaders": 0, "coalesced": 0}
+
+    async def run(self, query: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        key = normalize_query(query)
+        task = self._in_flight.get(key)
+        if task is None:
+            self._counters["leaders"] += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            return copy.deepcopy(await asyncio.shield(task))
+
+        self._counters["coalesced"] += 1
+        response = copy.deepcopy(await asyncio.shield(task))
+        response["query"] = query
+        response["coalesced"] = True
+        return response
+
+    def lead(self, query: str) -> Optional[asyncio.Future]:
+        """Claim the question for a caller that computes it itself.
+
+        Returns a future the caller must resolve with its response; identical
+        run() calls await it meanwhile. Returns None when the question is
+        already in flight, in which case the caller should join it with run().
+        """
+        key = normalize_query(query)
+        if key in self._in_flight:
+            return None
+        self._counters["leaders"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return future
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._counters, "in_flight": len(self._in_flight)}
+
+
+# Singleton instances
+_response_cache = None
+_single_flight = None
+
+
+def get_response_cache(config: Settings = settings) -> Optional[ResponseCache]:
+    """Get or create the response cache (None when RESPONSE_CACHE_ENABLED is off)"""
+    global _response_cache
+    if not config.response_cache_enabled:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            max_entries=config.response_cache_max_entries,
+            max_bytes=config.response_cache_max_mb * 1024 * 1024,
+            ttl_seconds=config.response_cache_ttl_seconds,
+            similarity_threshold=config.response_cache_similarity,
+            persist_path=config.response_cache_path
+        )
+    return _response_cache
+
+
+def close_response_cache():
+    """Write out pending persistent-tier rows (application shutdown)"""
+    global _response_cache
+    if _response_cache is not None:
+        _response_cache.close()
+        _response_cache = None
+
+
+def get_single_flight(config: Settings = settings) -> Optional[SingleFlight]:
+    """Get or create the in-flight request coalescer (None when SINGLE_FLIGHT_ENABLED is off)"""
+    global _single_flight
+    if not config.single_flight_enabled:
+        return None
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
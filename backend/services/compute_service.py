@@ -0,0 +1,179 @@
+"""
+CPU-bound work offload for SAP AI Assistant
+Password hashing and ML scoring run in a pool of warm worker processes
+(COMPUTE_WORKERS > 0), so they use every core instead of contending for the
+GIL with request handling. Each worker loads the ML service and the argon2
+context once at startup. With COMPUTE_WORKERS=0 the work runs inline as before
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from backend.config import settings
+
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+
+
+# --- Task functions (run inside the worker processes, or inline) ---
+
+def _warm_worker():
+    """Pool initializer: pay the classifier and argon2 setup once per worker"""
+    from backend.services.ml_service import get_ml_service, start_example_sync
+    get_ml_service()
+    start_example_sync()
+    pwd_context.hash("warm-up")
+
+
+def _hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_password(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+
+def _analyze_query(query: str):
+    """TF-IDF vector and ML insights for one query (see model_service._prepare_analysis)"""
+    from backend.services.ml_service import get_ml_service
+    ml_service = get_ml_service()
+    vector = ml_service.vectorize(query)
+    return vector, ml_service.generate_ml_insights(query, ml_service.categorize_vector(vector))
+
+
+def _ml_insights_batch(queries: List[str]) -> List[dict]:
+    from backend.services.ml_service import get_ml_service
+    return get_ml_service().generate_ml_insights_batch(queries)
+
+
+# --- Pool ---
+
+class ComputePool:
+    """ProcessPoolExecutor with queue depth and per-task latency counters"""
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._latency: Dict[str, List[float]] = {}  # task -> [count, total_ms, max_ms]
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Spawned, not forked: by the time the pool starts the app has
+                    # open SQLite connections and background threads, neither of
+                    # which may be carried into a child process
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_warm_worker
+                    )
+        return self._executor
+
+    def _replace_broken(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn, *args):
+        """Run fn(*args) in a worker and wait for it (inline when the pool is
+        disabled); called from request threads, which release the GIL while waiting"""
+        started = time.perf_counter()
+        with self._lock:
+            self._pending += 1
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory) and took the pool with
+                # it; start a new one and retry once, the tasks are pure
+                print(f"Compute pool broken, restarting it for {fn.__name__}")
+                self._replace_broken(executor)
+                return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._finish(fn.__name__, started)
+
+    def warm_up(self):
+        """Start every worker now instead of on the first submitted task"""
+        if self.workers > 0:
+            executor = self._get_executor()
+            for future in [executor.submit(time.sleep, 0) for _ in range(self.workers)]:
+                future.result()
+
+    def _finish(self, task: str, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._pending -= 1
+            counters = self._latency.setdefault(task.lstrip("_"), [0, 0.0, 0.0])
+            counters[0] += 1
+            counters[1] += elapsed_ms
+            counters[2] = max(counters[2], elapsed_ms)
+
+    def stats(self) -> dict:
+        """Queue depth (calls waiting or running) and latency per task, queueing included"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self._pending,
+                "tasks": {
+                    task: {"count": count, "avg_ms": round(total / count, 3), "max_ms": round(peak, 3)}
+                    for task, (count, total, peak) in self._latency.items()
+                },
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool: Optional[ComputePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_compute_pool() -> ComputePool:
+    """Process-wide pool sized from COMPUTE_WORKERS"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ComputePool(settings.compute_workers)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+# --- Public helpers ---
+
+def hash_password(password: str) -> str:
+    return get_compute_pool().run(_hash_password, password)
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return get_compute_pool().run(_verify_password, password, hashed)
+
+
+def analyze_query(query: str) -> Tuple[object, dict]:
+    """(TF-IDF vector, ml_insights) for a query"""
+    return get_compute_pool().run(_analyze_query, query)
+
+
+def ml_insights_batch(queries: List[str]) -> List[dict]:
+    return get_compute_pool().run(_ml_insights_batch, queries)
@@ -1,22 +1,71 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
+import asyncio
+import base64
+import re
+from contextlib import contextmanager
 import uuid
-from sqlalchemy.orm import Session
-from ..database import SessionLocal, engine
-from ..models import Base, User, Conversation, Query, Insight, Comment, Reaction
-from passlib.context import CryptContext
+from sqlalchemy import select, func, text
+from sqlalchemy.orm import Session, selectinload
+from ..database import SessionLocal, engine, get_async_sessionmaker
+from ..models import Base, User, Conversation, Query, Insight, Comment, Reaction, TrainingExample
+from ..migrations import run_migrations
+from .compute_service import hash_password, verify_password
+from .events_service import publish_after_commit
 
-# Create tables
-Base.metadata.create_all(bind=engine)
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+def init_db(bind=engine) -> int:
+    """Create tables, then bring older databases up to the current schema
+    version; run once from the app's startup hook. Returns the schema version"""
+    Base.metadata.create_all(bind=bind)
+    return run_migrations(bind)
 
-# --- User Management ---
-
-def create_user(name: str, role: str, department: str, email: str, password: str = "password123") -> dict:
+@contextmanager
+def _session_scope(db: Optional[Session] = None):
+    # With a caller-supplied (request-scoped) session the caller owns the
+    # unit of work: we only flush and it commits once at the end. Without one,
+    # the call runs in its own short transaction as before.
+    if db is not None:
+        yield db
+        return
     db = SessionLocal()
     try:
-        hashed_password = pwd_context.hash(password)
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def run_in_session(fn, *args, **kwargs):
+    """Run fn(db, *args, **kwargs) as one unit of work from async code.
+
+    Uses the async engine (the sync db_service code runs through
+    AsyncSession.run_sync, so I/O goes over the async driver); without an
+    async driver installed it falls back to a worker thread.
+    """
+    try:
+        async_session_factory = get_async_sessionmaker()
+    except RuntimeError:
+        async_session_factory = None
+    
+    if async_session_factory is not None:
+        async with async_session_factory() as async_db:
+            result = await async_db.run_sync(fn, *args, **kwargs)
+            await async_db.commit()
+            return result
+    
+    def _run():
+        with _session_scope() as db:
+            return fn(db, *args, **kwargs)
+    return await asyncio.to_thread(_run)
+
+# --- User Management ---
+
+def create_user(name: str, role: str, department: str, email: str, password: str = "password123", db: Optional[Session] = None) -> dict:
+    with _session_scope(db) as db:
+        hashed_password = hash_password(password)
         db_user = User(
             name=name,
             role=role,
@@ -25,8 +74,7 @@ def create_user(name: str, role: str, department: str, email: str, password: str
             password=hashed_password
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        db.flush()
         return {
             "user_id": db_user.user_id,
             "name": db_user.name,
@@ -36,14 +84,11 @@ def create_user(name: str, role: str, department: str, email: str, password: str
             "password": db_user.password, # Return hash for internal use/verification
             "created_at": db_user.created_at.isoformat()
         }
-    finally:
-        db.close()
 
-def validate_user(email: str, password: str) -> Optional[dict]:
-    db = SessionLocal()
-    try:
+def validate_user(email: str, password: str, db: Optional[Session] = None) -> Optional[dict]:
+    with _session_scope(db) as db:
         db_user = db.query(User).filter(User.email == email).first()
-        if not db_user or not pwd_context.verify(password, db_user.password):
+        if not db_user or not verify_password(password, db_user.password):
             return None
         return {
             "user_id": db_user.user_id,
@@ -52,12 +97,9 @@ def validate_user(email: str, password: str) -> Optional[dict]:
             "department": db_user.department,
             "email": db_user.email
         }
-    finally:
-        db.close()
 
-def get_user(user_id: str) -> Optional[dict]:
-    db = SessionLocal()
-    try:
+def get_user(user_id: str, db: Optional[Session] = None) -> Optional[dict]:
+    with _session_scope(db) as db:
         db_user = db.query(User).filter(User.user_id == user_id).first()
         if not db_user:
             return None
@@ -68,22 +110,18 @@ def get_user(user_id: str) -> Optional[dict]:
             "department": db_user.department,
             "email": db_user.email
         }
-    finally:
-        db.close()
 
 # --- Conversation Management ---
 
-def create_conversation(user_id: str, title: str, visibility: str = "department") -> dict:
-    db = SessionLocal()
-    try:
+def create_conversation(user_id: str, title: str, visibility: str = "department", db: Optional[Session] = None) -> dict:
+    with _session_scope(db) as db:
         db_conv = Conversation(
             user_id=user_id,
             title=title,
             visibility=visibility
         )
         db.add(db_conv)
-        db.commit()
-        db.refresh(db_conv)
+        db.flush()
         return {
             "conversation_id": db_conv.conversation_id,
             "user_id": db_conv.user_id,
@@ -92,12 +130,9 @@ def create_conversation(user_id: str, title: str, visibility: str = "department"
             "status": db_conv.status,
             "created_at": db_conv.created_at.isoformat()
         }
-    finally:
-        db.close()
 
-def get_conversation(conversation_id: str) -> Optional[dict]:
-    db = SessionLocal()
-    try:
+def get_conversation(conversation_id: str, db: Optional[Session] = None) -> Optional[dict]:
+    with _session_scope(db) as db:
         db_conv = db.query(Conversation).filter(Conversation.conversation_id == conversation_id).first()
         if not db_conv:
             return None
@@ -109,79 +144,186 @@ def get_conversation(conversation_id: str) -> Optional[dict]:
             "status": db_conv.status,
             "created_at": db_conv.created_at.isoformat()
         }
-    finally:
-        db.close()
 
-def get_user_conversations(user_id: str) -> List[dict]:
-    db = SessionLocal()
-    try:
-        conversations = db.query(Conversation, User.name).join(User, Conversation.user_id == User.user_id).filter(Conversation.user_id == user_id).all()
-        return [{
-            "conversation_id": c.Conversation.conversation_id,
-            "user_id": c.Conversation.user_id,
-            "creator_name": c.name,
-            "title": c.Conversation.title,
-            "visibility": c.Conversation.visibility,
-            "status": c.Conversation.status,
-            "created_at": c.Conversation.created_at.isoformat()
-        } for c in conversations]
-    finally:
-        db.close()
+def get_conversation_detail(conversation_id: str, db: Optional[Session] = None) -> Optional[dict]:
+    # Eager-load the whole thread through the declared relationships: a fixed
+    # number of statements (conversation, queries+insights, comments+authors,
+    # reactions) no matter how many rows the conversation has.
+    with _session_scope(db) as db:
+        db_conv = db.query(Conversation).options(
+            selectinload(Conversation.queries).joinedload(Query.insight),
+            selectinload(Conversation.comments).joinedload(Comment.user),
+            selectinload(Conversation.reactions)
+        ).filter(Conversation.conversation_id == conversation_id).first()
+        if not db_conv:
+            return None
+        
+        queries = []
+        for q in db_conv.queries:
+            insight = None
+            if q.insight:
+                insight = {
+                    "insight_id": q.insight.insight_id,
+                    "query_id": q.insight.query_id,
+                    "response": q.insight.response,
+                    "status": q.insight.status,
+                    "created_at": q.insight.created_at.isoformat()
+                }
+            queries.append({
+                "query_id": q.query_id,
+                "conversation_id": q.conversation_id,
+                "user_id": q.user_id,
+                "question": q.question,
+                "created_at": q.created_at.isoformat(),
+                "insight": insight
+            })
+        
+        comments = []
+        for c in db_conv.comments:
+            user = None
+            if c.user:
+                user = {
+                    "user_id": c.user.user_id,
+                    "name": c.user.name,
+                    "role": c.user.role,
+                    "department": c.user.department,
+                    "email": c.user.email
+                }
+            comments.append({
+                "comment_id": c.comment_id,
+                "conversation_id": c.conversation_id,
+                "user_id": c.user_id,
+                "content": c.content,
+                "created_at": c.created_at.isoformat(),
+                "user": user
+            })
+        
+        return {
+            "conversation": {
+                "conversation_id": db_conv.conversation_id,
+                "user_id": db_conv.user_id,
+                "title": db_conv.title,
+                "visibility": db_conv.visibility,
+                "status": db_conv.status,
+                "created_at": db_conv.created_at.isoformat()
+            },
+            "queries": queries,
+            "comments": comments,
+            "reactions": [{
+                "reaction_id": r.reaction_id,
+                "conversation_id": r.conversation_id,
+                "user_id": r.user_id,
+                "reaction_type": r.reaction_type
+            } for r in db_conv.reactions]
+        }
 
-def get_shared_conversations(user_id: str, department: Optional[str] = None) -> List[dict]:
-    db = SessionLocal()
+CONVERSATION_LIST_FIELDS = (
+    "conversation_id", "user_id", "creator_name", "title", "visibility",
+    "status", "created_at", "comment_count", "query_count"
+)
+
+def encode_conversation_cursor(created_at: str, conversation_id: str) -> str:
+    raw = f"{created_at}|{conversation_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_conversation_cursor(cursor: str) -> Tuple[datetime, str]:
     try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, conversation_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), conversation_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _conversation_list_query(db: Session, fields: Optional[List[str]] = None):
+    columns = [Conversation, User.name]
+    # Counts come from correlated scalar subqueries so the list is a single
+    # statement instead of loading every comment/query row just to len() it.
+    # They are skipped entirely when a sparse fieldset doesn't ask for them.
+    if fields is None or "comment_count" in fields:
+        columns.append(select(func.count(Comment.comment_id)).where(
+            Comment.conversation_id == Conversation.conversation_id
+        ).correlate(Conversation).scalar_subquery().label("comment_count"))
+    if fields is None or "query_count" in fields:
+        columns.append(select(func.count(Query.query_id)).where(
+            Query.conversation_id == Conversation.conversation_id
+        ).correlate(Conversation).scalar_subquery().label("query_count"))
+    return db.query(*columns).join(User, Conversation.user_id == User.user_id)
+
+def _paginate_conversations(query, limit: Optional[int], cursor: Optional[str]):
+    # Keyset pagination, newest first, on (created_at, conversation_id)
+    if cursor:
+        cursor_created_at, cursor_id = decode_conversation_cursor(cursor)
+        query = query.filter(
+            (Conversation.created_at < cursor_created_at) |
+            ((Conversation.created_at == cursor_created_at) & (Conversation.conversation_id < cursor_id))
+        )
+    query = query.order_by(Conversation.created_at.desc(), Conversation.conversation_id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def _conversation_list_item(row, fields: Optional[List[str]] = None) -> dict:
+    item = {
+        "conversation_id": row.Conversation.conversation_id,
+        "user_id": row.Conversation.user_id,
+        "creator_name": row.name,
+        "title": row.Conversation.title,
+        "visibility": row.Conversation.visibility,
+        "status": row.Conversation.status,
+        "created_at": row.Conversation.created_at.isoformat(),
+        "comment_count": getattr(row, "comment_count", None),
+        "query_count": getattr(row, "query_count", None)
+    }
+    if fields is None:
+        return item
+    # conversation_id and created_at are always kept so callers can build the next cursor
+    return {k: v for k, v in item.items() if k in fields or k in ("conversation_id", "created_at")}
+
+def get_user_conversations(user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                           fields: Optional[List[str]] = None, db: Optional[Session] = None) -> List[dict]:
+    with _session_scope(db) as db:
+        query = _conversation_list_query(db, fields).filter(Conversation.user_id == user_id)
+        conversations = _paginate_conversations(query, limit, cursor).all()
+        return [_conversation_list_item(c, fields) for c in conversations]
+
+def get_shared_conversations(user_id: str, department: Optional[str] = None, limit: Optional[int] = None,
+                             cursor: Optional[str] = None, fields: Optional[List[str]] = None, db: Optional[Session] = None) -> List[dict]:
+    with _session_scope(db) as db:
         # Visibility logic:
         # public: everyone
         # department: same department as creator
         # private/active: creator only
-        query = db.query(Conversation, User.name).join(User, Conversation.user_id == User.user_id).filter(
+        query = _conversation_list_query(db, fields).filter(
             (Conversation.visibility == "public") | 
             (Conversation.user_id == user_id) |
             ((Conversation.visibility == "department") & (User.department == department))
         )
-        conversations = query.all()
-        return [{
-            "conversation_id": c.Conversation.conversation_id,
-            "user_id": c.Conversation.user_id,
-            "creator_name": c.name,
-            "title": c.Conversation.title,
-            "visibility": c.Conversation.visibility,
-            "status": c.Conversation.status,
-            "created_at": c.Conversation.created_at.isoformat()
-        } for c in conversations]
-    finally:
-        db.close()
+        conversations = _paginate_conversations(query, limit, cursor).all()
+        return [_conversation_list_item(c, fields) for c in conversations]
 
-def update_conversation_status(conversation_id: str, status: str) -> Optional[dict]:
-    db = SessionLocal()
-    try:
+def update_conversation_status(conversation_id: str, status: str, db: Optional[Session] = None) -> Optional[dict]:
+    with _session_scope(db) as db:
         db_conv = db.query(Conversation).filter(Conversation.conversation_id == conversation_id).first()
         if not db_conv:
             return None
         db_conv.status = status
-        db.commit()
-        db.refresh(db_conv)
+        db.flush()
         return {
             "conversation_id": db_conv.conversation_id,
             "status": db_conv.status
         }
-    finally:
-        db.close()
 
 # --- Query & Insight Operations ---
 
-def create_query(conversation_id: str, user_id: str, question: str) -> dict:
-    db = SessionLocal()
-    try:
+def create_query(conversation_id: str, user_id: str, question: str, db: Optional[Session] = None) -> dict:
+    with _session_scope(db) as db:
         db_query = Query(
             conversation_id=conversation_id,
             user_id=user_id,
             question=question
         )
         db.add(db_query)
-        db.commit()
-        db.refresh(db_query)
+        db.flush()
         return {
             "query_id": db_query.query_id,
             "conversation_id": db_query.conversation_id,
@@ -189,12 +331,9 @@ def create_query(conversation_id: str, user_id: str, question: str) -> dict:
             "question": db_query.question,
             "created_at": db_query.created_at.isoformat()
         }
-    finally:
-        db.close()
 
-def get_conversation_queries(conversation_id: str) -> List[dict]:
-    db = SessionLocal()
-    try:
+def get_conversation_queries(conversation_id: str, db: Optional[Session] = None) -> List[dict]:
+    with _session_scope(db) as db:
         queries = db.query(Query).filter(Query.conversation_id == conversation_id).all()
         return [{
             "query_id": q.query_id,
@@ -203,31 +342,67 @@ def get_conversation_queries(conversation_id: str) -> List[dict]:
             "question": q.question,
             "created_at": q.created_at.isoformat()
         } for q in queries]
-    finally:
-        db.close()
 
-def create_insight(query_id: str, response: str) -> dict:
-    db = SessionLocal()
-    try:
+def create_insight(query_id: str, response: str, db: Optional[Session] = None, status: str = "ready") -> dict:
+    with _session_scope(db) as db:
         db_insight = Insight(
             query_id=query_id,
-            response=response
+            response=response,
+            status=status
         )
         db.add(db_insight)
-        db.commit()
-        db.refresh(db_insight)
+        db.flush()
+        insight = {
+            "insight_id": db_insight.insight_id,
+            "query_id": db_insight.query_id,
+            "response": db_insight.response,
+            "status": db_insight.status,
+            "created_at": db_insight.created_at.isoformat()
+        }
+        db_query = db.get(Query, query_id)
+        publish_after_commit(db, db_query and db_query.conversation_id, "insight", insight)
+        return insight
+
+def complete_insight(insight_id: str, response: str, status: str = "ready", db: Optional[Session] = None) -> bool:
+    """Fill in a pending insight; returns False if it no longer exists"""
+    with _session_scope(db) as db:
+        db_insight = db.query(Insight).filter(Insight.insight_id == insight_id).first()
+        if not db_insight:
+            return False
+        db_insight.response = response
+        db_insight.status = status
+        publish_after_commit(db, db_insight.query.conversation_id, "insight", {
+            "insight_id": db_insight.insight_id,
+            "query_id": db_insight.query_id,
+            "response": db_insight.response,
+            "status": db_insight.status,
+            "created_at": db_insight.created_at.isoformat()
+        })
+        return True
+
+def get_insight(insight_id: str, db: Optional[Session] = None) -> Optional[dict]:
+    with _session_scope(db) as db:
+        db_insight = db.query(Insight).filter(Insight.insight_id == insight_id).first()
+        if not db_insight:
+            return None
         return {
             "insight_id": db_insight.insight_id,
             "query_id": db_insight.query_id,
             "response": db_insight.response,
+            "status": db_insight.status,
             "created_at": db_insight.created_at.isoformat()
         }
-    finally:
-        db.close()
 
-def get_query_insight(query_id: str) -> Optional[dict]:
-    db = SessionLocal()
-    try:
+def get_pending_insights(db: Optional[Session] = None) -> List[Tuple[str, str]]:
+    """(insight_id, question) for every insight still waiting on a background job"""
+    with _session_scope(db) as db:
+        rows = db.query(Insight.insight_id, Query.question).join(Query, Insight.query_id == Query.query_id).filter(
+            Insight.status == "pending"
+        ).all()
+        return [(insight_id, question) for insight_id, question in rows]
+
+def get_query_insight(query_id: str, db: Optional[Session] = None) -> Optional[dict]:
+    with _session_scope(db) as db:
         db_insight = db.query(Insight).filter(Insight.query_id == query_id).first()
         if not db_insight:
             return None
@@ -235,37 +410,124 @@ def get_query_insight(query_id: str) -> Optional[dict]:
             "insight_id": db_insight.insight_id,
             "query_id": db_insight.query_id,
             "response": db_insight.response,
+            "status": db_insight.status,
             "created_at": db_insight.created_at.isoformat()
         }
-    finally:
-        db.close()
 
-# --- Comment Operations ---
+# --- Search ---
 
-def create_comment(conversation_id: str, user_id: str, content: str) -> dict:
-    db = SessionLocal()
+_SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+def fts_query(search: str) -> str:
+    """User input as an FTS5 query: every word must match (the last one as a
+    prefix, for search-as-you-type); operators and quotes are not interpreted"""
+    terms = _SEARCH_TERM.findall(search)
+    if not terms:
+        return ""
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+def search_available(db: Optional[Session] = None) -> bool:
+    """Whether the FTS5 index exists (SQLite with FTS5, migration 3 applied)"""
+    with _session_scope(db) as db:
+        if db.get_bind().dialect.name != "sqlite":
+            return False
+        return db.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+        )).first() is not None
+
+# Search cursors are keyset on (bm25 score, doc_id). bm25 depends on corpus
+# statistics (document count, average length, term frequencies), so a write
+# between two page requests shifts scores and a later page can skip or repeat
+# a result near the page boundary. That is acceptable for interactive search;
+# callers needing an exact listing should fetch a single larger page.
+def encode_search_cursor(score: float, doc_id: int) -> str:
+    raw = f"{score!r}|{doc_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
     try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        score, doc_id = raw.split("|", 1)
+        return float(score), int(doc_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def search_content(user_id: str, search_text: str, department: Optional[str] = None, kinds: Optional[List[str]] = None,
+           limit: int = 20, cursor: Optional[str] = None, db: Optional[Session] = None) -> List[dict]:
+    """Questions, insights and comments matching the search, best bm25 match
+    first, limited to conversations the user may see (same rules as
+    get_shared_conversations). Pages are keyset on (score, doc_id); see the
+    note above encode_search_cursor on their stability."""
+    match = fts_query(search_text)
+    if not match:
+        return []
+    params = {"match": match, "user_id": user_id, "department": department, "limit": limit}
+    filters = ""
+    if kinds:
+        filters += " AND search_docs.kind IN (" + ", ".join(f":kind_{i}" for i in range(len(kinds))) + ")"
+        params.update({f"kind_{i}": kind for i, kind in enumerate(kinds)})
+    if cursor:
+        params["cursor_score"], params["cursor_doc_id"] = decode_search_cursor(cursor)
+        filters += (" AND (bm25(search_index) > :cursor_score"
+                    " OR (bm25(search_index) = :cursor_score AND search_docs.doc_id > :cursor_doc_id))")
+    
+    with _session_scope(db) as db:
+        rows = db.execute(text(f"""
+            SELECT search_docs.doc_id, search_docs.kind, search_docs.source_id, search_docs.conversation_id,
+                   conversations.title, bm25(search_index) AS score,
+                   snippet(search_index, 0, '<mark>', '</mark>', '…', 16) AS snippet
+            FROM search_index
+            JOIN search_docs ON search_docs.doc_id = search_index.rowid
+            JOIN conversations ON conversations.conversation_id = search_docs.conversation_id
+            JOIN users ON users.user_id = conversations.user_id
+            WHERE search_index MATCH :match
+              AND (conversations.visibility = 'public'
+                   OR conversations.user_id = :user_id
+                   OR (conversations.visibility = 'department' AND users.department = :department)){filters}
+            ORDER BY score, search_docs.doc_id
+            LIMIT :limit
+        """), params).fetchall()
+        return [{
+            "doc_id": row.doc_id,
+            "kind": row.kind,
+            "id": row.source_id,
+            "conversation_id": row.conversation_id,
+            "conversation_title": row.title,
+            "snippet": row.snippet,
+            "score": row.score
+        } for row in rows]
+
+# --- Comment Operations ---
+
+def create_comment(conversation_id: str, user_id: str, content: str, db: Optional[Session] = None) -> dict:
+    with _session_scope(db) as db:
         db_comment = Comment(
             conversation_id=conversation_id,
             user_id=user_id,
             content=content
         )
         db.add(db_comment)
-        db.commit()
-        db.refresh(db_comment)
-        return {
+        db.flush()
+        comment = {
             "comment_id": db_comment.comment_id,
             "conversation_id": db_comment.conversation_id,
             "user_id": db_comment.user_id,
             "content": db_comment.content,
             "created_at": db_comment.created_at.isoformat()
         }
-    finally:
-        db.close()
+        # Same shape as in get_conversation_detail, so clients can render it directly
+        author = db.get(User, user_id)
+        publish_after_commit(db, conversation_id, "comment", {**comment, "user": author and {
+            "user_id": author.user_id,
+            "name": author.name,
+            "role": author.role,
+            "department": author.department,
+            "email": author.email
+        }})
+        return comment
 
-def get_conversation_comments(conversation_id: str) -> List[dict]:
-    db = SessionLocal()
-    try:
+def get_conversation_comments(conversation_id: str, db: Optional[Session] = None) -> List[dict]:
+    with _session_scope(db) as db:
         comments = db.query(Comment).filter(Comment.conversation_id == conversation_id).all()
         return [{
             "comment_id": c.comment_id,
@@ -274,26 +536,21 @@ def get_conversation_comments(conversation_id: str) -> List[dict]:
             "content": c.content,
             "created_at": c.created_at.isoformat()
         } for c in comments]
-    finally:
-        db.close()
 
-def delete_comment(comment_id: str, user_id: str) -> bool:
-    db = SessionLocal()
-    try:
+def delete_comment(comment_id: str, user_id: str, db: Optional[Session] = None) -> bool:
+    with _session_scope(db) as db:
         db_comment = db.query(Comment).filter(Comment.comment_id == comment_id, Comment.user_id == user_id).first()
         if not db_comment:
             return False
         db.delete(db_comment)
-        db.commit()
+        db.flush()
+        publish_after_commit(db, db_comment.conversation_id, "comment_deleted", {"comment_id": comment_id})
         return True
-    finally:
-        db.close()
 
 # --- Reaction Operations ---
 
-def add_reaction(conversation_id: str, user_id: str, reaction_type: str) -> dict:
-    db = SessionLocal()
-    try:
+def add_reaction(conversation_id: str, user_id: str, reaction_type: str, db: Optional[Session] = None) -> dict:
+    with _session_scope(db) as db:
         # Check if reaction already exists
         db_reaction = db.query(Reaction).filter(
             Reaction.conversation_id == conversation_id,
@@ -310,20 +567,18 @@ def add_reaction(conversation_id: str, user_id: str, reaction_type: str) -> dict
             )
             db.add(db_reaction)
         
-        db.commit()
-        db.refresh(db_reaction)
-        return {
+        db.flush()
+        reaction = {
             "reaction_id": db_reaction.reaction_id,
             "conversation_id": db_reaction.conversation_id,
             "user_id": db_reaction.user_id,
             "reaction_type": db_reaction.reaction_type
         }
-    finally:
-        db.close()
+        publish_after_commit(db, conversation_id, "reaction", reaction)
+        return reaction
 
-def remove_reaction(conversation_id: str, user_id: str) -> bool:
-    db = SessionLocal()
-    try:
+def remove_reaction(conversation_id: str, user_id: str, db: Optional[Session] = None) -> bool:
+    with _session_scope(db) as db:
         db_reaction = db.query(Reaction).filter(
             Reaction.conversation_id == conversation_id,
             Reaction.user_id == user_id
@@ -333,14 +588,12 @@ def remove_reaction(conversation_id: str, user_id: str) -> bool:
             return False
         
         db.delete(db_reaction)
-        db.commit()
+        db.flush()
+        publish_after_commit(db, conversation_id, "reaction_removed", {"user_id": user_id})
         return True
-    finally:
-        db.close()
 
-def get_conversation_reactions(conversation_id: str) -> List[dict]:
-    db = SessionLocal()
-    try:
+def get_conversation_reactions(conversation_id: str, db: Optional[Session] = None) -> List[dict]:
+    with _session_scope(db) as db:
         reactions = db.query(Reaction).filter(Reaction.conversation_id == conversation_id).all()
         return [{
             "reaction_id": r.reaction_id,
@@ -348,5 +601,27 @@ def get_conversation_reactions(conversation_id: str) -> List[dict]:
             "user_id": r.user_id,
             "reaction_type": r.reaction_type
         } for r in reactions]
-    finally:
-        db.close()
+
+# --- Classifier Training Examples ---
+
+def create_training_examples(category: str, texts: List[str], user_id: Optional[str] = None, db: Optional[Session] = None) -> List[dict]:
+    with _session_scope(db) as db:
+        examples = [TrainingExample(category=category, text=text, user_id=user_id) for text in texts]
+        db.add_all(examples)
+        db.flush()
+        return [{
+            "example_id": e.example_id,
+            "category": e.category,
+            "text": e.text,
+            "user_id": e.user_id
+        } for e in examples]
+
+def get_training_examples(after_id: int = 0, db: Optional[Session] = None) -> List[dict]:
+    # Oldest first, so callers can resume from the last example_id they saw
+    with _session_scope(db) as db:
+        examples = db.execute(
+            select(TrainingExample.example_id, TrainingExample.category, TrainingExample.text)
+            .where(TrainingExample.example_id > after_id)
+            .order_by(TrainingExample.example_id)
+        ).all()
+        return [{"example_id": e.example_id, "category": e.category, "text": e.text} for e in examples]
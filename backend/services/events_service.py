@@ -0,0 +1,243 @@
+"""
+Conversation event push for SAP AI Assistant
+db_service queues a small delta (new comment, reaction change, insight) on
+the session and publishes it once the transaction commits. The hub hands it
+to every WebSocket subscribed to that conversation in this process; the
+fan-out decides how events reach the other worker processes:
+  local  - single process, delivered in memory
+  sqlite - events go through a shared SQLite file that every worker polls
+"""
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.config import settings, Settings
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class EventHub:
+    """Per-conversation subscriber queues in this process"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.fanout = None
+
+    @asynccontextmanager
+    async def subscribe(self, conversation_id: str):
+        """Queue of events for the conversation while the block runs"""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers[conversation_id].add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers[conversation_id].discard(subscriber)
+                if not self._subscribers[conversation_id]:
+                    del self._subscribers[conversation_id]
+
+    def publish(self, conversation_id: str, payload: dict):
+        self.fanout.publish(conversation_id, payload)
+
+    def deliver(self, conversation_id: str, payload: dict):
+        """Hand an event to local subscribers (callable from any thread)"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(conversation_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_offer, queue, payload)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+def _offer(queue: asyncio.Queue, payload: dict):
+    try:
+        queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        # Slow client: drop the backlog and have it refetch the conversation
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"type": "resync"})
+
+
+class LocalFanOut:
+    """Single-process delivery"""
+
+    def __init__(self, hub: EventHub):
+        self.hub = hub
+
+    def publish(self, conversation_id: str, payload: dict):
+        self.hub.deliver(conversation_id, payload)
+
+    def close(self):
+        pass
+
+
+class SQLiteFanOut:
+    """Cross-process delivery through a shared SQLite file: publishers append
+    rows, a poller thread in every worker delivers rows newer than the last
+    one it saw, and rows older than retention_seconds are pruned.
+    publish() runs in the commit listener, often on the event loop, so the
+    rows are appended by a writer thread"""
+
+    def __init__(self, hub: EventHub, path: str, poll_interval: float = 0.2, retention_seconds: float = 60):
+        self.hub = hub
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS conversation_events (
+                event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        # Only events published after this worker started are delivered
+        self._last_id = self._db.execute("SELECT COALESCE(MAX(event_id), 0) FROM conversation_events").fetchone()[0]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._poll, name="events-fanout", daemon=True)
+        self._thread.start()
+        self._outbox: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write, name="events-fanout-writer", daemon=True)
+        self._writer.start()
+
+    def publish(self, conversation_id: str, payload: dict):
+        self._outbox.put((conversation_id, json.dumps(payload, default=str), time.time()))
+
+    def flush(self):
+        """Wait until published events are in the file"""
+        self._outbox.join()
+
+    def poll_once(self) -> int:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT event_id, conversation_id, payload FROM conversation_events WHERE event_id > ? ORDER BY event_id",
+                (self._last_id,)
+            ).fetchall()
+            if rows:
+                self._last_id = rows[-1][0]
+        for _, conversation_id, payload in rows:
+            self.hub.deliver(conversation_id, json.loads(payload))
+        return len(rows)
+
+    def _poll(self):
+        last_prune = 0.0
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll_once()
+                if time.monotonic() - last_prune > self.retention_seconds:
+                    with self._lock:
+                        self._db.execute("DELETE FROM conversation_events WHERE created_at < ?",
+                                         (time.time() - self.retention_seconds,))
+                    last_prune = time.monotonic()
+            except sqlite3.Error as e:
+                print(f"Event fan-out poll failed: {e}")
+
+    def _write(self):
+        while True:
+            batch = [self._outbox.get()]
+            while True:
+                try:
+                    batch.append(self._outbox.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._lock:
+                    self._db.executemany(
+                        "INSERT INTO conversation_events (conversation_id, payload, created_at) VALUES (?, ?, ?)",
+                        [row for row in batch if row is not None]
+                    )
+            except sqlite3.Error as e:
+                print(f"Event fan-out publish failed: {e}")
+            finally:
+                for _ in batch:
+                    self._outbox.task_done()
+            if None in batch:
+                return
+
+    def close(self):
+        self._outbox.put(None)
+        self._writer.join()
+        self._stop.set()
+        self._thread.join()
+        self._db.close()
+
+
+FANOUTS = ("local", "sqlite")
+
+
+def create_hub(config: Settings = settings) -> EventHub:
+    hub = EventHub()
+    if config.events_fanout == "local":
+        hub.fanout = LocalFanOut(hub)
+    elif config.events_fanout == "sqlite":
+        hub.fanout = SQLiteFanOut(hub, config.events_fanout_path)
+    else:
+        raise ValueError(f"Unknown EVENTS_FANOUT {config.events_fanout!r}, expected one of {FANOUTS}")
+    return hub
+
+
+# Singleton instance
+_hub: Optional[EventHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_event_hub() -> EventHub:
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = create_hub()
+    return _hub
+
+
+def close_event_hub():
+    global _hub
+    with _hub_lock:
+        hub, _hub = _hub, None
+    if hub is not None:
+        hub.fanout.close()
+
+
+# --- Publish on commit ---
+
+def publish_after_commit(db: Session, conversation_id: Optional[str], event_type: str, data: dict):
+    """Queue an event on the session; it is published only if the
+    transaction commits, and dropped on rollback"""
+    if conversation_id:
+        db.info.setdefault("conversation_events", []).append(
+            (conversation_id, {"type": event_type, "conversation_id": conversation_id, "data": data})
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session):
+    pending = session.info.pop("conversation_events", None)
+    if not pending:
+        return
+    hub = get_event_hub()
+    for conversation_id, payload in pending:
+        try:
+            hub.publish(conversation_id, payload)
+        except Exception as e:
+            print(f"Could not publish {payload['type']} event: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop("conversation_events", None)
@@ -0,0 +1,214 @@
+"""
+Background insight jobs for SAP AI Assistant
+With INSIGHT_MODE=background the query and a pending insight are committed
+right away and the analysis runs here: jobs sit in a local SQLite queue
+(survives restarts, shared by all workers on the host), a fixed number of
+async workers per process run them, and failures are retried with backoff
+before the insight is marked failed
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from backend.config import settings, Settings
+
+
+class InsightJobQueue:
+    """Persistent queue of insight jobs with leases, retries and a concurrency limit"""
+
+    def __init__(self, path: str, concurrency: int = 4, max_attempts: int = 3,
+                 retry_base_seconds: float = 2.0, lease_seconds: float = 300.0):
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS insight_jobs (
+                job_id TEXT PRIMARY KEY,
+                insight_id TEXT NOT NULL UNIQUE,
+                question TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_insight_jobs_status_run_at ON insight_jobs (status, run_at)")
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers = []
+        self._counters = {"completed": 0, "retried": 0, "failed": 0}
+
+    def enqueue(self, insight_id: str, question: str) -> str:
+        """Queue the analysis for a pending insight (once per insight).
+        Blocking; async callers run it with asyncio.to_thread"""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO insight_jobs (job_id, insight_id, question, status, run_at, created_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, insight_id, question, now, now)
+            )
+        if self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    def claim(self) -> Optional[tuple]:
+        """Take the next due job (or one whose worker's lease expired); (job_id, insight_id, question, attempts)"""
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE: workers in other processes can't claim the same row
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT job_id, insight_id, question, attempts FROM insight_jobs "
+                    "WHERE status IN ('queued', 'running') AND run_at <= ? ORDER BY run_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row:
+                    self._db.execute(
+                        "UPDATE insight_jobs SET status = 'running', attempts = attempts + 1, run_at = ? WHERE job_id = ?",
+                        (now + self.lease_seconds, row[0])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return row and (row[0], row[1], row[2], row[3] + 1)
+
+    def renew(self, job_id: str):
+        """Extend a running job's lease so no other worker reclaims it"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE insight_jobs SET run_at = ? WHERE job_id = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, job_id)
+            )
+
+    def complete(self, job_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM insight_jobs WHERE job_id = ?", (job_id,))
+            self._counters["completed"] += 1
+
+    def retry_or_fail(self, job_id: str, attempts: int, error: str) -> bool:
+        """Schedule another attempt with exponential backoff; False once attempts are used up"""
+        with self._lock:
+            if attempts >= self.max_attempts:
+                self._db.execute("UPDATE insight_jobs SET status = 'failed', last_error = ? WHERE job_id = ?", (error, job_id))
+                self._counters["failed"] += 1
+                return False
+            delay = self.retry_base_seconds * 2 ** (attempts - 1)
+            self._db.execute(
+                "UPDATE insight_jobs SET status = 'queued', run_at = ?, last_error = ? WHERE job_id = ?",
+                (time.time() + delay, error, job_id)
+            )
+            self._counters["retried"] += 1
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            by_status = dict(self._db.execute("SELECT status, COUNT(*) FROM insight_jobs GROUP BY status").fetchall())
+        return {
+            **self._counters,
+            "queued": by_status.get("queued", 0),
+            "running": by_status.get("running", 0),
+            "dead": by_status.get("failed", 0),
+            "concurrency": self.concurrency,
+        }
+
+    # --- Workers (run on the app's event loop) ---
+
+    def start(self):
+        """Start the worker tasks; re-queues insights left pending by a previous run"""
+        from backend.services import db_service
+        for insight_id, question in db_service.get_pending_insights():
+            self.enqueue(insight_id, question)
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._wakeup = None
+        # Jobs interrupted here keep their lease and are picked up again once it expires
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.claim)
+            except Exception as e:
+                # e.g. "database is locked" on BEGIN IMMEDIATE; try again shortly
+                print(f"Claiming an insight job failed: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # The analysis may wait a long time for a model-call slot; keep the
+            # lease alive until it is done so no other worker runs it too
+            heartbeat = asyncio.ensure_future(self._keep_leased(job[0]))
+            try:
+                await self._run(*job)
+            except Exception as e:
+                # The job stays leased and is claimed again once the lease expires
+                print(f"Insight job {job[0]} failed: {e}")
+            finally:
+                heartbeat.cancel()
+
+    async def _keep_leased(self, job_id: str):
+        while True:
+            await asyncio.sleep(max(self.lease_seconds / 3, 0.1))
+            try:
+                await asyncio.to_thread(self.renew, job_id)
+            except Exception as e:
+                print(f"Renewing the lease of insight job {job_id} failed: {e}")
+
+    async def _run(self, job_id: str, insight_id: str, question: str, attempts: int):
+        from backend.services import db_service
+        from backend.services.model_service import analyze_business_query_async
+        try:
+            result = await analyze_business_query_async(question)
+            if result.get("status") == "error":
+                raise RuntimeError(result.get("analysis", "analysis failed"))
+        except Exception as e:
+            if not await asyncio.to_thread(self.retry_or_fail, job_id, attempts, str(e)):
+                await db_service.run_in_session(
+                    lambda db: db_service.complete_insight(insight_id, f"Analysis failed: {e}", status="failed", db=db)
+                )
+            return
+        await db_service.run_in_session(
+            lambda db: db_service.complete_insight(insight_id, result.get("analysis", ""), db=db)
+        )
+        await asyncio.to_thread(self.complete, job_id)
+
+
+# Singleton instance
+_job_queue = None
+
+
+def get_job_queue(config: Settings = settings) -> Optional[InsightJobQueue]:
+    """Get or create the insight job queue (None unless INSIGHT_MODE=background)"""
+    global _job_queue
+    if config.insight_mode != "background":
+        return None
+    if _job_queue is None:
+        _job_queue = InsightJobQueue(
+            config.insight_queue_path,
+            concurrency=config.insight_workers,
+            max_attempts=config.insight_max_attempts,
+            retry_base_seconds=config.insight_retry_base_seconds
+        )
+    return _job_queue
@@ -2,35 +2,230 @@
 LLM-based Analysis Service for SAP AI Assistant
 Uses Hugging Face transformers (DistilGPT-2) for dynamic text generation
 """
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
+from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM, TextIteratorStreamer
+from transformers.pytorch_utils import Conv1D
 import torch
-from typing import Dict
+from backend.config import settings
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import Dict, Iterator, List, Optional, Tuple
+import copy
+import queue
+import time
 import warnings
 
+try:
+    from optimum.onnxruntime import ORTModelForCausalLM
+except ImportError:
+    ORTModelForCausalLM = None
+
 warnings.filterwarnings('ignore')
 
+LLM_BACKENDS = ("torch", "int8", "onnx")
+GENERATION_KWARGS = dict(max_new_tokens=150, do_sample=True, temperature=0.7, top_p=0.9)
+
+CATEGORY_CONTEXT = {
+    'stock_inventory': 'inventory management and supply chain',
+    'sales_revenue': 'sales performance and revenue growth',
+    'kpi_metrics': 'key performance indicators and business metrics',
+    'customer_analysis': 'customer insights and retention',
+    'cost_budget': 'cost optimization and budget management',
+    'risk_compliance': 'risk assessment and compliance'
+}
+
+
+def _conv1d_to_linear(model: torch.nn.Module) -> torch.nn.Module:
+    """Swap GPT-2's Conv1D projections for equivalent nn.Linear layers, which
+    dynamic quantization knows how to replace (Conv1D stores weight as in x out)"""
+    for name, module in list(model.named_children()):
+        if isinstance(module, Conv1D):
+            linear = torch.nn.Linear(module.weight.shape[0], module.weight.shape[1])
+            linear.weight = torch.nn.Parameter(module.weight.detach().t().contiguous())
+            linear.bias = torch.nn.Parameter(module.bias.detach())
+            setattr(model, name, linear)
+        else:
+            _conv1d_to_linear(module)
+    return model
+
+
+def load_causal_lm(model_name: str, backend: str = "torch"):
+    """The model for an inference backend: full-precision PyTorch, dynamic
+    int8 (weights quantized, activations quantized on the fly) or an
+    ONNX Runtime export (needs `pip install optimum[onnxruntime]`)"""
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend {backend!r}, expected one of {LLM_BACKENDS}")
+    if backend == "onnx":
+        if ORTModelForCausalLM is None:
+            raise ImportError("LLM_BACKEND=onnx requires: pip install optimum[onnxruntime]")
+        return ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=True)
+    
+    model = AutoModelForCausalLM.from_pretrained(model_name).eval()
+    if backend == "int8":
+        model = torch.quantization.quantize_dynamic(_conv1d_to_linear(model), {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+class PromptPrefixCache:
+    """past_key_values for the fixed, per-category part of the prompt
+    
+    The prefix is encoded once per category; each generation starts from a
+    copy of its cache and only the query-specific suffix goes through the
+    model before decoding begins.
+    """
+    
+    def __init__(self, model, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+        self._entries: Dict[str, tuple] = {}
+        self._lock = Lock()
+    
+    def get(self, prefix: str) -> tuple:
+        """(prefix input_ids, private copy of its past_key_values)"""
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is None:
+                input_ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"]
+                with torch.no_grad():
+                    past_key_values = self.model(input_ids, use_cache=True).past_key_values
+                entry = self._entries[prefix] = (input_ids, past_key_values)
+        input_ids, past_key_values = entry
+        # generate appends to the cache in place
+        return input_ids, copy.deepcopy(past_key_values)
+    
+    def generation_inputs(self, prefix: str, suffix: str) -> dict:
+        """generate() kwargs for prefix + suffix, with the prefix already encoded"""
+        prefix_ids, past_key_values = self.get(prefix)
+        suffix_ids = self.tokenizer(suffix, return_tensors="pt")["input_ids"]
+        input_ids = torch.cat([prefix_ids, suffix_ids], dim=1)
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "past_key_values": past_key_values,
+        }
+
+
+class GenerationBatcher:
+    """Micro-batching scheduler for model.generate
+    
+    Prompts submitted from any thread are queued; a single scheduler thread
+    takes the first waiting prompt, collects more for up to max_wait_ms or
+    until max_batch_size, left-pads them and runs one batched generate.
+    Each caller gets its continuation through a Future. A batch of one
+    starts from the prefix cache instead, when there is one.
+    """
+    
+    def __init__(self, model, tokenizer, max_batch_size: int = 8, max_wait_ms: float = 10,
+                 prefix_cache: Optional[PromptPrefixCache] = None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.prefix_cache = prefix_cache
+        self._queue: "queue.Queue[Tuple[Tuple[str, str], Future]]" = queue.Queue()
+        Thread(target=self._run, name="llm-batcher", daemon=True).start()
+    
+    def submit(self, prompt: str, prefix: str = "") -> Future:
+        """Queue prefix + prompt; the future resolves to the generated continuation"""
+        future = Future()
+        self._queue.put(((prefix, prompt), future))
+        return future
+    
+    def _collect(self) -> List[Tuple[Tuple[str, str], Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [(prompt, future) for prompt, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                texts = self.generate([prompt for prompt, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), text in zip(batch, texts):
+                future.set_result(text)
+    
+    def generate(self, prompts: List[Tuple[str, str]]) -> List[str]:
+        """One padded forward pass per decoding step for the whole (prefix, prompt) batch"""
+        if len(prompts) == 1 and prompts[0][0] and self.prefix_cache is not None:
+            inputs = self.prefix_cache.generation_inputs(*prompts[0])
+        else:
+            inputs = self.tokenizer([prefix + prompt for prefix, prompt in prompts], return_tensors="pt", padding=True)
+        with torch.no_grad():
+            outputs = self.model.generate(**inputs, **GENERATION_KWARGS, pad_token_id=self.tokenizer.eos_token_id)
+        # Left padding puts every prompt's end at the same column
+        new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+        return self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+
 
 class LLMAnalysisService:
     """LLM service for generating business analysis using DistilGPT-2"""
     
-    def __init__(self):
+    def __init__(self, backend: str = settings.llm_backend):
         self.model_name = "distilgpt2"
+        self.backend = backend
         self.generator = None
         self.tokenizer = None
         self.model = None
+        self.batcher = None
+        self.prefix_cache = None
         self._initialized = False
+        # not_loaded -> loading -> ready | failed
+        self.status = "not_loaded"
+        self._load_lock = Lock()
     
-    def _initialize_model(self):
-        """Lazy load the model on first use"""
-        if self._initialized:
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+    
+    def start_background_load(self):
+        """Load the model and run a warm-up generation in a daemon thread;
+        callers check `ready` and use the template path until then"""
+        if self.status != "not_loaded":
             return
-        
+        self.status = "loading"
+        Thread(target=self._load_and_warm_up, name="llm-preload", daemon=True).start()
+    
+    def _load_and_warm_up(self):
         try:
-            print(f"Loading LLM model: {self.model_name}...")
+            self._initialize_model()
+            # First generation pays one-off allocation/kernel setup costs
+            self.generator("Business Analysis Report", max_new_tokens=8, pad_token_id=self.tokenizer.eos_token_id)
+            self.status = "ready"
+        except Exception as e:
+            print(f"LLM background load failed: {e}")
+            self.status = "failed"
+    
+    def _initialize_model(self):
+        """Load the model (on first use, or from start_background_load)"""
+        with self._load_lock:
+            if self._initialized:
+                return
+            self._load_model()
+    
+    def _load_model(self):
+        try:
+            print(f"Loading LLM model: {self.model_name} ({self.backend})...")
             
             # Load tokenizer and model
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
+            self.model = load_causal_lm(self.model_name, self.backend)
+            # GPT-2 has no pad token; left-pad with EOS so batched prompts end together
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.tokenizer.padding_side = "left"
             
             # Create text generation pipeline
             self.generator = pipeline(
@@ -44,12 +239,26 @@ class LLMAnalysisService:
                 do_sample=True
             )
             
+            # ONNX Runtime sessions don't accept a pre-filled cache from generate()
+            if self.backend != "onnx":
+                self.prefix_cache = PromptPrefixCache(self.model, self.tokenizer)
+            self.batcher = GenerationBatcher(
+                self.model, self.tokenizer,
+                max_batch_size=settings.llm_batch_max_size,
+                max_wait_ms=settings.llm_batch_wait_ms,
+                prefix_cache=self.prefix_cache
+            )
+            
             self._initialized = True
+            if self.status == "not_loaded":
+                self.status = "ready"
             print("LLM model loaded successfully!")
             
         except Exception as e:
             print(f"Error loading LLM model: {e}")
             self._initialized = False
+            if self.status == "not_loaded":
+                self.status = "failed"
             raise e
     
     def generate_analysis(self, query: str, category: str, ml_insights: Dict) -> str:
@@ -72,20 +281,11 @@ class LLMAnalysisService:
             return None  # Fallback to template-based
         
         # Build prompt
-        prompt = self._build_prompt(query, category, ml_insights)
+        prefix, suffix = self._prompt_parts(query, category, ml_insights)
         
         try:
-            # Generate text
-            result = self.generator(
-                prompt,
-                max_new_tokens=150,
-                num_return_sequences=1,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
-            
-            # Extract generated text (remove prompt)
-            generated_text = result[0]['generated_text']
-            analysis = generated_text[len(prompt):].strip()
+            # Generate text, batched with other requests in flight
+            analysis = self.batcher.submit(suffix, prefix=prefix).result().strip()
             
             # Clean up the output
             analysis = self._clean_output(analysis)
@@ -96,37 +296,80 @@ class LLMAnalysisService:
             print(f"Error generating LLM analysis: {e}")
             return None
     
+    def stream_analysis(self, query: str, category: str, ml_insights: Dict) -> Iterator[str]:
+        """
+        Generate business analysis like generate_analysis, yielding text as it is decoded
+        
+        Generation runs in a background thread; the returned iterator blocks
+        until the next piece of text is available. An error raised by the
+        generation, or no new text for LLM_STREAM_TIMEOUT_SECONDS, is raised
+        from the iterator.
+        """
+        if not self._initialized:
+            self._initialize_model()
+        
+        prefix, suffix = self._prompt_parts(query, category, ml_insights)
+        if self.prefix_cache is not None:
+            inputs = self.prefix_cache.generation_inputs(prefix, suffix)
+        else:
+            inputs = self.tokenizer(prefix + suffix, return_tensors="pt")
+        timeout = settings.llm_stream_timeout_seconds
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout)
+        errors = []
+        
+        def generate():
+            try:
+                self.model.generate(
+                    **inputs,
+                    **GENERATION_KWARGS,
+                    streamer=streamer,
+                    pad_token_id=self.tokenizer.eos_token_id
+                )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                # generate() only ends the stream itself when it succeeds
+                streamer.end()
+        
+        thread = Thread(target=generate, name="llm-stream", daemon=True)
+        thread.start()
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+        except queue.Empty:
+            raise TimeoutError(f"LLM stream produced no text for {timeout}s")
+        thread.join()
+        if errors:
+            raise errors[0]
+    
     def _build_prompt(self, query: str, category: str, ml_insights: Dict) -> str:
         """Build a structured prompt for the LLM"""
+        return "".join(self._prompt_parts(query, category, ml_insights))
+    
+    def _prompt_parts(self, query: str, category: str, ml_insights: Dict) -> Tuple[str, str]:
+        """The prompt as (prefix, suffix): the prefix depends only on the
+        category, so its encoding is reused across requests"""
         
         impact = ml_insights.get('impact_metrics', {})
         priority = impact.get('priority', 'Medium')
         impact_score = impact.get('impact_score', 0.5)
         
-        category_context = {
-            'stock_inventory': 'inventory management and supply chain',
-            'sales_revenue': 'sales performance and revenue growth',
-            'kpi_metrics': 'key performance indicators and business metrics',
-            'customer_analysis': 'customer insights and retention',
-            'cost_budget': 'cost optimization and budget management',
-            'risk_compliance': 'risk assessment and compliance'
-        }
-        
-        context = category_context.get(category, 'business operations')
+        context = CATEGORY_CONTEXT.get(category, 'business operations')
         
-        prompt = f"""Business Analysis Report
+        prefix = f"""Business Analysis Report
 
-Query: {query}
 Category: {category.replace('_', ' ').title()}
+Analysis: Based on current data and trends in {context}, the key findings for the query below cover the current situation, its main drivers and recommended next steps.
+
+"""
+        suffix = f"""Query: {query}
 Priority: {priority}
 Impact Score: {impact_score}/1.0
 
-Analysis:
-Based on current data and trends in {context}, here are the key findings:
-
 1. Current Situation:"""
         
-        return prompt
+        return prefix, suffix
     
     def _clean_output(self, text: str) -> str:
         """Clean and format the generated output"""
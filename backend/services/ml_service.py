@@ -2,91 +2,252 @@
 ML-based Analysis Service for SAP AI Assistant
 Uses scikit-learn for intelligent query categorization and insight generation
 """
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from scipy import sparse
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from backend.config import settings
+import hashlib
+import json
+import os
+import threading
+import time
+
+CLASSIFIER_MODES = ("centroid", "nearest")
+DEFAULT_CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "training_corpus.json")
+DEFAULT_ARTIFACT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "classifier")
+ARTIFACT_VERSION = 1
+
+
+def load_corpus(path: str = "") -> Dict[str, dict]:
+    """Categories and example queries: {category: {"keywords": [...], "examples": [...]}}"""
+    with open(path or settings.ml_corpus_path or DEFAULT_CORPUS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _chain_version(version: str, labelled) -> str:
+    """Fold (text, category) examples into a corpus version; workers that
+    applied the same examples in the same order agree on it"""
+    for text, category in labelled:
+        version = hashlib.sha256(f"{version}\n{category}\n{text}".encode("utf-8")).hexdigest()[:16]
+    return version
+
+
+class _ClassifierIndex(NamedTuple):
+    """Everything a classification reads, swapped as one unit on updates"""
+    category_names: List[str]
+    idf: np.ndarray
+    training_vectors: sparse.csr_matrix
+    example_labels: np.ndarray
+    column_map: np.ndarray
+    examples_t: sparse.csr_matrix
+    centroids_t: np.ndarray
 
 
 class MLAnalysisService:
     """Machine Learning service for business query analysis"""
     
-    def __init__(self):
-        # Training data: categories and example queries
-        self.categories = {
-            'stock_inventory': {
-                'keywords': ['stock', 'inventory', 'reduced', 'supplies', 'warehouse', 'reorder', 'sku'],
-                'examples': [
-                    'Is stock getting reduced?',
-                    'What is our inventory level?',
-                    'Do we need to reorder supplies?',
-                    'Show me warehouse stock levels'
-                ]
-            },
-            'sales_revenue': {
-                'keywords': ['sales', 'revenue', 'profit', 'quarter', 'q4', 'growth', 'earnings'],
-                'examples': [
-                    'What are Q4 sales trends?',
-                    'Show me revenue growth',
-                    'How is our profit margin?',
-                    'Sales performance this quarter'
-                ]
-            },
-            'kpi_metrics': {
-                'keywords': ['kpi', 'metrics', 'performance', 'indicators', 'dashboard', 'score'],
-                'examples': [
-                    'Show me key performance indicators',
-                    'What are our KPIs?',
-                    'Performance metrics dashboard',
-                    'How are we performing?'
-                ]
-            },
-            'customer_analysis': {
-                'keywords': ['customer', 'client', 'retention', 'churn', 'satisfaction', 'nps'],
-                'examples': [
-                    'What is our customer retention rate?',
-                    'Show me customer churn analysis',
-                    'Customer satisfaction scores',
-                    'NPS trends'
-                ]
-            },
-            'cost_budget': {
-                'keywords': ['cost', 'budget', 'expense', 'spending', 'opex', 'savings'],
-                'examples': [
-                    'Where can we reduce costs?',
-                    'Show me budget utilization',
-                    'What are our expenses?',
-                    'Cost optimization opportunities'
-                ]
-            },
-            'risk_compliance': {
-                'keywords': ['risk', 'compliance', 'security', 'audit', 'gdpr', 'regulation'],
-                'examples': [
-                    'What are our compliance risks?',
-                    'Security audit status',
-                    'GDPR compliance check',
-                    'Risk assessment report'
-                ]
-            }
-        }
+    def __init__(self, categories: Optional[Dict[str, dict]] = None, classifier: str = settings.ml_classifier,
+                 n_features: int = settings.ml_hash_features):
+        self._setup(classifier, n_features)
         
-        # Build training corpus
+        # Training data: categories and example queries
+        corpus = categories if categories is not None else load_corpus()
+        self.categories = {}
         self.training_queries = []
         self.training_labels = []
-        for category, data in self.categories.items():
-            for example in data['examples']:
-                self.training_queries.append(example)
-                self.training_labels.append(category)
-        
-        # Initialize TF-IDF vectorizer
-        self.vectorizer = TfidfVectorizer(
-            max_features=100,
+        self._counts = sparse.csr_matrix((0, n_features))
+        self._df = np.zeros(n_features)
+        
+        for category, data in corpus.items():
+            self.categories[category] = {'keywords': list(data.get('keywords', [])), 'examples': []}
+        self._add_examples([(example, category) for category, data in corpus.items() for example in data['examples']])
+        self._index = self._build_index()
+    
+    def _setup(self, classifier: str, n_features: int):
+        if classifier not in CLASSIFIER_MODES:
+            raise ValueError(f"Unknown classifier {classifier!r}, expected one of {CLASSIFIER_MODES}")
+        self.classifier = classifier
+        
+        # Stateless hashing vectorizer: no vocabulary to fit, so the corpus can
+        # grow without refitting. IDF comes from document frequencies we keep.
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
             ngram_range=(1, 2),
-            stop_words='english'
+            stop_words='english',
+            alternate_sign=False,
+            norm=None
+        )
+        self._lock = threading.Lock()
+        self.last_example_id = 0
+        # Changes whenever an example is added; the response cache keys on it
+        self.corpus_version = ""
+    
+    def save_artifact(self, path: str, corpus_fingerprint: str = ""):
+        """Write the fitted state as .npy files plus a manifest, for from_artifact"""
+        os.makedirs(path, exist_ok=True)
+        index = self._index
+        arrays = {
+            'df': self._df,
+            'idf': index.idf,
+            'example_labels': index.example_labels,
+            'column_map': index.column_map,
+            'centroids_t': index.centroids_t,
+        }
+        for name, matrix in (('counts', self._counts), ('training_vectors', index.training_vectors),
+                             ('examples_t', index.examples_t)):
+            arrays.update({f'{name}.data': matrix.data, f'{name}.indices': matrix.indices, f'{name}.indptr': matrix.indptr})
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), array)
+        
+        manifest = {
+            'version': ARTIFACT_VERSION,
+            'corpus_fingerprint': corpus_fingerprint,
+            'n_features': self.vectorizer.n_features,
+            'last_example_id': self.last_example_id,
+            'corpus_version': self.corpus_version,
+            'shapes': {
+                'counts': self._counts.shape,
+                'training_vectors': index.training_vectors.shape,
+                'examples_t': index.examples_t.shape,
+            },
+            'category_names': index.category_names,
+            'categories': self.categories,
+            'training_queries': self.training_queries,
+            'training_labels': self.training_labels,
+        }
+        with open(os.path.join(path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+    
+    @classmethod
+    def from_artifact(cls, path: str, classifier: str = settings.ml_classifier) -> "MLAnalysisService":
+        """Load a saved service. Arrays are memory-mapped read-only, so worker
+        processes share them through the page cache and nothing is refit."""
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest['version'] != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported classifier artifact version {manifest['version']}")
+        
+        def array(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+        
+        def matrix(name):
+            return sparse.csr_matrix(
+                (array(f'{name}.data'), array(f'{name}.indices'), array(f'{name}.indptr')),
+                shape=tuple(manifest['shapes'][name]), copy=False
+            )
+        
+        service = cls.__new__(cls)
+        service._setup(classifier, manifest['n_features'])
+        service.categories = manifest['categories']
+        service.training_labels = manifest['training_labels']
+        service.training_queries = manifest['training_queries']
+        service.last_example_id = manifest['last_example_id']
+        service.corpus_version = manifest.get('corpus_version') or _chain_version(
+            "", zip(service.training_queries, service.training_labels))
+        service._counts = matrix('counts')
+        service._df = array('df')
+        service._index = _ClassifierIndex(
+            category_names=manifest['category_names'],
+            idf=array('idf'),
+            training_vectors=matrix('training_vectors'),
+            example_labels=array('example_labels'),
+            column_map=array('column_map'),
+            examples_t=matrix('examples_t'),
+            centroids_t=array('centroids_t')
         )
+        service.corpus_fingerprint = manifest['corpus_fingerprint']
+        return service
+    
+    @property
+    def training_vectors(self) -> sparse.csr_matrix:
+        return self._index.training_vectors
+    
+    def add_examples(self, category: str, examples: List[str]) -> int:
+        """Add labelled examples (new categories allowed); returns the category's example count"""
+        with self._lock:
+            self._add_examples([(example, category) for example in examples])
+            self._index = self._build_index()
+            return len(self.categories[category]['examples'])
+    
+    def sync_examples_from_db(self) -> int:
+        """Apply labelled examples stored in the database since the last sync; returns how many"""
+        from backend.services import db_service
+        
+        with self._lock:
+            rows = db_service.get_training_examples(after_id=self.last_example_id)
+            if rows:
+                self._add_examples([(row['text'], row['category']) for row in rows])
+                self._index = self._build_index()
+                self.last_example_id = rows[-1]['example_id']
+            return len(rows)
+    
+    def _add_examples(self, labelled: List[Tuple[str, str]]):
+        """Hash only the new examples and update document frequencies; no
+        vocabulary refit. Callers rebuild the index afterwards."""
+        if not labelled:
+            return
+        texts = [text for text, _ in labelled]
+        new_counts = self.vectorizer.transform(texts).tocsr()
+        self._df = self._df + np.bincount(new_counts.indices, minlength=self._df.shape[0])
+        self._counts = sparse.vstack([self._counts, new_counts], format="csr")
+        for text, category in labelled:
+            self.categories.setdefault(category, {'keywords': [], 'examples': []})['examples'].append(text)
+            self.training_queries.append(text)
+            self.training_labels.append(category)
+        self.corpus_version = _chain_version(self.corpus_version, labelled)
+    
+    def _idf(self) -> np.ndarray:
+        # Same smoothed IDF as sklearn's TfidfTransformer
+        n_documents = self._counts.shape[0]
+        return np.log((1 + n_documents) / (1 + self._df)) + 1
+    
+    def _build_index(self) -> _ClassifierIndex:
+        """Precompute the matrices categorize_vectors multiplies against.
         
-        # Fit on training data
-        self.training_vectors = self.vectorizer.fit_transform(self.training_queries)
+        TF-IDF rows are L2-normalized, so a sparse dot product with them is
+        already the cosine similarity; no per-call validation or normalization.
+        """
+        idf = self._idf()
+        training_vectors = normalize(self._counts.multiply(idf).tocsr())
+        category_names = list(self.categories)
+        label_index = {category: i for i, category in enumerate(category_names)}
+        example_labels = np.array([label_index[label] for label in self.training_labels], dtype=np.int64)
+        # Per-category mean of the examples, re-normalized: (features x categories)
+        membership = sparse.csr_matrix(
+            (np.ones(len(example_labels)), (example_labels, np.arange(len(example_labels)))),
+            shape=(len(category_names), len(example_labels))
+        )
+        centroids = normalize(membership @ training_vectors)
+        # Only features seen in the corpus can score, so both matrices are kept
+        # over those columns (plus one all-zero column for everything else);
+        # scoring cost then doesn't depend on the hashed feature space size
+        active = np.unique(self._counts.indices)
+        column_map = np.full(self._counts.shape[1], len(active), dtype=np.int32)
+        column_map[active] = np.arange(len(active), dtype=np.int32)
+        compact_width = len(active) + 1
+        return _ClassifierIndex(
+            category_names=category_names,
+            idf=idf,
+            training_vectors=training_vectors,
+            example_labels=example_labels,
+            column_map=column_map,
+            # (features x examples) for nearest-example scoring
+            examples_t=self._compact(training_vectors, column_map, compact_width).T.tocsr(),
+            centroids_t=self._compact(centroids, column_map, compact_width).T.toarray()
+        )
+    
+    @staticmethod
+    def _compact(vectors: sparse.csr_matrix, column_map: np.ndarray, width: int) -> sparse.csr_matrix:
+        return sparse.csr_matrix((vectors.data, column_map[vectors.indices], vectors.indptr), shape=(vectors.shape[0], width))
+    
+    def _transform(self, queries: List[str]) -> sparse.csr_matrix:
+        return normalize(self.vectorizer.transform(queries).multiply(self._index.idf).tocsr())
+    
+    def vectorize(self, query: str):
+        """TF-IDF row vector (L2-normalized) for a query"""
+        return self._transform([query])
     
     def categorize_query(self, query: str) -> Tuple[str, float]:
         """
@@ -94,17 +255,42 @@ class MLAnalysisService:
         Returns: (category, confidence_score)
         """
         # Vectorize the query
-        query_vector = self.vectorizer.transform([query])
-        
-        # Calculate similarity with all training examples
-        similarities = cosine_similarity(query_vector, self.training_vectors)[0]
-        
-        # Find best match
-        best_match_idx = np.argmax(similarities)
-        confidence = similarities[best_match_idx]
-        category = self.training_labels[best_match_idx]
+        return self.categorize_vector(self.vectorize(query))
+    
+    def categorize_vector(self, query_vector) -> Tuple[str, float]:
+        """Categorize an already vectorized query (see vectorize)"""
+        return self.categorize_vectors(query_vector)[0]
+    
+    def categorize_queries(self, queries: List[str]) -> List[Tuple[str, float]]:
+        """
+        Categorize a batch of queries with one vectorizer transform and one
+        similarity matrix product
+        Returns: [(category, confidence_score), ...] in input order
+        """
+        if not queries:
+            return []
+        return self.categorize_vectors(self._transform(queries))
+    
+    def categorize_vectors(self, query_vectors) -> List[Tuple[str, float]]:
+        """Categorize each row of a TF-IDF matrix"""
+        index = self._index
+        query_vectors = self._compact(query_vectors, index.column_map, index.centroids_t.shape[0])
+        if self.classifier == "centroid":
+            # Cosine similarity with each category centroid: cost independent of corpus size
+            similarities = query_vectors @ index.centroids_t
+            best_category = similarities.argmax(axis=1)
+            confidences = similarities[np.arange(len(best_category)), best_category]
+        else:
+            # Cosine similarity with every training example, labelled by the best match
+            similarities = (query_vectors @ index.examples_t).toarray()
+            best_match_idx = similarities.argmax(axis=1)
+            confidences = similarities[np.arange(len(best_match_idx)), best_match_idx]
+            best_category = index.example_labels[best_match_idx]
         
-        return category, float(confidence)
+        return [
+            (index.category_names[idx], float(confidence))
+            for idx, confidence in zip(best_category, confidences)
+        ]
     
     def calculate_business_impact(self, query: str, category: str) -> Dict[str, any]:
         """
@@ -144,12 +330,14 @@ class MLAnalysisService:
             'confidence': round(urgency_score + 0.5, 2)
         }
     
-    def generate_ml_insights(self, query: str) -> Dict[str, any]:
+    def generate_ml_insights(self, query: str, categorization: Tuple[str, float] = None) -> Dict[str, any]:
         """
         Generate ML-enhanced insights for a business query
+        
+        Pass categorization=(category, confidence) if the query was already categorized
         """
         # Categorize the query
-        category, confidence = self.categorize_query(query)
+        category, confidence = categorization or self.categorize_query(query)
         
         # Calculate business impact
         impact_metrics = self.calculate_business_impact(query, category)
@@ -165,6 +353,15 @@ class MLAnalysisService:
             'ml_model': 'scikit-learn-tfidf-v1'
         }
     
+    def generate_ml_insights_batch(self, queries: List[str]) -> List[Dict[str, any]]:
+        """
+        Generate ML-enhanced insights for many queries, categorized in one batch
+        """
+        return [
+            self.generate_ml_insights(query, categorization)
+            for query, categorization in zip(queries, self.categorize_queries(queries))
+        ]
+    
     def _get_category_recommendations(self, category: str) -> List[str]:
         """Get ML-driven recommendations based on category"""
         recommendations_map = {
@@ -216,10 +413,64 @@ class MLAnalysisService:
 
 # Global instance
 _ml_service = None
+_ml_service_lock = threading.Lock()
 
 def get_ml_service() -> MLAnalysisService:
-    """Get or create ML service singleton"""
+    """Get or create ML service singleton, including the examples stored in the database"""
     global _ml_service
     if _ml_service is None:
-        _ml_service = MLAnalysisService()
+        with _ml_service_lock:
+            if _ml_service is None:
+                service = _load_service()
+                _sync_examples(service)
+                _ml_service = service
     return _ml_service
+
+
+_sync_pid = None
+
+def start_example_sync(interval: float = settings.ml_sync_interval_seconds):
+    """Pick up examples added by other workers every interval seconds, in a
+    daemon thread (once per process) so requests never wait on the database"""
+    global _sync_pid
+    with _ml_service_lock:
+        # Compared by pid: a forked compute worker inherits the flag but not the thread
+        if interval <= 0 or _sync_pid == os.getpid():
+            return
+        _sync_pid = os.getpid()
+    threading.Thread(target=_sync_loop, args=(interval,), name="ml-example-sync", daemon=True).start()
+
+
+def _sync_loop(interval: float):
+    while True:
+        time.sleep(interval)
+        _sync_examples(get_ml_service())
+
+
+def corpus_fingerprint(path: str = "") -> str:
+    """Identifies the seed corpus and hashing setup an artifact was built from"""
+    with open(path or settings.ml_corpus_path or DEFAULT_CORPUS_PATH, 'rb') as f:
+        digest = hashlib.sha256(f.read())
+    digest.update(str(settings.ml_hash_features).encode())
+    return digest.hexdigest()
+
+
+def _load_service() -> MLAnalysisService:
+    """Memory-map the prebuilt artifact when it matches the corpus, else build in-process"""
+    artifact_path = settings.ml_artifact_path or DEFAULT_ARTIFACT_PATH
+    if os.path.exists(os.path.join(artifact_path, 'manifest.json')):
+        try:
+            service = MLAnalysisService.from_artifact(artifact_path)
+            if service.corpus_fingerprint == corpus_fingerprint():
+                return service
+            print("Classifier artifact is stale (corpus changed); rebuild it with build_classifier.py")
+        except Exception as e:
+            print(f"Could not load classifier artifact, building in-process: {e}")
+    return MLAnalysisService()
+
+
+def _sync_examples(service: MLAnalysisService):
+    try:
+        service.sync_examples_from_db()
+    except Exception as e:
+        print(f"Could not load training examples from the database: {e}")
@@ -1,14 +1,10 @@
 from backend.config import settings
+from backend.services import provider_service
+from backend.services.cache_service import ResponseCache, get_response_cache, get_single_flight
+from backend.services.scheduler_service import get_scheduler
+from typing import AsyncIterator, Optional, Tuple
+import asyncio
 import os
-try:
-    import openai
-except ImportError:
-    openai = None
-
-try:
-    import anthropic
-except ImportError:
-    anthropic = None
 
 
 def run_model_test() -> dict:
@@ -24,23 +20,38 @@ def run_model_test() -> dict:
     }
 
 
-def analyze_business_query(query: str) -> dict:
-    """Analyze a business query using ML-enhanced AI or mock responses"""
-    
-    # Import ML service
-    from backend.services.ml_service import get_ml_service
-    
-    # Get ML insights first
-    ml_service = get_ml_service()
-    ml_insights = ml_service.generate_ml_insights(query)
+async def analyze_business_query_async(query: str) -> dict:
+    """Analyze a business query using ML-enhanced AI or mock responses.
+
+    ML scoring runs in a worker thread and the provider call uses the async
+    OpenAI/Anthropic clients, so no thread is held for the LLM round-trip.
+    Concurrent calls for the same question share one analysis, and model
+    calls wait for a slot from the priority scheduler.
+    """
+    single_flight = get_single_flight()
+    if single_flight is None:
+        return await _analyze_business_query_async(query)
+    return await single_flight.run(query, lambda: _analyze_business_query_async(query))
+
+
+async def _analyze_business_query_async(query: str) -> dict:
+    ml_insights, cache_slot, cached = await asyncio.to_thread(_prepare_analysis, query)
+    if cached:
+        return cached
     
-    # Check if real API key is configured
+    priority = ml_insights['impact_metrics']['priority']
     if not settings.model_api_key or settings.model_api_key == "test_api_key_placeholder":
-        return _mock_ai_analysis_with_ml(query, ml_insights)
+        if _get_local_llm() is None:
+            result = await asyncio.to_thread(_mock_ai_analysis_with_ml, query, ml_insights)
+        else:
+            async with get_scheduler().slot(priority):
+                result = await asyncio.to_thread(_mock_ai_analysis_with_ml, query, ml_insights)
+        return _store_analysis(cache_slot, query, result)
     
-    # Try real AI integration
     try:
-        return _call_ai_api(query)
+        async with get_scheduler().slot(priority):
+            result = await _call_ai_api_async(query)
+        return _store_analysis(cache_slot, query, result)
     except Exception as e:
         return {
             "status": "error",
@@ -51,77 +62,132 @@ def analyze_business_query(query: str) -> dict:
         }
 
 
-def _call_ai_api(query: str) -> dict:
-    """Call real AI API (OpenAI/Anthropic/etc)"""
+def _prepare_analysis(query: str) -> Tuple[Optional[dict], Optional[tuple], Optional[dict]]:
+    """ML insights for the query plus any cached response.
+
+    Exact repeats are answered before any ML work. Otherwise the query is
+    vectorized once; the same TF-IDF vector drives categorization and the
+    cache's near-duplicate lookup. Returns (ml_insights, cache_slot,
+    cached_response) where cache_slot is handed back to _store_analysis.
+    """
+    from backend.services.compute_service import analyze_query
+    from backend.services.ml_service import get_ml_service
+    
+    cache = get_response_cache()
+    version = get_ml_service().corpus_version if cache else ""
+    cached = cache.get(query, version) if cache else None
+    if cached:
+        return None, None, _mark_cached(query, cached)
+    
+    vector, ml_insights = analyze_query(query)
+    if cache is None:
+        return ml_insights, None, None
+    
+    bucket = ResponseCache.make_bucket(ml_insights['category'], ml_insights['impact_metrics']['priority'])
+    cached = cache.get_similar(bucket, vector)
+    return ml_insights, (cache, bucket, vector, version), cached and _mark_cached(query, cached)
+
+
+def _mark_cached(query: str, response: dict) -> dict:
+    response["query"] = query
+    response["cached"] = True
+    return response
+
+
+def _store_analysis(cache_slot: Optional[tuple], query: str, result: dict) -> dict:
+    """Cache successful analyses; errors are never cached"""
+    if cache_slot and result.get("status") == "success":
+        cache, bucket, vector, version = cache_slot
+        cache.put(query, bucket, result, vector, version)
+    return result
+
+
+SYSTEM_PROMPT = "You are an SAP Enterprise AI Assistant. Provide concise, actionable business insights for enterprise stakeholders. Focus on data-driven recommendations."
+
+
+def _provider_request(provider: str, query: str) -> dict:
+    """Request kwargs for the provider's completion call"""
+    if provider == "openai":
+        return {
+            "model": "gpt-3.5-turbo",
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": query}
+            ],
+            "max_tokens": 500,
+            "temperature": 0.7
+        }
+    return {
+        "model": "claude-3-haiku-20240307",
+        "max_tokens": 500,
+        "messages": [
+            {"role": "user", "content": f"As an SAP Enterprise AI Assistant, analyze this business query: {query}"}
+        ]
+    }
+
+
+def _provider_result(provider: str, query: str, response) -> dict:
+    if provider == "openai":
+        analysis, model = response.choices[0].message.content, "gpt-3.5-turbo"
+    else:
+        analysis, model = response.content[0].text, "claude-3-haiku"
+    return {
+        "status": "success",
+        "analysis": analysis,
+        "query": query,
+        "model": model,
+        "mock_mode": False
+    }
+
+
+async def _call_ai_api_async(query: str) -> dict:
+    """Call real AI API (OpenAI/Anthropic) through the shared async provider client"""
+    provider = provider_service.resolve_provider()
+    client = provider_service.get_async_client(provider)
+    request = _provider_request(provider, query)
+    if provider == "openai":
+        response = await client.chat.completions.create(**request)
+    else:
+        response = await client.messages.create(**request)
+    return _provider_result(provider, query, response)
+
+
+def start_local_llm():
+    """Begin loading the local LLM in the background (LOCAL_LLM_ENABLED)"""
+    if not settings.local_llm_enabled:
+        return
     try:
-        # Try OpenAI first
-        if openai:
-            openai.api_key = settings.model_api_key
-            
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an SAP Enterprise AI Assistant. Provide concise, actionable business insights for enterprise stakeholders. Focus on data-driven recommendations."},
-                    {"role": "user", "content": query}
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            return {
-                "status": "success",
-                "analysis": response.choices[0].message.content,
-                "query": query,
-                "model": "gpt-3.5-turbo",
-                "mock_mode": False
-            }
-        
-        # Try anthropic
-        if anthropic:
-            client = anthropic.Anthropic(api_key=settings.model_api_key)
-            
-            message = client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=500,
-                messages=[
-                    {"role": "user", "content": f"As an SAP Enterprise AI Assistant, analyze this business query: {query}"}
-                ]
-            )
-            
-            return {
-                "status": "success",
-                "analysis": message.content[0].text,
-                "query": query,
-                "model": "claude-3-haiku",
-                "mock_mode": False
-            }
-            
-        raise Exception("No AI library installed. Run: pip install openai anthropic")
-    except Exception as e:
-        # Re-raise to be caught by the caller who handles the fallback
-        raise e
+        from backend.services.llm_service import get_llm_service
+    except ImportError as e:
+        print(f"Local LLM unavailable: {e}")
+        return
+    get_llm_service().start_background_load()
 
 
-def _mock_ai_analysis_with_ml(query: str, ml_insights: dict) -> dict:
-    """Generate ML+LLM-enhanced responses based on query analysis"""
-    query_lower = query.lower()
+def local_llm_status() -> str:
+    """disabled, unavailable, or the service's load status"""
+    if not settings.local_llm_enabled:
+        return "disabled"
+    try:
+        from backend.services.llm_service import get_llm_service
+    except ImportError:
+        return "unavailable"
+    return get_llm_service().status
+
+
+def _get_local_llm():
+    """Local DistilGPT-2 service, or None while it is disabled or still loading
+    (requests then use the template analysis instead of waiting for the model)"""
+    if local_llm_status() != "ready":
+        return None
+    from backend.services.llm_service import get_llm_service
+    return get_llm_service()
+
+
+def _build_ml_header(ml_insights: dict) -> str:
     category = ml_insights['category']
     impact = ml_insights['impact_metrics']
-    recommendations = ml_insights['recommendations']
-    
-    # TEMPORARILY DISABLED: LLM takes too long on first load
-    # Try to use LLM for dynamic text generation
-    llm_analysis = None
-    # try:
-    #     from backend.services.llm_service import get_llm_service
-    #     llm_service = get_llm_service()
-    #     llm_analysis = llm_service.generate_analysis(query, category, ml_insights)
-    # except Exception as e:
-    #     print(f"LLM generation failed, using template: {e}")
-    #     llm_analysis = None
-    
-    # Build ML-enhanced header
-    ml_header = f"""🤖 **AI-Powered Analysis** (ML-Enhanced)
+    return f"""🤖 **AI-Powered Analysis** (ML-Enhanced)
 
 📊 **Category**: {category.replace('_', ' ').title()}
 🎯 **Priority**: {impact['priority']}
@@ -132,6 +198,32 @@ def _mock_ai_analysis_with_ml(query: str, ml_insights: dict) -> dict:
 
 """
 
+
+def _build_recommendations_section(recommendations: list) -> str:
+    rec_section = "\n\n💡 **ML-Driven Recommendations**:\n"
+    for i, rec in enumerate(recommendations, 1):
+        rec_section += f"{i}. {rec}\n"
+    return rec_section
+
+
+def _mock_ai_analysis_with_ml(query: str, ml_insights: dict) -> dict:
+    """Generate ML+LLM-enhanced responses based on query analysis"""
+    query_lower = query.lower()
+    category = ml_insights['category']
+    recommendations = ml_insights['recommendations']
+    
+    # Try to use LLM for dynamic text generation
+    llm_analysis = None
+    llm_service = _get_local_llm()
+    if llm_service:
+        try:
+            llm_analysis = llm_service.generate_analysis(query, category, ml_insights)
+        except Exception as e:
+            print(f"LLM generation failed, using template: {e}")
+            llm_analysis = None
+    
+    # Build ML-enhanced header
+    ml_header = _build_ml_header(ml_insights)
     
     # Use LLM-generated analysis if available, otherwise use template
     if llm_analysis:
@@ -147,9 +239,7 @@ def _mock_ai_analysis_with_ml(query: str, ml_insights: dict) -> dict:
         analysis_body = _get_category_analysis(query_lower, category)
     
     # Build recommendations section
-    rec_section = "\n\n💡 **ML-Driven Recommendations**:\n"
-    for i, rec in enumerate(recommendations, 1):
-        rec_section += f"{i}. {rec}\n"
+    rec_section = _build_recommendations_section(recommendations)
     
     # Combine all sections
     full_analysis = ml_header + analysis_body + rec_section
@@ -171,6 +261,144 @@ def _mock_ai_analysis_with_ml(query: str, ml_insights: dict) -> dict:
     }
 
 
+INTERRUPTED_NOTE = "\n\n⚠️ *Analysis interrupted before it finished*"
+
+
+async def stream_business_query(query: str) -> AsyncIterator[Tuple[str, dict]]:
+    """Streaming variant of analyze_business_query_async.
+
+    Yields (event, data) pairs: one "meta" event with the ML insights, "token"
+    events whose texts concatenate to the full analysis (the ML header comes
+    first), then a "done" event; its status is "error", with an "error"
+    message, when the model call failed part-way.
+
+    Cached answers, and identical analyses already in flight, are replayed as
+    a single token. Otherwise identical requests share this stream's result,
+    and a successful one is cached like analyze_business_query_async's.
+    """
+    ml_insights, cache_slot, response = await asyncio.to_thread(_prepare_analysis, query)
+    single_flight = get_single_flight()
+    leader = None
+    if response is None and single_flight is not None:
+        leader = single_flight.lead(query)
+        if leader is None:
+            response = await single_flight.run(query, lambda: _analyze_business_query_async(query))
+    if response is not None:
+        async for event in _replay_analysis(response, ml_insights):
+            yield event
+        return
+    
+    meta, parts, done = {}, [], None
+    try:
+        async for event, data in _stream_analysis(query, ml_insights):
+            if event == "meta":
+                meta = data
+            elif event == "token":
+                parts.append(data["text"])
+            elif event == "done":
+                done = data
+            yield event, data
+    finally:
+        # Identical requests waiting on this stream get whatever it produced,
+        # marked as interrupted when the client went away part-way
+        result = {
+            "status": done["status"] if done else "error",
+            "analysis": "".join(parts) + ("" if done else INTERRUPTED_NOTE),
+            "query": query,
+            "model": done and done["model"],
+            "mock_mode": meta.get("mock_mode", True),
+            "ml_insights": ml_insights
+        }
+        if leader is not None and not leader.done():
+            leader.set_result(result)
+    _store_analysis(cache_slot, query, result)
+
+
+async def _replay_analysis(response: dict, ml_insights: Optional[dict]) -> AsyncIterator[Tuple[str, dict]]:
+    """Stream events for an analysis that is already complete"""
+    meta = {
+        "query": response["query"],
+        "ml_insights": response.get("ml_insights") or ml_insights,
+        "mock_mode": response.get("mock_mode", True)
+    }
+    for flag in ("cached", "coalesced"):
+        if response.get(flag):
+            meta[flag] = True
+    yield "meta", meta
+    yield "token", {"text": response["analysis"]}
+    yield "done", {"status": response["status"], "model": response.get("model")}
+
+
+async def _stream_analysis(query: str, ml_insights: dict) -> AsyncIterator[Tuple[str, dict]]:
+    mock_mode = not settings.model_api_key or settings.model_api_key == "test_api_key_placeholder"
+    yield "meta", {"query": query, "ml_insights": ml_insights, "mock_mode": mock_mode}
+    yield "token", {"text": _build_ml_header(ml_insights)}
+    
+    status = "success"
+    error = None
+    priority = ml_insights['impact_metrics']['priority']
+    if mock_mode:
+        category = ml_insights['category']
+        llm_service = _get_local_llm()
+        llm_used = False
+        if llm_service:
+            try:
+                async with get_scheduler().slot(priority):
+                    tokens = llm_service.stream_analysis(query, category, ml_insights)
+                    first = await asyncio.to_thread(next, tokens, None)
+                    if first is not None:
+                        llm_used = True
+                        yield "token", {"text": "🧠 **AI-Generated Insights**:\n\n" + first}
+                        while (text := await asyncio.to_thread(next, tokens, None)) is not None:
+                            yield "token", {"text": text}
+            except Exception as e:
+                print(f"LLM streaming failed, using template: {e}")
+                status, error = "error", f"LLM generation failed: {e}"
+            if llm_used:
+                yield "token", {"text": "\n\n📋 **Structured Analysis**:\n\n"}
+        
+        template = _get_category_analysis(query.lower(), category) + _build_recommendations_section(ml_insights['recommendations'])
+        for line in template.splitlines(keepends=True):
+            yield "token", {"text": line}
+        if llm_used:
+            yield "token", {"text": "\n\n🔬 *Powered by scikit-learn ML + DistilGPT-2 LLM*"}
+            model = "ml+llm"
+        else:
+            yield "token", {"text": "\n\n🔬 *Powered by scikit-learn ML models*"}
+            model = ml_insights['ml_model']
+    else:
+        provider = provider_service.resolve_provider()
+        model = "gpt-3.5-turbo" if provider == "openai" else "claude-3-haiku"
+        try:
+            async with get_scheduler().slot(priority):
+                async for text in _stream_ai_api(provider, query):
+                    yield "token", {"text": text}
+        except Exception as e:
+            status = "error"
+            yield "token", {"text": f"AI Error: {str(e)}\n\nFalling back to mock mode."}
+    
+    done = {"status": status, "model": model}
+    if error:
+        done["error"] = error
+    yield "done", done
+
+
+async def _stream_ai_api(provider: str, query: str) -> AsyncIterator[str]:
+    """Stream completion text deltas from the provider"""
+    client = provider_service.get_async_client(provider)
+    request = _provider_request(provider, query)
+    if provider == "openai":
+        stream = await client.chat.completions.create(**request, stream=True)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    else:
+        stream = await client.messages.create(**request, stream=True)
+        async for event in stream:
+            if event.type == "content_block_delta":
+                yield event.delta.text
+
+
 
 def _get_category_analysis(query_lower: str, category: str) -> str:
     """Get detailed analysis based on ML category"""
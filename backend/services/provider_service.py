@@ -0,0 +1,151 @@
+"""
+Model provider client registry for SAP AI Assistant
+Creates each OpenAI/Anthropic client once per process over a pooled httpx
+transport, so TLS sessions and keep-alive connections are reused between
+requests and every call has connect/read timeouts
+"""
+import asyncio
+import threading
+from typing import Optional
+
+import httpx
+
+from backend.config import settings, Settings
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+try:
+    import anthropic
+except ImportError:
+    anthropic = None
+
+
+_lock = threading.Lock()
+_clients = {}
+_async_clients = {}
+# Close tasks for replaced async clients, referenced until they finish
+_closing = set()
+
+
+def resolve_provider(config: Settings = settings) -> str:
+    """Pick the provider: explicit MODEL_PROVIDER, else by API key prefix and installed SDKs"""
+    provider = config.model_provider.lower()
+    if provider in ("openai", "anthropic"):
+        return provider
+    if config.model_api_key.startswith("sk-ant-") and anthropic:
+        return "anthropic"
+    if openai:
+        return "openai"
+    if anthropic:
+        return "anthropic"
+    raise Exception("No AI library installed. Run: pip install openai anthropic")
+
+
+def _timeout(config: Settings) -> httpx.Timeout:
+    return httpx.Timeout(config.model_read_timeout, connect=config.model_connect_timeout)
+
+
+def _limits(config: Settings) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.model_max_connections,
+        max_keepalive_connections=config.model_max_keepalive
+    )
+
+
+def _build_client(provider: str, config: Settings, http_client):
+    kwargs = {
+        "api_key": config.model_api_key,
+        "http_client": http_client,
+        "timeout": _timeout(config),
+        "max_retries": config.model_max_retries,
+    }
+    if config.model_base_url:
+        kwargs["base_url"] = config.model_base_url
+
+    if provider == "openai":
+        if not openai:
+            raise Exception("openai is not installed. Run: pip install openai")
+        client_cls = openai.AsyncOpenAI if isinstance(http_client, httpx.AsyncClient) else openai.OpenAI
+    elif provider == "anthropic":
+        if not anthropic:
+            raise Exception("anthropic is not installed. Run: pip install anthropic")
+        client_cls = anthropic.AsyncAnthropic if isinstance(http_client, httpx.AsyncClient) else anthropic.Anthropic
+    else:
+        raise ValueError(f"Unknown model provider: {provider}")
+    return client_cls(**kwargs)
+
+
+def get_client(provider: Optional[str] = None, config: Settings = settings):
+    """Process-wide sync client for the provider"""
+    provider = provider or resolve_provider(config)
+    client = _clients.get(provider)
+    if client is None:
+        with _lock:
+            client = _clients.get(provider)
+            if client is None:
+                http_client = httpx.Client(timeout=_timeout(config), limits=_limits(config))
+                client = _build_client(provider, config, http_client)
+                _clients[provider] = client
+    return client
+
+
+def get_async_client(provider: Optional[str] = None, config: Settings = settings):
+    """Async client for the provider, shared by everything on the running event loop"""
+    provider = provider or resolve_provider(config)
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(provider)
+    # httpx.AsyncClient connections belong to the loop that opened them
+    if entry is None or entry[0] is not loop:
+        http_client = httpx.AsyncClient(timeout=_timeout(config), limits=_limits(config))
+        new_entry = (loop, _build_client(provider, config, http_client))
+        with _lock:
+            old, _async_clients[provider] = _async_clients.get(provider), new_entry
+        if old is not None:
+            _close_async_client(*old)
+        entry = new_entry
+    return entry[1]
+
+
+def _close_async_client(owner: asyncio.AbstractEventLoop, client):
+    """Release a client whose loop is not the running one: on its own loop
+    while that still runs, otherwise from here as far as the closed loop allows"""
+    if owner.is_running():
+        asyncio.run_coroutine_threadsafe(client.close(), owner)
+        return
+    task = asyncio.ensure_future(_close_quietly(client))
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+async def _close_quietly(client):
+    try:
+        await client.close()
+    except Exception as e:
+        # Sockets tied to a closed loop can't be shut down cleanly
+        print(f"Closing a stale provider client failed: {e}")
+
+
+def close_clients():
+    """Close sync clients (call on shutdown)"""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+async def aclose_clients():
+    """Close async clients (call on shutdown from the serving loop)"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        entries = list(_async_clients.values())
+        _async_clients.clear()
+    for owner, client in entries:
+        if owner is loop:
+            await client.close()
+        else:
+            _close_async_client(owner, client)
+    if _closing:
+        await asyncio.gather(*_closing)
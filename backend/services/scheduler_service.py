@@ -0,0 +1,117 @@
+"""
+Priority scheduling of model calls for SAP AI Assistant
+Provider and local LLM calls take a slot from a concurrency-capped scheduler.
+When every slot is busy, callers wait in one queue per business-impact
+priority (from MLAnalysisService.calculate_business_impact) and free slots
+are handed out by smooth weighted round-robin, so High-priority questions
+keep predictable latency under saturation while Low ones still progress
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from backend.config import settings, Settings
+
+PRIORITIES = ("High", "Medium", "Low")
+
+
+def parse_weights(spec: str) -> Dict[str, int]:
+    """Parse "High=6,Medium=3,Low=1" into weights; unlisted priorities get 1"""
+    weights = {priority: 1 for priority in PRIORITIES}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        priority, _, weight = part.partition("=")
+        if priority.strip() not in weights:
+            raise ValueError(f"Unknown priority {priority.strip()!r}, expected one of {PRIORITIES}")
+        weights[priority.strip()] = max(1, int(weight))
+    return weights
+
+
+class PriorityScheduler:
+    """Concurrency cap with per-priority wait queues and weighted fair dequeueing"""
+
+    def __init__(self, max_concurrency: int = 16, weights: Optional[Dict[str, int]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.weights = weights or {priority: 1 for priority in PRIORITIES}
+        self._active = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        self._credit = {priority: 0 for priority in PRIORITIES}
+        self._waits = {priority: [0, 0.0, 0.0] for priority in PRIORITIES}  # [admitted, total_ms, max_ms]
+
+    @asynccontextmanager
+    async def slot(self, priority: str):
+        """Hold one model-call slot for the duration of the block"""
+        priority = priority if priority in self._queues else "Medium"
+        started = time.perf_counter()
+        if self._active < self.max_concurrency and not any(self._queues.values()):
+            self._active += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues[priority].append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release()  # granted just as the caller went away
+                else:
+                    self._queues[priority].remove(waiter)
+                raise
+        self._record_wait(priority, started)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        priority = self._next_priority()
+        if priority is None:
+            self._active -= 1
+            return
+        # Hand the slot straight to the chosen waiter; _active is unchanged
+        self._queues[priority].popleft().set_result(None)
+
+    def _next_priority(self) -> Optional[str]:
+        # Smooth weighted round-robin over the non-empty queues
+        ready = [priority for priority in PRIORITIES if self._queues[priority]]
+        if not ready:
+            return None
+        for priority in ready:
+            self._credit[priority] += self.weights[priority]
+        chosen = max(ready, key=lambda priority: self._credit[priority])
+        self._credit[chosen] -= sum(self.weights[priority] for priority in ready)
+        return chosen
+
+    def _record_wait(self, priority: str, started: float):
+        waited_ms = (time.perf_counter() - started) * 1000
+        counters = self._waits[priority]
+        counters[0] += 1
+        counters[1] += waited_ms
+        counters[2] = max(counters[2], waited_ms)
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "priorities": {
+                priority: {
+                    "waiting": len(self._queues[priority]),
+                    "admitted": admitted,
+                    "avg_wait_ms": round(total / admitted, 3) if admitted else 0.0,
+                    "max_wait_ms": round(peak, 3),
+                }
+                for priority, (admitted, total, peak) in self._waits.items()
+            },
+        }
+
+
+# Singleton instance
+_scheduler = None
+
+
+def get_scheduler(config: Settings = settings) -> PriorityScheduler:
+    """Get or create the model-call scheduler (LLM_MAX_CONCURRENCY, LLM_PRIORITY_WEIGHTS)"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = PriorityScheduler(config.llm_max_concurrency, parse_weights(config.llm_priority_weights))
+    return _scheduler
@@ -0,0 +1,76 @@
+"""Benchmark: per-query classification cost as the example corpus grows
+
+Compares the old path (sklearn cosine_similarity against every example) with
+the precomputed sparse-dot paths of MLAnalysisService ("nearest" example and
+per-category "centroid"), on synthetic corpora built from each category's
+keywords and examples.
+
+Usage: python bench_classifier.py [--sizes 4,100,1000,5000] [--queries 2000]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from backend.services.ml_service import MLAnalysisService
+
+TEMPLATES = [
+    "What is our {a} {b}?", "Show me {a} and {b}", "How is the {a} {b} trending?",
+    "{a} report for {b}", "Can you analyze {a} {b} this quarter?", "{a} {b} by region",
+]
+
+
+def synthetic_corpus(base: dict, per_category: int) -> dict:
+    corpus = {}
+    for category, data in base.items():
+        examples = list(data["examples"])
+        while len(examples) < per_category:
+            a, b = random.sample(data["keywords"], 2)
+            examples.append(random.choice(TEMPLATES).format(a=a, b=b))
+        corpus[category] = {"keywords": data["keywords"], "examples": examples[:per_category]}
+    return corpus
+
+
+def time_per_query(fn, queries) -> float:
+    started = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - started) * 1e6 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="4,100,1000,5000", help="examples per category")
+    parser.add_argument("--queries", type=int, default=2000, help="queries timed per size")
+    args = parser.parse_args()
+
+    random.seed(42)
+    base = MLAnalysisService().categories
+    probe = synthetic_corpus(base, 200)
+    queries = [random.choice(d["examples"]) for d in probe.values() for _ in range(args.queries // len(probe))]
+
+    print(f"{'examples/cat':>12} {'sklearn (us)':>13} {'nearest (us)':>13} {'centroid (us)':>14} {'agree':>7}")
+    print("-" * 64)
+    for size in (int(s) for s in args.sizes.split(",")):
+        corpus = synthetic_corpus(base, size)
+        nearest = MLAnalysisService(corpus, classifier="nearest")
+        centroid = MLAnalysisService(corpus, classifier="centroid")
+
+        def old_path(query):
+            similarities = cosine_similarity(nearest.vectorize(query), nearest.training_vectors)[0]
+            return nearest.training_labels[int(np.argmax(similarities))]
+
+        vectors = [nearest.vectorize(q) for q in queries]
+        sklearn_us = time_per_query(lambda v: cosine_similarity(v, nearest.training_vectors).argmax(), vectors)
+        nearest_us = time_per_query(nearest.categorize_vector, vectors)
+        centroid_us = time_per_query(centroid.categorize_vector, vectors)
+        agree = np.mean([old_path(q) == centroid.categorize_query(q)[0] for q in queries[:500]])
+        print(f"{size:>12,} {sklearn_us:>13.1f} {nearest_us:>13.1f} {centroid_us:>14.1f} {agree:>7.1%}")
+
+    print("\nTimes exclude vectorization (identical for all paths); 'agree' is centroid vs old labels.")
+
+
+if __name__ == "__main__":
+    main()
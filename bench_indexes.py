@@ -0,0 +1,160 @@
+"""Benchmark: hot foreign-key lookups before and after the index migration
+
+Builds a throwaway SQLite database without the model indexes (like an old
+sap_assistant.db), loads it with synthetic rows, then runs backend.migrations
+and compares query plans and lookup latency.
+
+Usage: python bench_indexes.py [--rows 1000000] [--lookups 200]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from backend.models import Base
+from backend.migrations import run_migrations, SCHEMA_VERSION_TABLE
+
+LOOKUPS = {
+    "comments by conversation": (
+        "SELECT * FROM comments WHERE conversation_id = ? ORDER BY created_at",
+        lambda ctx: (random.choice(ctx["conversations"]),)
+    ),
+    "queries by conversation": (
+        "SELECT * FROM queries WHERE conversation_id = ? ORDER BY created_at",
+        lambda ctx: (random.choice(ctx["conversations"]),)
+    ),
+    "reaction upsert lookup": (
+        "SELECT * FROM reactions WHERE conversation_id = ? AND user_id = ?",
+        lambda ctx: random.choice(ctx["reaction_keys"])
+    ),
+    "insight by query": (
+        "SELECT * FROM insights WHERE query_id = ?",
+        lambda ctx: (random.choice(ctx["queries"]),)
+    ),
+}
+
+
+def build_legacy_database(path: str, rows: int) -> dict:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name != "ix_users_email":
+                    conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {SCHEMA_VERSION_TABLE}"))
+    engine.dispose()
+
+    n_users = 1000
+    n_conversations = max(1, rows // 100)
+    users = [str(uuid.uuid4()) for _ in range(n_users)]
+    conversations = [str(uuid.uuid4()) for _ in range(n_conversations)]
+    queries = []
+    reaction_keys = []
+    start = datetime(2025, 1, 1)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.executemany(
+        "INSERT INTO users (user_id, name, role, department, email, password, created_at) VALUES (?, ?, 'Analyst', 'Sales', ?, '', ?)",
+        ((u, f"User {i}", f"user{i}@bench.local", start) for i, u in enumerate(users))
+    )
+    conn.executemany(
+        "INSERT INTO conversations (conversation_id, user_id, title, visibility, status, created_at) VALUES (?, ?, ?, ?, 'active', ?)",
+        ((c, random.choice(users), f"Conversation {i}", random.choice(["public", "department", "private"]),
+          start + timedelta(minutes=i)) for i, c in enumerate(conversations))
+    )
+
+    def query_rows():
+        for i in range(rows):
+            query_id = str(uuid.uuid4())
+            if i % 1000 == 0:
+                queries.append(query_id)
+            yield (query_id, random.choice(conversations), random.choice(users), f"Question {i}", start + timedelta(seconds=i))
+
+    def insight_rows():
+        for i, query_id in enumerate(conn.execute("SELECT query_id FROM queries").fetchall()):
+            yield (str(uuid.uuid4()), query_id[0], f"Insight {i}", start + timedelta(seconds=i))
+
+    def comment_rows():
+        for i in range(rows):
+            yield (str(uuid.uuid4()), random.choice(conversations), random.choice(users), f"Comment {i}", start + timedelta(seconds=i))
+
+    def reaction_rows():
+        for i in range(rows):
+            key = (conversations[i % n_conversations], users[(i // n_conversations) % n_users])
+            if i % 1000 == 0:
+                reaction_keys.append(key)
+            yield (str(uuid.uuid4()), key[0], key[1], "like", start + timedelta(seconds=i))
+
+    conn.executemany("INSERT INTO queries (query_id, conversation_id, user_id, question, created_at) VALUES (?, ?, ?, ?, ?)", query_rows())
+    conn.executemany("INSERT INTO insights (insight_id, query_id, response, created_at) VALUES (?, ?, ?, ?)", insight_rows())
+    conn.executemany("INSERT INTO comments (comment_id, conversation_id, user_id, content, created_at) VALUES (?, ?, ?, ?, ?)", comment_rows())
+    conn.executemany("INSERT INTO reactions (reaction_id, conversation_id, user_id, reaction_type, created_at) VALUES (?, ?, ?, ?, ?)", reaction_rows())
+    conn.commit()
+    conn.close()
+
+    return {"conversations": conversations, "queries": queries, "reaction_keys": reaction_keys}
+
+
+def measure(path: str, ctx: dict, lookups: int) -> dict:
+    conn = sqlite3.connect(path)
+    results = {}
+    for name, (sql, params) in LOOKUPS.items():
+        plan = " | ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params(ctx)))
+        started = time.perf_counter()
+        for _ in range(lookups):
+            conn.execute(sql, params(ctx)).fetchall()
+        elapsed_ms = (time.perf_counter() - started) * 1000 / lookups
+        results[name] = (plan, elapsed_ms)
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows per child table")
+    parser.add_argument("--lookups", type=int, default=200, help="lookups per query type")
+    args = parser.parse_args()
+
+    random.seed(42)
+    path = os.path.join(tempfile.mkdtemp(prefix="sap_bench_"), "bench.db")
+    print(f"Building legacy database with {args.rows:,} rows per table at {path} ...")
+    started = time.perf_counter()
+    ctx = build_legacy_database(path, args.rows)
+    print(f"   built in {time.perf_counter() - started:.1f}s\n")
+
+    before = measure(path, ctx, max(1, args.lookups // 20))
+
+    print("Running migrations ...")
+    engine = create_engine(f"sqlite:///{path}")
+    started = time.perf_counter()
+    version = run_migrations(engine)
+    engine.dispose()
+    print(f"   schema version {version} in {time.perf_counter() - started:.1f}s\n")
+
+    after = measure(path, ctx, args.lookups)
+
+    print(f"{'lookup':<26} {'before (ms)':>12} {'after (ms)':>12} {'speedup':>9}")
+    print("-" * 62)
+    for name in LOOKUPS:
+        b, a = before[name][1], after[name][1]
+        print(f"{name:<26} {b:>12.3f} {a:>12.4f} {b / a if a else float('inf'):>8.0f}x")
+    print("\nQuery plans:")
+    for name in LOOKUPS:
+        print(f"  {name}")
+        print(f"    before: {before[name][0]}")
+        print(f"    after:  {after[name][0]}")
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark: local LLM inference backends (torch fp32, dynamic int8, ONNX Runtime)
+
+Each backend is loaded in its own process so resident memory is measured
+separately. Reports model RSS, greedy generation latency and tokens/sec for
+the analysis prompts, and output parity with the fp32 model (share of
+generated tokens identical to torch's greedy output).
+
+Usage: python bench_llm_backends.py [--backends torch,int8,onnx] [--tokens 64] [--repeats 5]
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+QUERIES = [
+    ("What are Q4 sales trends?", "sales_revenue"),
+    ("Is stock getting reduced?", "stock_inventory"),
+    ("Show me customer churn analysis", "customer_analysis"),
+    ("Where can we reduce costs?", "cost_budget"),
+]
+ML_INSIGHTS = {"impact_metrics": {"priority": "High", "impact_score": 0.8}}
+
+
+def rss_mb() -> float:
+    # Peak RSS of this process (KB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(backend: str, args) -> dict:
+    import torch
+    from transformers import AutoTokenizer
+    from backend.services.llm_service import LLMAnalysisService, load_causal_lm
+
+    baseline = rss_mb()
+    service = LLMAnalysisService(backend)
+    tokenizer = AutoTokenizer.from_pretrained(service.model_name)
+    model = load_causal_lm(service.model_name, backend)
+    loaded = rss_mb()
+
+    outputs, latencies, tokens = [], [], 0
+    for i in range(args.repeats * len(QUERIES)):
+        query, category = QUERIES[i % len(QUERIES)]
+        inputs = tokenizer(service._build_prompt(query, category, ML_INSIGHTS), return_tensors="pt")
+        started = time.perf_counter()
+        with torch.no_grad():
+            generated = model.generate(**inputs, max_new_tokens=args.tokens, min_new_tokens=args.tokens,
+                                       do_sample=False, pad_token_id=tokenizer.eos_token_id)
+        latencies.append(time.perf_counter() - started)
+        new_tokens = generated[0, inputs["input_ids"].shape[1]:].tolist()
+        tokens += len(new_tokens)
+        if i < len(QUERIES):
+            outputs.append(new_tokens)
+
+    return {
+        "model RSS MB": loaded - baseline,
+        "p50 ms": sorted(latencies)[len(latencies) // 2] * 1000,
+        "tokens/s": tokens / sum(latencies),
+        "outputs": outputs,
+    }
+
+
+def _child(backend, args, results):
+    try:
+        results[backend] = run_backend(backend, args)
+    except Exception as e:
+        print(f"{backend}: {e}")
+
+
+def parity(outputs, reference) -> float:
+    same = sum(a == b for out, ref in zip(outputs, reference) for a, b in zip(out, ref))
+    return 100 * same / sum(len(ref) for ref in reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", default="torch,int8,onnx")
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Manager().dict()
+    for backend in ["torch"] + [b for b in args.backends.split(",") if b != "torch"]:
+        process = context.Process(target=_child, args=(backend, args, results))
+        process.start()
+        process.join()
+    results = dict(results)
+    if "torch" not in results:
+        return
+
+    reference = results["torch"]["outputs"]
+    for result in results.values():
+        result["parity %"] = parity(result.pop("outputs"), reference)
+
+    metrics = list(next(iter(results.values())).keys())
+    print(f"{'metric':<14}" + "".join(f"{name:>12}" for name in results))
+    print("-" * (14 + 12 * len(results)))
+    for metric in metrics:
+        print(f"{metric:<14}" + "".join(f"{results[name][metric]:>12.1f}" for name in results))
+
+
+if __name__ == "__main__":
+    main()
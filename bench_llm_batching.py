@@ -0,0 +1,85 @@
+"""Benchmark: local DistilGPT-2 generation throughput under concurrency, unbatched vs micro-batched
+
+Client threads submit analysis prompts to a GenerationBatcher at the same
+time, once with max batch size 1 (sequential batch-size-1 generate calls, as
+the per-request pipeline did) and once with the configured batch size.
+Reports generated tokens/sec and per-request latency.
+
+Usage: python bench_llm_batching.py [--clients 8] [--requests 32] [--batch-size 8] [--wait-ms 10]
+"""
+import argparse
+import threading
+import time
+
+from backend.services.llm_service import GenerationBatcher, LLMAnalysisService
+
+QUERIES = [
+    ("What are Q4 sales trends?", "sales_revenue"),
+    ("Is stock getting reduced?", "stock_inventory"),
+    ("Show me customer churn analysis", "customer_analysis"),
+    ("Where can we reduce costs?", "cost_budget"),
+]
+ML_INSIGHTS = {"impact_metrics": {"priority": "High", "impact_score": 0.8}}
+
+
+def run_profile(service: LLMAnalysisService, batch_size: int, args) -> dict:
+    batcher = GenerationBatcher(service.model, service.tokenizer, max_batch_size=batch_size, max_wait_ms=args.wait_ms)
+    prompts = [service._build_prompt(q, c, ML_INSIGHTS) for q, c in QUERIES]
+    lock = threading.Lock()
+    counters = {"next": 0, "tokens": 0, "latency": []}
+
+    def client():
+        while True:
+            with lock:
+                i = counters["next"]
+                if i >= args.requests:
+                    return
+                counters["next"] += 1
+            started = time.perf_counter()
+            text = batcher.submit(prompts[i % len(prompts)]).result()
+            with lock:
+                counters["tokens"] += len(service.tokenizer.encode(text))
+                counters["latency"].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latency = sorted(counters["latency"])
+    return {
+        "tokens/s": counters["tokens"] / elapsed,
+        "requests/s": args.requests / elapsed,
+        "p50 ms": latency[len(latency) // 2] * 1000,
+        "p95 ms": latency[int(len(latency) * 0.95)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--wait-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    service = LLMAnalysisService()
+    service._initialize_model()
+    print(f"{args.clients} clients, {args.requests} generations per profile\n")
+    results = {
+        "unbatched": run_profile(service, 1, args),
+        f"batch({args.batch_size})": run_profile(service, args.batch_size, args),
+    }
+
+    metrics = list(next(iter(results.values())).keys())
+    print(f"{'metric':<14}" + "".join(f"{name:>12}" for name in results))
+    print("-" * (14 + 12 * len(results)))
+    for metric in metrics:
+        print(f"{metric:<14}" + "".join(f"{results[name][metric]:>12.1f}" for name in results))
+
+
+if __name__ == "__main__":
+    main()
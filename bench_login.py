@@ -0,0 +1,103 @@
+"""Load test: login throughput under concurrent requests, inline vs process-pool hashing
+
+Runs login threads (db_service.validate_user, as served by POST /api/login)
+against a throwaway database, once with argon2 verification inline on the
+request threads (COMPUTE_WORKERS=0) and once offloaded to a warm
+ComputePool of worker processes.
+
+Usage: python bench_login.py [--threads 16] [--workers 4] [--seconds 10]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from backend.config import settings
+from backend.database import create_db_engine
+from backend.models import Base
+from backend.services import compute_service, db_service
+from backend.services.compute_service import ComputePool
+
+PASSWORD = "password123"
+
+
+def run_profile(workers: int, Session, emails: list, args) -> dict:
+    compute_service._pool = pool = ComputePool(workers)
+    pool.warm_up()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"logins": 0, "failures": 0, "latency": []}
+
+    def client():
+        while not stop.is_set():
+            started = time.perf_counter()
+            db = Session()
+            try:
+                ok = db_service.validate_user(random.choice(emails), PASSWORD, db=db) is not None
+            finally:
+                db.close()
+            with lock:
+                if ok:
+                    stats["logins"] += 1
+                    stats["latency"].append(time.perf_counter() - started)
+                else:
+                    stats["failures"] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    compute_service.shutdown_pool()
+
+    def p95(values):
+        return sorted(values)[int(len(values) * 0.95)] * 1000 if values else float("nan")
+
+    return {
+        "logins/s": stats["logins"] / args.seconds,
+        "p95 ms": p95(stats["latency"]),
+        "failures": stats["failures"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="sap_bench_"), "bench.db")
+    engine = create_db_engine(f"sqlite:///{path}", settings)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    emails = [db_service.create_user(f"User {i}", "Analyst", "Sales", f"login{i}@sap.local", PASSWORD, db=db)["email"]
+              for i in range(args.users)]
+    db.commit()
+    db.close()
+
+    print(f"{args.threads} login threads for {args.seconds:.0f}s per profile\n")
+    results = {
+        "inline": run_profile(0, Session, emails, args),
+        f"pool({args.workers})": run_profile(args.workers, Session, emails, args),
+    }
+    engine.dispose()
+
+    metrics = list(next(iter(results.values())).keys())
+    print(f"{'metric':<14}" + "".join(f"{name:>12}" for name in results))
+    print("-" * (14 + 12 * len(results)))
+    for metric in metrics:
+        print(f"{metric:<14}" + "".join(f"{results[name][metric]:>12.1f}" for name in results))
+
+
+if __name__ == "__main__":
+    main()
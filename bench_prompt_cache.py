@@ -0,0 +1,68 @@
+"""Benchmark: prompt processing with and without the per-category prefix KV cache
+
+Times a one-token generate (prompt encoding + first decode step) for
+analysis prompts, once re-encoding the whole prompt and once starting from
+the cached past_key_values of the category prefix, so only the query
+suffix is encoded.
+
+Usage: python bench_prompt_cache.py [--repeats 50]
+"""
+import argparse
+import time
+
+import torch
+
+from backend.services.llm_service import LLMAnalysisService
+
+QUERIES = [
+    ("What are Q4 sales trends?", "sales_revenue"),
+    ("Is stock getting reduced?", "stock_inventory"),
+    ("Show me customer churn analysis", "customer_analysis"),
+    ("Where can we reduce costs?", "cost_budget"),
+]
+ML_INSIGHTS = {"impact_metrics": {"priority": "High", "impact_score": 0.8}}
+
+
+def time_first_token(service: LLMAnalysisService, make_inputs, repeats: int) -> float:
+    samples = []
+    for i in range(repeats):
+        query, category = QUERIES[i % len(QUERIES)]
+        prefix, suffix = service._prompt_parts(query, category, ML_INSIGHTS)
+        started = time.perf_counter()
+        with torch.no_grad():
+            service.model.generate(**make_inputs(prefix, suffix), max_new_tokens=1, do_sample=False,
+                                   pad_token_id=service.tokenizer.eos_token_id)
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    service = LLMAnalysisService()
+    service._initialize_model()
+    prefix, suffix = service._prompt_parts(*QUERIES[0], ML_INSIGHTS)
+    prefix_tokens = len(service.tokenizer.encode(prefix))
+    suffix_tokens = len(service.tokenizer.encode(suffix))
+    print(f"Prompt: {prefix_tokens} prefix + ~{suffix_tokens} suffix tokens, {args.repeats} runs\n")
+
+    def full_prompt(prefix, suffix):
+        return service.tokenizer(prefix + suffix, return_tensors="pt")
+
+    for q, c in QUERIES:  # fill the cache so only reuse is timed
+        service.prefix_cache.get(service._prompt_parts(q, c, ML_INSIGHTS)[0])
+    results = {
+        "full prompt": time_first_token(service, full_prompt, args.repeats),
+        "prefix cache": time_first_token(service, service.prefix_cache.generation_inputs, args.repeats),
+    }
+
+    print(f"{'path':<14}{'p50 first-token ms':>20}")
+    print("-" * 34)
+    for name, value in results.items():
+        print(f"{name:<14}{value:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark: history search, LIKE scan vs the FTS5 index
+
+Fills a throwaway SQLite database with conversations, questions, insights
+and comments, then times the same searches as a LIKE '%term%' scan over the
+three text columns and as db_service.search_content (FTS5 + bm25).
+
+Usage: python bench_search.py [--conversations 100000] [--searches 50]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import create_db_engine
+from backend.migrations import run_migrations
+from backend.models import Base
+from backend.services import db_service
+
+WORDS = ("sales revenue inventory stock customer churn budget cost risk compliance margin forecast "
+         "region quarter supplier delivery growth decline target pipeline invoice audit").split()
+TERMS = ["churn", "supplier delivery", "margin forecast", "audit", "invoice"]
+
+
+def sentence(n: int = 12) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def seed(engine, conversations: int):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (user_id, name, department) VALUES ('u1', 'Bench', 'Sales')"))
+        for start in range(0, conversations, 5000):
+            batch = range(start, min(start + 5000, conversations))
+            conn.execute(text("INSERT INTO conversations (conversation_id, user_id, title, visibility) VALUES (:c, 'u1', 'Bench', 'public')"),
+                         [{"c": f"c{i}"} for i in batch])
+            conn.execute(text("INSERT INTO queries (query_id, conversation_id, question) VALUES (:q, :c, :t)"),
+                         [{"q": f"q{i}", "c": f"c{i}", "t": sentence(10)} for i in batch])
+            conn.execute(text("INSERT INTO insights (insight_id, query_id, response, status) VALUES (:i, :q, :t, 'ready')"),
+                         [{"i": f"i{i}", "q": f"q{i}", "t": sentence(60)} for i in batch])
+            conn.execute(text("INSERT INTO comments (comment_id, conversation_id, user_id, content) VALUES (:m, :c, 'u1', :t)"),
+                         [{"m": f"m{i}", "c": f"c{i}", "t": sentence(15)} for i in batch])
+
+
+def like_search(db, term: str):
+    pattern = f"%{term}%"
+    return db.execute(text("""
+        SELECT 'query', query_id FROM queries WHERE question LIKE :p
+        UNION ALL SELECT 'insight', insight_id FROM insights WHERE response LIKE :p
+        UNION ALL SELECT 'comment', comment_id FROM comments WHERE content LIKE :p
+        LIMIT 20
+    """), {"p": pattern}).fetchall()
+
+
+def time_ms(fn, searches: int) -> float:
+    samples = []
+    for i in range(searches):
+        started = time.perf_counter()
+        fn(TERMS[i % len(TERMS)])
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--searches", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(7)
+    path = os.path.join(tempfile.mkdtemp(prefix="sap_bench_"), "bench.db")
+    engine = create_db_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    started = time.perf_counter()
+    seed(engine, args.conversations)
+    print(f"Indexed {args.conversations * 3} rows in {time.perf_counter() - started:.1f}s\n")
+
+    db = sessionmaker(bind=engine)()
+    results = {
+        "LIKE scan": time_ms(lambda term: like_search(db, term), args.searches),
+        "FTS5 + bm25": time_ms(lambda term: db_service.search_content("u1", term, "Sales", limit=20, db=db), args.searches),
+    }
+    db.close()
+    engine.dispose()
+
+    print(f"{'path':<14}{'p50 ms':>10}")
+    print("-" * 24)
+    for name, value in results.items():
+        print(f"{name:<14}{value:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
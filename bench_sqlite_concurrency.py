@@ -0,0 +1,148 @@
+"""Load test: concurrent reads/writes on the conversation workload, default vs tuned SQLite profile
+
+Runs reader threads (conversation detail + shared list, as served by
+GET /api/conversations/{id} and GET /api/conversations) alongside writer
+threads (comments + reactions) against a throwaway database, once with
+SQLite's defaults (rollback journal, synchronous=FULL) and once with the
+profile from backend.database (WAL, synchronous=NORMAL, cache/mmap, busy_timeout).
+
+Usage: python bench_sqlite_concurrency.py [--readers 16] [--writers 4] [--seconds 10]
+"""
+import argparse
+import dataclasses
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend.config import settings
+from backend.database import create_db_engine
+from backend.models import Base
+from backend.services import db_service
+
+PROFILES = {
+    "default": dataclasses.replace(
+        settings, sqlite_journal_mode="DELETE", sqlite_synchronous="FULL",
+        sqlite_cache_size_kb=2000, sqlite_mmap_size=0, sqlite_busy_timeout_ms=5000,
+        db_pool_size=5, db_max_overflow=10
+    ),
+    "tuned": settings,
+}
+
+
+def seed(Session, conversations: int = 200, comments_per_conversation: int = 20) -> dict:
+    db = Session()
+    users = [db_service.create_user(f"User {i}", "Analyst", "Sales", f"bench{i}@sap.local", db=db) for i in range(20)]
+    conversation_ids = []
+    for i in range(conversations):
+        owner = random.choice(users)
+        conv = db_service.create_conversation(owner["user_id"], f"Conversation {i}", random.choice(["public", "department"]), db=db)
+        conversation_ids.append(conv["conversation_id"])
+        q = db_service.create_query(conv["conversation_id"], owner["user_id"], "What are Q4 sales trends?", db=db)
+        db_service.create_insight(q["query_id"], "Sales increased by 15%." * 20, db=db)
+        for j in range(comments_per_conversation):
+            db_service.create_comment(conv["conversation_id"], random.choice(users)["user_id"], f"Comment {j}", db=db)
+    db.commit()
+    db.close()
+    return {"users": [u["user_id"] for u in users], "conversations": conversation_ids}
+
+
+def run_profile(name: str, config, args) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix="sap_bench_"), "bench.db")
+    engine = create_db_engine(f"sqlite:///{path}", config)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    random.seed(7)
+    ctx = seed(Session)
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"reads": 0, "writes": 0, "errors": 0, "read_latency": [], "write_latency": []}
+
+    def reader():
+        while not stop.is_set():
+            started = time.perf_counter()
+            db = Session()
+            try:
+                db_service.get_conversation_detail(random.choice(ctx["conversations"]), db=db)
+                db_service.get_shared_conversations(random.choice(ctx["users"]), "Sales", limit=50, db=db)
+                ok = True
+            except OperationalError:
+                ok = False
+            finally:
+                db.close()
+            with lock:
+                if ok:
+                    stats["reads"] += 1
+                    stats["read_latency"].append(time.perf_counter() - started)
+                else:
+                    stats["errors"] += 1
+
+    def writer():
+        while not stop.is_set():
+            started = time.perf_counter()
+            db = Session()
+            try:
+                conv_id = random.choice(ctx["conversations"])
+                user_id = random.choice(ctx["users"])
+                db_service.create_comment(conv_id, user_id, "Load test comment", db=db)
+                db_service.add_reaction(conv_id, user_id, random.choice(["like", "helpful"]), db=db)
+                db.commit()
+                ok = True
+            except OperationalError:
+                db.rollback()
+                ok = False
+            finally:
+                db.close()
+            with lock:
+                if ok:
+                    stats["writes"] += 1
+                    stats["write_latency"].append(time.perf_counter() - started)
+                else:
+                    stats["errors"] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    def p95(values):
+        return sorted(values)[int(len(values) * 0.95)] * 1000 if values else float("nan")
+
+    return {
+        "reads/s": stats["reads"] / args.seconds,
+        "writes/s": stats["writes"] / args.seconds,
+        "read p95 ms": p95(stats["read_latency"]),
+        "write p95 ms": p95(stats["write_latency"]),
+        "errors": stats["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers + {args.writers} writers for {args.seconds:.0f}s per profile\n")
+    results = {name: run_profile(name, config, args) for name, config in PROFILES.items()}
+
+    metrics = list(next(iter(results.values())).keys())
+    print(f"{'metric':<14}" + "".join(f"{name:>12}" for name in results))
+    print("-" * (14 + 12 * len(results)))
+    for metric in metrics:
+        print(f"{metric:<14}" + "".join(f"{results[name][metric]:>12.1f}" for name in results))
+
+
+if __name__ == "__main__":
+    main()
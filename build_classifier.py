@@ -0,0 +1,22 @@
+"""
+Build the classifier artifact workers memory-map at startup
+Run this after changing the seed corpus or ML_HASH_FEATURES
+
+Usage: python build_classifier.py [--output backend/data/classifier]
+"""
+import argparse
+import time
+
+from backend.config import settings
+from backend.services.ml_service import DEFAULT_ARTIFACT_PATH, MLAnalysisService, corpus_fingerprint
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default=settings.ml_artifact_path or DEFAULT_ARTIFACT_PATH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    service = MLAnalysisService()
+    service.save_artifact(args.output, corpus_fingerprint())
+    print(f"Wrote {len(service.training_queries)} examples in {len(service.categories)} categories "
+          f"to {args.output} ({time.perf_counter() - started:.2f}s)")
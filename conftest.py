@@ -0,0 +1,15 @@
+"""Test session setup: the suite runs against a throwaway SQLite database"""
+import os
+import tempfile
+
+import pytest
+
+# Must be set before backend.database is imported, so its engine never opens
+# the checked-in sap_assistant.db
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="sap_tests_"), "test.db")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from backend.services import db_service
+    db_service.init_db()
@@ -1,6 +1,9 @@
 // State
 let currentUser = null;
 let currentConversationId = null;
+let currentComments = [];
+let currentReactions = [];
+let conversationSocket = null;
 const API_BASE = window.location.origin;
 
 // DOM Elements
@@ -242,6 +245,10 @@ function switchView(viewName) {
   }
 
   // Logic
+  if (viewName !== 'discussion' && conversationSocket) {
+    conversationSocket.close();
+    conversationSocket = null;
+  }
   if (viewName === 'conversations') {
     loadConversations();
   }
@@ -251,10 +258,17 @@ function switchView(viewName) {
 
 let currentFilter = 'all';
 
-async function loadConversations() {
+const CONVERSATION_PAGE_SIZE = 25;
+const CONVERSATION_LIST_FIELDS = 'conversation_id,user_id,creator_name,title,visibility,status,created_at,comment_count';
+let conversationsNextCursor = null;
+
+async function loadConversations(append = false) {
   if (!currentUser) return;
 
-  elements.lists.conversations.innerHTML = '<p class="placeholder">Loading...</p>';
+  if (!append) {
+    conversationsNextCursor = null;
+    elements.lists.conversations.innerHTML = '<p class="placeholder">Loading...</p>';
+  }
 
   // Update tab UI
   document.querySelectorAll('.filter-tab').forEach(tab => {
@@ -263,24 +277,37 @@ async function loadConversations() {
   });
 
   try {
-    const res = await fetch(`${API_BASE}/api/conversations?user_id=${currentUser.id}&view=${currentFilter}&department=${currentUser.department || ''}`);
+    const params = new URLSearchParams({
+      user_id: currentUser.id,
+      view: currentFilter,
+      department: currentUser.department || '',
+      limit: CONVERSATION_PAGE_SIZE,
+      fields: CONVERSATION_LIST_FIELDS
+    });
+    if (append && conversationsNextCursor) params.set('cursor', conversationsNextCursor);
+
+    const res = await fetch(`${API_BASE}/api/conversations?${params}`);
     const data = await res.json();
 
     if (data.status === 'success') {
-      renderConversationList(data.conversations);
+      conversationsNextCursor = data.next_cursor;
+      renderConversationList(data.conversations, append);
     }
   } catch (e) {
     elements.lists.conversations.innerHTML = '<p class="error">Failed to load conversations</p>';
   }
 }
 
-function renderConversationList(conversations) {
-  if (conversations.length === 0) {
+function renderConversationList(conversations, append = false) {
+  const existingLoadMore = document.getElementById('loadMoreConversationsBtn');
+  if (existingLoadMore) existingLoadMore.remove();
+
+  if (!append && conversations.length === 0) {
     elements.lists.conversations.innerHTML = '<p class="placeholder">No conversations found.</p>';
     return;
   }
 
-  elements.lists.conversations.innerHTML = conversations.map(c => `
+  const cards = conversations.map(c => `
     <div class="conversation-card" onclick="openConversation('${c.conversation_id}')">
       <div class="card-header">
         <h3 class="card-title">${c.title}</h3>
@@ -294,6 +321,17 @@ function renderConversationList(conversations) {
       </div>
     </div>
   `).join('');
+
+  if (append) {
+    elements.lists.conversations.insertAdjacentHTML('beforeend', cards);
+  } else {
+    elements.lists.conversations.innerHTML = cards;
+  }
+
+  if (conversationsNextCursor) {
+    elements.lists.conversations.insertAdjacentHTML('beforeend',
+      '<button id="loadMoreConversationsBtn" class="load-more-btn" onclick="loadConversations(true)">Load more</button>');
+  }
 }
 
 // --- Logic: Discussion / New Analysis ---
@@ -315,13 +353,12 @@ async function runNewAnalysis() {
   elements.buttons.run.disabled = true;
 
   try {
-    // Consolidated Analysis Call (Atomic backend operation)
-    const res = await fetch(`${API_BASE}/api/conversations/quick-analyze`, {
+    // Create the conversation, then stream the analysis into it as it is generated
+    const res = await fetch(`${API_BASE}/api/conversations`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({
         user_id: currentUser.id,
-        question: query,
         title: title,
         visibility: visibility
       })
@@ -330,15 +367,21 @@ async function runNewAnalysis() {
     const data = await res.json();
     if (data.status !== 'success') throw new Error(data.detail || "Analysis failed");
 
-    // Success! Redirect and render directly
-    currentConversationId = data.conversation.conversation_id;
+    const conversation = data.conversation;
+    currentConversationId = conversation.conversation_id;
     switchView('discussion');
-    renderConversationDetail(data);
+    renderConversationDetail({ conversation, queries: [{ question: query, insight: null }], comments: [] });
 
     // Reset inputs
     elements.inputs.query.value = '';
     elements.inputs.title.value = '';
 
+    const responseEl = elements.lists.discussion.querySelector('.ai-response');
+    await streamAnalysis(query, conversation.conversation_id, responseEl);
+
+    // Reload so the view shows the stored insight
+    window.openConversation(conversation.conversation_id);
+
   } catch (e) {
     alert(e.message);
   } finally {
@@ -348,6 +391,32 @@ async function runNewAnalysis() {
   }
 }
 
+// Stream an analysis (Server-Sent Events) into `target`; resolves when the insight is stored
+function streamAnalysis(query, conversationId, target) {
+  const params = new URLSearchParams({
+    query: query,
+    conversation_id: conversationId,
+    user_id: currentUser.id
+  });
+  const source = new EventSource(`${API_BASE}/api/analyze/stream?${params}`);
+  let text = '';
+
+  return new Promise((resolve, reject) => {
+    source.addEventListener('token', (e) => {
+      text += JSON.parse(e.data).text;
+      target.textContent = text;
+    });
+    source.addEventListener('done', (e) => {
+      source.close();
+      resolve(JSON.parse(e.data));
+    });
+    source.onerror = () => {
+      source.close();
+      reject(new Error("Analysis stream failed"));
+    };
+  });
+}
+
 // Open existing or fresh conversation details
 window.openConversation = async function (id) {
   currentConversationId = id;
@@ -363,12 +432,57 @@ window.openConversation = async function (id) {
 
     if (data.status === 'success') {
       renderConversationDetail(data);
+      subscribeToConversation(id);
     }
   } catch (e) {
     container.innerHTML = '<p class="error">Failed to load discussion</p>';
   }
 };
 
+// Live updates: the server pushes new comments and insights for the open conversation
+function subscribeToConversation(id) {
+  if (conversationSocket) conversationSocket.close();
+  const socket = new WebSocket(`${API_BASE.replace(/^http/, 'ws')}/ws/conversations/${id}`);
+  socket.onmessage = (e) => {
+    const event = JSON.parse(e.data);
+    if (socket !== conversationSocket || id !== currentConversationId) return;
+    applyConversationEvent(event, id);
+  };
+  conversationSocket = socket;
+}
+
+function applyConversationEvent(event, id) {
+  switch (event.type) {
+    case 'comment':
+      if (!currentComments.some(c => c.comment_id === event.data.comment_id)) {
+        currentComments.push(event.data);
+        renderComments(currentComments);
+      }
+      break;
+    case 'comment_deleted':
+      currentComments = currentComments.filter(c => c.comment_id !== event.data.comment_id);
+      renderComments(currentComments);
+      break;
+    case 'reaction':
+      // One reaction per user: a new one replaces theirs
+      currentReactions = currentReactions.filter(r => r.user_id !== event.data.user_id).concat(event.data);
+      renderReactions(currentReactions);
+      break;
+    case 'reaction_removed':
+      currentReactions = currentReactions.filter(r => r.user_id !== event.data.user_id);
+      renderReactions(currentReactions);
+      break;
+    case 'insight': {
+      const responseEl = elements.lists.discussion.querySelector(`.ai-response[data-query-id="${event.data.query_id}"]`);
+      if (responseEl && event.data.status !== 'pending') responseEl.innerHTML = event.data.response;
+      break;
+    }
+    case 'resync':
+      window.openConversation(id);
+      break;
+  }
+}
+
 function renderConversationDetail(data) {
   const { conversation, queries, comments } = data;
   const container = elements.lists.discussion;
@@ -384,15 +498,26 @@ function renderConversationDetail(data) {
       <div class="user-query">
         <strong>❓ Question:</strong> ${q.question}
       </div>
-      <div class="ai-response result">
+      <div class="ai-response result" data-query-id="${q.query_id || ''}">
         ${q.insight ? q.insight.response : 'Thinking...'}
       </div>
     </div>
     <hr class="separator"/>
   `).join('');
 
-  // Comments
-  renderComments(comments);
+  // Reactions and comments
+  currentReactions = data.reactions || [];
+  renderReactions(currentReactions);
+  currentComments = comments || [];
+  renderComments(currentComments);
+}
+
+function renderReactions(reactions) {
+  const counts = {};
+  reactions.forEach(r => { counts[r.reaction_type] = (counts[r.reaction_type] || 0) + 1; });
+  document.getElementById('reactionsBar').innerHTML = Object.entries(counts).map(([type, count]) => `
+    <span class="reaction-chip">${type} ${count}</span>
+  `).join('');
 }
 
 function renderComments(comments) {
@@ -435,8 +560,10 @@ async function postComment() {
     const data = await res.json();
     if (data.status === 'success') {
       elements.inputs.comment.value = '';
-      // Refresh discussion to show new comment
-      window.openConversation(currentConversationId);
+      // The conversation socket delivers the new comment; refetch only without it
+      if (!conversationSocket || conversationSocket.readyState !== WebSocket.OPEN) {
+        window.openConversation(currentConversationId);
+      }
     }
   } catch (e) {
     alert("Failed to post comment");
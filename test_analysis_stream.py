@@ -0,0 +1,63 @@
+"""Streamed analyses: shared with the response cache and single-flight, stored even when cut short"""
+import asyncio
+import uuid
+
+from backend import app as app_module
+from backend.services import db_service, model_service
+from backend.services.cache_service import ResponseCache, SingleFlight
+
+QUESTION = "What are Q4 sales trends?"
+
+
+async def _collect(question=QUESTION):
+    return [event async for event in model_service.stream_business_query(question)]
+
+
+def test_stream_is_cached_and_replayed(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(model_service, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(model_service, "get_single_flight", lambda: SingleFlight())
+
+    first = asyncio.run(_collect())
+    text = "".join(data["text"] for event, data in first if event == "token")
+    assert first[-1][1]["status"] == "success"
+
+    replay = asyncio.run(_collect("what are q4 sales trends"))
+    assert [event for event, _ in replay] == ["meta", "token", "done"]
+    assert replay[0][1]["cached"] and replay[0][1]["ml_insights"]["category"] == "sales_revenue"
+    assert replay[1][1]["text"] == text
+
+
+def test_quick_analysis_joins_a_stream_in_flight(monkeypatch):
+    single_flight = SingleFlight()
+    monkeypatch.setattr(model_service, "get_response_cache", lambda: None)
+    monkeypatch.setattr(model_service, "get_single_flight", lambda: single_flight)
+
+    async def scenario():
+        stream = model_service.stream_business_query(QUESTION)
+        events = [await stream.__anext__()]  # the stream now leads the question
+        quick = asyncio.ensure_future(model_service.analyze_business_query_async(QUESTION))
+        events += [event async for event in stream]
+        return events, await quick
+
+    events, quick = asyncio.run(scenario())
+    assert quick["coalesced"]
+    assert quick["analysis"] == "".join(data["text"] for event, data in events if event == "token")
+    assert single_flight.stats() == {"leaders": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_disconnected_stream_still_stores_the_insight():
+    user = db_service.create_user("Stream User", "Analyst", "Sales", f"stream_{uuid.uuid4()}@test.local")
+    conv = db_service.create_conversation(user["user_id"], "Cut short", "public")
+    query = db_service.create_query(conv["conversation_id"], user["user_id"], QUESTION)
+
+    async def disconnect_after_first_token():
+        body = app_module._analysis_event_stream(QUESTION, query).body_iterator
+        await body.__anext__()  # meta
+        await body.__anext__()  # first token
+        await body.aclose()
+
+    asyncio.run(disconnect_after_first_token())
+    insight = db_service.get_conversation_detail(conv["conversation_id"])["queries"][0]["insight"]
+    assert insight["status"] == "failed"
+    assert insight["response"].endswith(model_service.INTERRUPTED_NOTE)
@@ -0,0 +1,55 @@
+"""ComputePool offload of password hashing and ML scoring"""
+import os
+
+import pytest
+
+from backend.services import compute_service
+from backend.services.compute_service import ComputePool
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_hash_and_verify(workers):
+    pool = ComputePool(workers)
+    try:
+        pool.warm_up()
+        hashed = pool.run(compute_service._hash_password, "securePassword123")
+        assert hashed.startswith("$argon2")
+        assert pool.run(compute_service._verify_password, "securePassword123", hashed)
+        assert not pool.run(compute_service._verify_password, "wrongpassword", hashed)
+
+        stats = pool.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["tasks"]["verify_password"]["count"] == 2
+    finally:
+        pool.shutdown()
+
+
+def test_ml_insights_match_inline():
+    pool = ComputePool(1)
+    try:
+        _, insights = pool.run(compute_service._analyze_query, "What are Q4 sales trends?")
+        assert insights == ComputePool(0).run(compute_service._analyze_query, "What are Q4 sales trends?")[1]
+        assert insights["category"] == "sales_revenue"
+    finally:
+        pool.shutdown()
+
+
+def _crash_once(marker):
+    # Kills its worker the first time, like the OOM killer would
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return os.getpid()
+
+
+def test_broken_pool_is_replaced(tmp_path):
+    pool = ComputePool(1)
+    try:
+        pool.warm_up()
+        broken = pool._executor
+        assert broken._mp_context.get_start_method() == "spawn"
+        assert pool.run(_crash_once, str(tmp_path / "crashed")) > 0
+        assert pool._executor is not broken
+        assert pool.run(compute_service._verify_password, "x", compute_service._hash_password("x"))
+    finally:
+        pool.shutdown()
@@ -0,0 +1,46 @@
+"""Engine construction and schema migrations: pool options per SQLite mode, concurrent worker starts"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from backend.database import create_db_engine
+from backend.migrations import MIGRATIONS, fts5_available, run_migrations
+from backend.models import Base
+
+
+def test_in_memory_sqlite_engines_build(tmp_path):
+    for url in ("sqlite://", "sqlite:///:memory:", "sqlite:///file:mem?mode=memory&uri=true"):
+        engine = create_db_engine(url)
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+        engine.dispose()
+
+    engine = create_db_engine(f"sqlite:///{os.path.join(str(tmp_path), 'file.db')}")
+    assert engine.pool.size() == 10
+    engine.dispose()
+
+
+def test_concurrent_workers_migrate_once(tmp_path):
+    url = f"sqlite:///{os.path.join(str(tmp_path), 'race.db')}"
+    engine = create_db_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (user_id, name, email) VALUES ('u1', 'Alice', 'a@race.local')"))
+        conn.execute(text("INSERT INTO conversations (conversation_id, user_id, title) VALUES ('c1', 'u1', 'Race')"))
+        conn.execute(text("INSERT INTO comments (comment_id, conversation_id, user_id, content) "
+                          "VALUES ('m1', 'c1', 'u1', 'Backfilled once')"))
+
+    # One engine per thread, like separate worker processes starting together
+    engines = [create_db_engine(url) for _ in range(4)]
+    with ThreadPoolExecutor(len(engines)) as pool:
+        versions = list(pool.map(run_migrations, engines))
+
+    assert versions == [MIGRATIONS[-1][0]] * len(engines)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT version FROM schema_version ORDER BY version")).scalars().all() == \
+            [version for version, _, _ in MIGRATIONS]
+        if fts5_available(conn):
+            assert conn.execute(text("SELECT COUNT(*) FROM search_docs")).scalar() == 1
+    for e in engines + [engine]:
+        e.dispose()
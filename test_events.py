@@ -0,0 +1,116 @@
+"""Conversation events: hub delivery, publish on commit, SQLite fan-out, resync on overflow, the WebSocket"""
+import asyncio
+import uuid
+
+import pytest
+
+from backend.services import db_service, events_service
+from backend.services.events_service import (
+    EventHub, LocalFanOut, SQLiteFanOut, SUBSCRIBER_QUEUE_SIZE
+)
+
+
+def _local_hub():
+    hub = EventHub()
+    hub.fanout = LocalFanOut(hub)
+    return hub
+
+
+def test_events_reach_only_subscribers_of_the_conversation():
+    hub = _local_hub()
+
+    async def scenario():
+        async with hub.subscribe("c1") as first, hub.subscribe("c2") as other:
+            assert hub.subscriber_count() == 2
+            hub.publish("c1", {"type": "comment", "data": {"comment_id": "x"}})
+            event = await asyncio.wait_for(first.get(), timeout=1)
+            await asyncio.sleep(0)
+            return event, other.empty()
+
+    event, other_empty = asyncio.run(scenario())
+    assert event["data"]["comment_id"] == "x"
+    assert other_empty
+    assert hub.subscriber_count() == 0
+
+
+def test_sqlite_fanout_delivers_across_hubs(tmp_path):
+    path = str(tmp_path / "events.db")
+    publisher, receiver = EventHub(), EventHub()
+    publisher.fanout = SQLiteFanOut(publisher, path, poll_interval=60)
+    receiver.fanout = SQLiteFanOut(receiver, path, poll_interval=60)
+    try:
+        async def scenario():
+            async with receiver.subscribe("c1") as events:
+                publisher.publish("c1", {"type": "reaction", "data": {"user_id": "u1"}})
+                publisher.fanout.flush()
+                assert receiver.fanout.poll_once() == 1
+                assert receiver.fanout.poll_once() == 0
+                return await asyncio.wait_for(events.get(), timeout=1)
+
+        assert asyncio.run(scenario())["type"] == "reaction"
+    finally:
+        publisher.fanout.close()
+        receiver.fanout.close()
+
+
+def test_sqlite_publish_does_not_wait_for_the_file(tmp_path):
+    hub = EventHub()
+    hub.fanout = SQLiteFanOut(hub, str(tmp_path / "events.db"), poll_interval=60)
+    try:
+        with hub.fanout._lock:  # file busy: publishing still returns at once
+            hub.publish("c1", {"type": "comment", "data": {"comment_id": "x"}})
+        hub.fanout.flush()
+        count = hub.fanout._db.execute("SELECT COUNT(*) FROM conversation_events").fetchone()[0]
+        assert count == 1
+    finally:
+        hub.fanout.close()
+
+
+def test_full_queue_is_replaced_by_resync():
+    hub = _local_hub()
+
+    async def scenario():
+        async with hub.subscribe("c1") as events:
+            for i in range(SUBSCRIBER_QUEUE_SIZE + 1):
+                hub.publish("c1", {"type": "comment", "data": {"comment_id": str(i)}})
+            await asyncio.sleep(0.01)
+            return [events.get_nowait() for _ in range(events.qsize())]
+
+    assert asyncio.run(scenario()) == [{"type": "resync"}]
+
+
+def test_events_publish_on_commit_and_drop_on_rollback(monkeypatch):
+    hub = _local_hub()
+    monkeypatch.setattr(events_service, "get_event_hub", lambda: hub)
+    user = db_service.create_user("Events User", "Analyst", "Sales", f"events_{uuid.uuid4()}@test.local")
+    conv = db_service.create_conversation(user["user_id"], "Live updates", "public")
+
+    async def scenario():
+        async with hub.subscribe(conv["conversation_id"]) as events:
+            db = db_service.SessionLocal()
+            try:
+                db_service.create_comment(conv["conversation_id"], user["user_id"], "Rolled back", db=db)
+                db.rollback()
+                kept = db_service.create_comment(conv["conversation_id"], user["user_id"], "Committed", db=db)
+                await asyncio.sleep(0.01)
+                assert events.empty()  # nothing before the commit
+                db.commit()
+            finally:
+                db.close()
+            await asyncio.sleep(0.01)
+            return kept, [events.get_nowait() for _ in range(events.qsize())]
+
+    kept, received = asyncio.run(scenario())
+    assert [(e["type"], e["data"]["comment_id"]) for e in received] == [("comment", kept["comment_id"])]
+    assert received[0]["data"]["user"]["name"] == "Events User"
+
+
+def test_socket_for_unknown_conversation_is_closed():
+    from fastapi.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+    from backend.app import app
+
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with TestClient(app).websocket_connect("/ws/conversations/no-such-conversation") as websocket:
+            websocket.receive_json()
+    assert closed.value.code == 4404
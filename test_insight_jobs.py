@@ -0,0 +1,135 @@
+"""InsightJobQueue: claiming, retry with backoff, lease expiry, workers and the pending-insight endpoints"""
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+
+from backend.services import db_service, job_service, model_service
+from backend.services.job_service import InsightJobQueue
+
+
+def _queue(tmp_path, **kwargs):
+    return InsightJobQueue(os.path.join(str(tmp_path), "jobs.db"), retry_base_seconds=0, **kwargs)
+
+
+def test_enqueue_once_per_insight_and_complete(tmp_path):
+    queue = _queue(tmp_path)
+    queue.enqueue("insight-1", "What are Q4 sales trends?")
+    queue.enqueue("insight-1", "What are Q4 sales trends?")
+
+    job_id, insight_id, question, attempts = queue.claim()
+    assert (insight_id, question, attempts) == ("insight-1", "What are Q4 sales trends?", 1)
+    assert queue.claim() is None  # leased to this worker
+    queue.complete(job_id)
+    assert queue.stats()["queued"] == 0 and queue.stats()["completed"] == 1
+
+
+def test_retry_until_attempts_run_out(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2)
+    queue.enqueue("insight-1", "Where can we reduce costs?")
+
+    job_id, _, _, attempts = queue.claim()
+    assert queue.retry_or_fail(job_id, attempts, "provider timeout")
+    job_id, _, _, attempts = queue.claim()
+    assert attempts == 2
+    assert not queue.retry_or_fail(job_id, attempts, "provider timeout")
+    assert queue.claim() is None
+    assert queue.stats()["dead"] == 1
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = _queue(tmp_path, lease_seconds=0)
+    queue.enqueue("insight-1", "Is stock getting reduced?")
+    first = queue.claim()
+    second = queue.claim()
+    assert second[0] == first[0] and second[3] == 2
+
+
+def test_worker_survives_claim_and_run_errors(tmp_path, monkeypatch):
+    queue = _queue(tmp_path, concurrency=1, lease_seconds=0)
+    claim, runs = queue.claim, []
+
+    def locked_once():
+        monkeypatch.setattr(queue, "claim", claim)
+        raise sqlite3.OperationalError("database is locked")
+
+    async def run(job_id, insight_id, question, attempts):
+        runs.append(attempts)
+        if attempts == 1:
+            raise sqlite3.OperationalError("database is locked")
+        queue.complete(job_id)
+
+    monkeypatch.setattr(queue, "claim", locked_once)
+    monkeypatch.setattr(queue, "_run", run)
+
+    async def scenario():
+        queue.start()
+        queue.enqueue("insight-1", "What are Q4 sales trends?")
+        for _ in range(100):
+            if queue.stats()["completed"]:
+                break
+            await asyncio.sleep(0.05)
+        await queue.stop()
+
+    asyncio.run(scenario())
+    # The failed run left the job leased; the same worker picked it up again
+    assert runs == [1, 2]
+    assert queue.stats()["completed"] == 1
+
+
+def test_lease_is_renewed_while_the_job_runs(tmp_path, monkeypatch):
+    queue = _queue(tmp_path, concurrency=1, lease_seconds=0.3)
+    other_worker = _queue(tmp_path)
+    stolen = []
+
+    async def run(job_id, insight_id, question, attempts):
+        # e.g. waiting for a model-call slot longer than the lease
+        for _ in range(6):
+            await asyncio.sleep(0.1)
+            stolen.append(await asyncio.to_thread(other_worker.claim))
+        queue.complete(job_id)
+
+    monkeypatch.setattr(queue, "_run", run)
+
+    async def scenario():
+        queue.start()
+        await asyncio.to_thread(queue.enqueue, "insight-1", "What are Q4 sales trends?")
+        for _ in range(100):
+            if queue.stats()["completed"]:
+                break
+            await asyncio.sleep(0.05)
+        await queue.stop()
+
+    asyncio.run(scenario())
+    assert stolen == [None] * 6
+
+
+def test_create_query_returns_pending_insight_then_completed(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend.app import app
+
+    queue = _queue(tmp_path, concurrency=1)
+    monkeypatch.setattr(job_service, "get_job_queue", lambda config=None: queue)
+
+    async def analyze(question):
+        return {"status": "success", "analysis": f"Analysis of: {question}"}
+
+    monkeypatch.setattr(model_service, "analyze_business_query_async", analyze)
+
+    with TestClient(app) as client:  # startup starts the queue's workers
+        user = db_service.create_user("Jobs User", "Analyst", "Sales", f"jobs_{uuid.uuid4()}@test.local")
+        conv = db_service.create_conversation(user["user_id"], "Background insights", "public")
+        res = client.post(f"/api/conversations/{conv['conversation_id']}/queries",
+                          json={"user_id": user["user_id"], "question": "What are Q4 sales trends?"})
+        insight = res.json()["query"]["insight"]
+        assert insight["status"] == "pending"
+
+        for _ in range(100):
+            insight = client.get(f"/api/insights/{insight['insight_id']}").json()["insight"]
+            if insight["status"] != "pending":
+                break
+            time.sleep(0.05)
+
+    assert insight["status"] == "ready"
+    assert insight["response"] == "Analysis of: What are Q4 sales trends?"
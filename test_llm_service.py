@@ -0,0 +1,55 @@
+"""Local LLM streaming: a failing generation ends the stream instead of hanging it"""
+import asyncio
+import dataclasses
+
+import pytest
+
+from backend.services import model_service
+from backend.services.llm_service import LLMAnalysisService
+
+INSIGHTS = {"category": "sales_revenue", "impact_metrics": {"priority": "High", "impact_score": 0.8}}
+
+
+class _Tokenizer:
+    eos_token_id = 0
+
+    def __call__(self, text, return_tensors=None):
+        return {}
+
+
+class _FailingModel:
+    def generate(self, **kwargs):
+        raise RuntimeError("out of memory")
+
+
+def _failing_service():
+    service = LLMAnalysisService()
+    service.tokenizer = _Tokenizer()
+    service.model = _FailingModel()
+    service._initialized = True
+    service.status = "ready"
+    return service
+
+
+def test_stream_analysis_raises_generation_error():
+    tokens = _failing_service().stream_analysis("What are Q4 sales trends?", "sales_revenue", INSIGHTS)
+    with pytest.raises(RuntimeError, match="out of memory"):
+        list(tokens)
+
+
+def test_stream_ends_with_error_when_generation_fails(monkeypatch):
+    service = _failing_service()
+    monkeypatch.setattr(model_service, "settings", dataclasses.replace(model_service.settings, model_api_key=""))
+    monkeypatch.setattr(model_service, "_get_local_llm", lambda: service)
+
+    async def collect():
+        return [event async for event in model_service.stream_business_query("What are Q4 sales trends?")]
+
+    events = asyncio.run(asyncio.wait_for(collect(), timeout=30))
+    event, data = events[-1]
+    assert event == "done"
+    assert data["status"] == "error" and "out of memory" in data["error"]
+    # The template analysis is still streamed in place of the LLM text
+    text = "".join(data["text"] for event, data in events if event == "token")
+    assert text.endswith("*Powered by scikit-learn ML models*")
+    assert model_service.get_scheduler().stats()["active"] == 0
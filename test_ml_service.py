@@ -0,0 +1,60 @@
+"""MLAnalysisService categorization (single and batched)"""
+import pytest
+
+from backend.services.ml_service import MLAnalysisService, get_ml_service, load_corpus
+
+QUERIES = [
+    "What are Q4 sales trends?",
+    "Is stock getting reduced?",
+    "Show me customer churn analysis",
+    "Where can we reduce costs?",
+    "Completely unrelated question",
+]
+
+
+def test_batch_matches_single_query_results():
+    ml_service = get_ml_service()
+    assert ml_service.categorize_queries(QUERIES) == [ml_service.categorize_query(q) for q in QUERIES]
+    assert ml_service.generate_ml_insights_batch(QUERIES) == [ml_service.generate_ml_insights(q) for q in QUERIES]
+
+
+def test_empty_batch():
+    assert get_ml_service().categorize_queries([]) == []
+
+
+def test_classifier_modes():
+    nearest = MLAnalysisService(classifier="nearest")
+    centroid = MLAnalysisService(classifier="centroid")
+    # Training examples are their own nearest neighbour
+    assert nearest.categorize_query("What are Q4 sales trends?") == ("sales_revenue", pytest.approx(1.0))
+    for query in QUERIES[:4]:
+        assert centroid.categorize_query(query)[0] == nearest.categorize_query(query)[0]
+    with pytest.raises(ValueError):
+        MLAnalysisService(classifier="knn")
+
+
+def test_incremental_examples_match_full_build():
+    corpus = load_corpus()
+    new_examples = ["Which suppliers are late on deliveries?", "Supplier lead time performance"]
+
+    incremental = MLAnalysisService(corpus)
+    incremental.add_examples("supplier_management", new_examples)
+    full = MLAnalysisService({**corpus, "supplier_management": {"keywords": [], "examples": new_examples}})
+
+    query = "are our suppliers delivering late"
+    assert incremental.categorize_query(query)[0] == "supplier_management"
+    assert incremental.categorize_query(query) == pytest.approx(full.categorize_query(query))
+
+
+def test_artifact_round_trip(tmp_path):
+    built = MLAnalysisService()
+    built.save_artifact(str(tmp_path), "fingerprint")
+    loaded = MLAnalysisService.from_artifact(str(tmp_path))
+
+    assert loaded.corpus_fingerprint == "fingerprint"
+    assert loaded.corpus_version == built.corpus_version
+    for query in QUERIES:
+        assert loaded.categorize_query(query) == pytest.approx(built.categorize_query(query))
+    # Memory-mapped arrays are read-only; adding examples must still work
+    loaded.add_examples("supplier_management", ["Which suppliers are late on deliveries?", "Supplier lead time performance"])
+    assert loaded.categorize_query("are our suppliers delivering late")[0] == "supplier_management"
@@ -0,0 +1,164 @@
+"""Provider client registry against a local stub HTTP server (no real API key needed)"""
+import asyncio
+import dataclasses
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.config import settings
+from backend.services import provider_service
+
+
+class StubProvider(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+    peers = set()
+    delay = 0.0
+
+    def do_POST(self):
+        StubProvider.peers.add(self.client_address)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(StubProvider.delay)
+        if self.path.endswith("/chat/completions"):
+            payload = {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "stub openai insight"}}],
+            }
+        else:
+            payload = {
+                "id": "msg_stub", "type": "message", "role": "assistant", "model": body["model"],
+                "content": [{"type": "text", "text": "stub anthropic insight"}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": 1, "output_tokens": 1},
+            }
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stub_config(server, provider, **overrides):
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    return dataclasses.replace(
+        settings, model_api_key="sk-stub", model_provider=provider,
+        model_base_url=base + "/v1" if provider == "openai" else base,
+        model_max_retries=0, **overrides
+    )
+
+
+def test_clients_are_reused_and_keep_alive():
+    server = start_stub()
+    try:
+        for provider in ("openai", "anthropic"):
+            provider_service.close_clients()
+            StubProvider.peers.clear()
+            config = stub_config(server, provider)
+            client = provider_service.get_client(provider, config)
+            assert provider_service.get_client(provider, config) is client
+            for _ in range(5):
+                if provider == "openai":
+                    r = client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "hi"}])
+                    assert r.choices[0].message.content == "stub openai insight"
+                else:
+                    r = client.messages.create(model="claude-3-haiku-20240307", max_tokens=10, messages=[{"role": "user", "content": "hi"}])
+                    assert r.content[0].text == "stub anthropic insight"
+            print(f"✅ PASS: {provider}: 5 calls over {len(StubProvider.peers)} connection(s)")
+            assert len(StubProvider.peers) == 1
+    finally:
+        provider_service.close_clients()
+        server.shutdown()
+
+
+def test_read_timeout_is_enforced():
+    server = start_stub()
+    StubProvider.delay = 1.0
+    try:
+        provider_service.close_clients()
+        client = provider_service.get_client("openai", stub_config(server, "openai", model_read_timeout=0.2))
+        started = time.perf_counter()
+        try:
+            client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "hi"}])
+            raise AssertionError("slow provider did not time out")
+        except Exception as e:
+            assert "timed out" in str(e).lower() or "timeout" in type(e).__name__.lower(), e
+        assert time.perf_counter() - started < 1.0
+        print("✅ PASS: slow provider times out")
+    finally:
+        StubProvider.delay = 0.0
+        provider_service.close_clients()
+        server.shutdown()
+
+
+def test_async_client_shared_on_loop():
+    server = start_stub()
+
+    async def run():
+        config = stub_config(server, "openai")
+        client = provider_service.get_async_client("openai", config)
+        assert provider_service.get_async_client("openai", config) is client
+        results = await asyncio.gather(*[
+            client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "hi"}])
+            for _ in range(10)
+        ])
+        await provider_service.aclose_clients()
+        return results
+
+    try:
+        results = asyncio.run(run())
+        assert all(r.choices[0].message.content == "stub openai insight" for r in results)
+        print("✅ PASS: 10 concurrent async calls on one client")
+    finally:
+        server.shutdown()
+
+
+def test_async_client_of_another_loop_is_closed():
+    server = start_stub()
+    config = stub_config(server, "openai")
+
+    async def get_client():
+        return provider_service.get_async_client("openai", config)
+
+    # A loop that is still running in another thread
+    other_loop = asyncio.new_event_loop()
+    threading.Thread(target=other_loop.run_forever, daemon=True).start()
+    try:
+        on_other_loop = asyncio.run_coroutine_threadsafe(get_client(), other_loop).result()
+
+        async def replace():
+            assert await get_client() is not on_other_loop
+            await asyncio.sleep(0.1)
+            assert on_other_loop.is_closed()
+
+        asyncio.run(replace())
+        on_finished_loop = provider_service._async_clients["openai"][1]
+
+        async def replace_again():
+            await get_client()
+            await provider_service.aclose_clients()
+
+        asyncio.run(replace_again())
+        assert on_finished_loop.is_closed()
+        assert not provider_service._async_clients
+        print("✅ PASS: async clients of other loops are closed")
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_clients_are_reused_and_keep_alive()
+    test_read_timeout_is_enforced()
+    test_async_client_shared_on_loop()
+    test_async_client_of_another_loop_is_closed()
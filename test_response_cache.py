@@ -0,0 +1,115 @@
+"""Analysis response cache: exact, near-duplicate and persistent hits, LRU/TTL eviction, single-flight"""
+import asyncio
+import os
+import tempfile
+import time
+
+from backend.services.cache_service import ResponseCache, SingleFlight, normalize_query
+from backend.services.ml_service import MLAnalysisService, get_ml_service
+
+
+def _bucket_and_vector(query):
+    ml_service = get_ml_service()
+    vector = ml_service.vectorize(query)
+    insights = ml_service.generate_ml_insights(query, ml_service.categorize_vector(vector))
+    return ResponseCache.make_bucket(insights["category"], insights["impact_metrics"]["priority"]), vector
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = ResponseCache()
+    cache.put("What are Q4 sales trends?", "sales_revenue|High", {"analysis": "up 8%"})
+    assert normalize_query("  what are Q4  sales trends ") == "what are q4 sales trends"
+    assert cache.get("what are q4 sales trends")["analysis"] == "up 8%"
+    assert cache.stats()["hits"] == 1
+
+
+def test_near_duplicate_within_bucket_only():
+    cache = ResponseCache(similarity_threshold=0.8)
+    bucket, vector = _bucket_and_vector("What are Q4 sales trends?")
+    cache.put("What are Q4 sales trends?", bucket, {"analysis": "up 8%"}, vector)
+
+    near_bucket, near_vector = _bucket_and_vector("What are the Q4 sales trends")
+    assert cache.get("What are the Q4 sales trends") is None
+    assert cache.get_similar(near_bucket, near_vector)["analysis"] == "up 8%"
+
+    other_bucket, other_vector = _bucket_and_vector("Show me customer churn analysis")
+    assert cache.get_similar(other_bucket, other_vector) is None
+    assert cache.stats()["near_hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_and_ttl_eviction():
+    cache = ResponseCache(max_entries=2, ttl_seconds=0.05)
+    cache.put("a", "b", {"n": 1})
+    cache.put("c", "b", {"n": 2})
+    cache.get("a")
+    cache.put("d", "b", {"n": 3})
+    assert cache.get("c") is None  # least recently used
+    assert cache.get("a") == {"n": 1}
+    time.sleep(0.1)
+    assert cache.get("d") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_persistent_tier_survives_restart():
+    path = os.path.join(tempfile.mkdtemp(), "response_cache.db")
+    cache = ResponseCache(persist_path=path)
+    cache.put("Is stock getting reduced?", "stock_inventory|High", {"analysis": "yes"})
+    cache.close()
+    restarted = ResponseCache(persist_path=path)
+    assert restarted.get("is stock getting reduced")["analysis"] == "yes"
+    assert restarted.stats()["persistent_hits"] == 1
+
+
+def test_persistent_writes_stay_off_the_caller_and_prune_expired_rows():
+    path = os.path.join(tempfile.mkdtemp(), "response_cache.db")
+    cache = ResponseCache(ttl_seconds=0.05, persist_path=path)
+    with cache._db_lock:  # disk busy: put still returns, the memory tier serves the answer
+        cache.put("Is stock getting reduced?", "stock_inventory|High", {"analysis": "yes"})
+        assert cache.get("is stock getting reduced")["analysis"] == "yes"
+    cache.flush()
+    time.sleep(0.1)
+    cache.put("Where can we reduce costs?", "cost_optimization|Medium", {"analysis": "freight"})
+    cache.flush()
+    rows = cache._db.execute("SELECT cache_key FROM response_cache").fetchall()
+    assert rows == [(ResponseCache.make_key("Where can we reduce costs?"),)]
+    cache.close()
+
+
+def test_corpus_change_invalidates_every_tier():
+    path = os.path.join(tempfile.mkdtemp(), "response_cache.db")
+    ml_service = MLAnalysisService()
+    before = ml_service.corpus_version
+    cache = ResponseCache(persist_path=path)
+    cache.put("Is stock getting reduced?", "stock_inventory|High", {"analysis": "yes"}, version=before)
+    cache.flush()
+
+    ml_service.add_examples("risk_compliance", ["Is stock getting reduced?"])
+    assert ml_service.corpus_version != before
+    assert MLAnalysisService().corpus_version == before  # same corpus, same version in every worker
+
+    other_worker = ResponseCache(persist_path=path)
+    assert other_worker.get("is stock getting reduced", ml_service.corpus_version) is None
+    assert other_worker.get("is stock getting reduced", before)["analysis"] == "yes"
+
+
+def test_single_flight_coalesces_concurrent_identical_queries():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"analysis": "up 8%", "query": "What are Q4 sales trends?"}
+
+    async def burst():
+        return await asyncio.gather(
+            single_flight.run("What are Q4 sales trends?", compute),
+            single_flight.run("what are q4 sales trends", compute),
+            single_flight.run("Where can we reduce costs?", compute),
+        )
+
+    leader, follower, other = asyncio.run(burst())
+    assert len(calls) == 2
+    assert follower == {"analysis": "up 8%", "query": "what are q4 sales trends", "coalesced": True}
+    assert "coalesced" not in leader
+    assert single_flight.stats() == {"leaders": 2, "coalesced": 1, "in_flight": 0}
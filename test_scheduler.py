@@ -0,0 +1,55 @@
+"""PriorityScheduler: concurrency cap and weighted fair dequeueing by priority"""
+import asyncio
+
+import pytest
+
+from backend.services.scheduler_service import PriorityScheduler, parse_weights
+
+
+def test_parse_weights():
+    assert parse_weights("High=6,Low=2") == {"High": 6, "Medium": 1, "Low": 2}
+    with pytest.raises(ValueError):
+        parse_weights("Urgent=10")
+
+
+def test_saturated_slots_go_to_priorities_by_weight():
+    scheduler = PriorityScheduler(max_concurrency=1, weights={"High": 3, "Medium": 1, "Low": 1})
+    order = []
+
+    async def call(priority, gate=None):
+        async with scheduler.slot(priority):
+            if gate:
+                await gate.wait()
+            order.append(priority)
+
+    async def burst():
+        gate = asyncio.Event()
+        holder = asyncio.ensure_future(call("Low", gate))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(call(p)) for p in ["Low"] * 4 + ["High"] * 4]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["priorities"]["High"]["waiting"] == 4
+        gate.set()
+        await asyncio.gather(holder, *waiters)
+
+    asyncio.run(burst())
+    # After the slot holder: High gets 3 of every 4 freed slots while both queues are non-empty
+    assert order[:5] == ["Low", "High", "High", "Low", "High"]
+    stats = scheduler.stats()
+    assert stats["active"] == 0
+    assert stats["priorities"]["High"]["admitted"] == 4 and stats["priorities"]["Low"]["admitted"] == 5
+
+
+def test_cancelled_waiter_leaves_queue():
+    scheduler = PriorityScheduler(max_concurrency=1)
+
+    async def scenario():
+        async with scheduler.slot("High"):
+            waiter = asyncio.ensure_future(scheduler.slot("Low").__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            assert scheduler.stats()["priorities"]["Low"]["waiting"] == 0
+        assert scheduler.stats()["active"] == 0
+
+    asyncio.run(scenario())
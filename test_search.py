@@ -0,0 +1,112 @@
+"""Full-text search: trigger-maintained index, visibility rules, pagination"""
+import os
+import tempfile
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from backend import migrations
+from backend.database import create_db_engine
+from backend.migrations import run_migrations
+from backend.models import Base
+from backend.services import db_service
+
+
+@pytest.fixture
+def db():
+    path = os.path.join(tempfile.mkdtemp(prefix="sap_search_"), "search.db")
+    engine = create_db_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _thread(db, owner, visibility, question, insight, comment_author=None, comment=None):
+    conv = db_service.create_conversation(owner["user_id"], question[:20], visibility, db=db)
+    query = db_service.create_query(conv["conversation_id"], owner["user_id"], question, db=db)
+    db_service.create_insight(query["query_id"], insight, db=db)
+    if comment:
+        db_service.create_comment(conv["conversation_id"], comment_author["user_id"], comment, db=db)
+    db.commit()
+    return conv
+
+
+def test_search_respects_visibility_and_ranks(db):
+    alice = db_service.create_user("Alice", "Manager", "Sales", "alice@search.local", db=db)
+    bob = db_service.create_user("Bob", "Analyst", "IT", "bob@search.local", db=db)
+    _thread(db, alice, "public", "What are Q4 sales trends?", "Sales increased by 15%.", bob, "Great sales insight")
+    _thread(db, alice, "department", "Regional sales targets", "North region sales lead.")
+    _thread(db, alice, "private", "Private sales forecast", "Confidential.")
+
+    kinds = [r["kind"] for r in db_service.search_content(bob["user_id"], "sales", "IT", db=db)]
+    assert sorted(kinds) == ["comment", "insight", "query"]  # public thread only
+
+    results = db_service.search_content(alice["user_id"], "sales", "Sales", kinds=["query"], db=db)
+    assert len(results) == 3
+    assert "<mark>" in results[0]["snippet"]
+    assert [r["score"] for r in results] == sorted(r["score"] for r in results)
+
+
+def test_index_follows_updates_and_deletes(db):
+    alice = db_service.create_user("Alice", "Manager", "Sales", "alice@search.local", db=db)
+    conv = _thread(db, alice, "public", "Inventory levels", "", alice, "Check warehouse stock")
+    insight = db_service.get_conversation_detail(conv["conversation_id"], db=db)["queries"][0]["insight"]
+
+    assert db_service.search_content(alice["user_id"], "restock", db=db) == []
+    db_service.complete_insight(insight["insight_id"], "Restock SKU-2891 within two weeks", db=db)
+    db.commit()
+    assert [r["kind"] for r in db_service.search_content(alice["user_id"], "restock", db=db)] == ["insight"]
+
+    comment = db_service.search_content(alice["user_id"], "warehouse", db=db)[0]
+    db_service.delete_comment(comment["id"], alice["user_id"], db=db)
+    db.commit()
+    assert db_service.search_content(alice["user_id"], "warehouse", db=db) == []
+
+
+def test_pagination_and_query_sanitizing(db):
+    alice = db_service.create_user("Alice", "Manager", "Sales", "alice@search.local", db=db)
+    for i in range(5):
+        _thread(db, alice, "public", f"Budget review {i}", "Costs are flat.")
+
+    first = db_service.search_content(alice["user_id"], "budget", limit=3, db=db)
+    cursor = db_service.encode_search_cursor(first[-1]["score"], first[-1]["doc_id"])
+    second = db_service.search_content(alice["user_id"], "budget", limit=3, cursor=cursor, db=db)
+    assert len(first) == 3 and len(second) == 2
+    assert not {r["id"] for r in first} & {r["id"] for r in second}
+
+    # FTS syntax in user input is treated as plain words
+    assert db_service.fts_query('budget" OR NEAR(') == '"budget" "OR" "NEAR"*'
+    assert db_service.search_content(alice["user_id"], '"(*', db=db) == []
+
+
+def test_search_migration_waits_for_fts5(monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(prefix="sap_search_"), "no_fts5.db")
+    engine = create_db_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        monkeypatch.setattr(migrations, "fts5_available", lambda conn: False)
+        assert run_migrations(engine) == 2  # migration 3 is not recorded
+        assert not db_service.search_available(db=session)
+
+        monkeypatch.undo()
+        assert run_migrations(engine) == 3  # and is applied once FTS5 is there
+        assert db_service.search_available(db=session)
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def test_search_backfill_can_run_again(db):
+    alice = db_service.create_user("Alice", "Manager", "Sales", "alice@search.local", db=db)
+    _thread(db, alice, "public", "Inventory levels", "Restock soon.", alice, "Check warehouse stock")
+
+    # e.g. a worker whose start raced another one, or a retried start
+    with db.get_bind().begin() as conn:
+        migrations._migration_3_search_index(conn)
+
+    assert len(db_service.search_content(alice["user_id"], "warehouse", db=db)) == 1
+    assert len(db_service.search_content(alice["user_id"], "inventory", db=db)) == 1